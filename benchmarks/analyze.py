@@ -0,0 +1,135 @@
+"""Offline benchmark of the local cost of `analyze`, from 100 up to 1M messages.
+
+The taggers are replaced by the deterministic stand-ins of `test/fakes.py` and the streams come
+from `test/synthetic.py`, so the numbers only contain the package's own work. The stages are
+read from the metrics of the call in one pass, and its peak memory is measured in a second pass
+under tracemalloc.
+
+Results are saved as JSON. Pass `--baseline` with an earlier result to flag regressions.
+
+Usage: python benchmarks/analyze.py [--sizes 100,1000,10000,100000] [--baseline old.json]
+"""
+import argparse
+import gc
+import json
+import logging
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / "src")]
+
+from test.fakes import FakeClient  # noqa: E402
+from test.synthetic import generate_chat_stream  # noqa: E402
+
+from api import ChatAnalyticsPackage  # noqa: E402
+
+logging.disable(logging.INFO)
+
+RESULTS = Path(__file__).parent / "results"
+REGRESSION_THRESHOLD = 1.2
+
+
+END_TO_END = "analyze (end to end)"
+
+
+def benchmark(n_messages: int, trace_memory: bool = True) -> Dict[str, Dict[str, float]]:
+    """Time a real analyze call on a synthetic stream, per stage, and measure its peak memory.
+
+    The stage timings are the ones `analyze` records in its `RequestMetrics`, so they cover
+    every stage it runs.
+    """
+    payload = [
+        message.dict(format_dates=True, format_enums=True)
+        for message in generate_chat_stream(n_messages)
+    ]
+    config = {"intent_cache_size": 0, "response_metrics": True}
+    app = ChatAnalyticsPackage(FakeClient(), config=config)
+
+    gc.collect()
+    t0 = time.perf_counter()
+    response = app.analyze(payload)
+    elapsed = time.perf_counter() - t0
+    results = {
+        stage: {"seconds": seconds} for stage, seconds in response.data["metrics"]["stages"].items()
+    }
+    results[END_TO_END] = {"seconds": elapsed}
+
+    if trace_memory:
+        # A fresh package and client, so that the traced call does the same work.
+        app = ChatAnalyticsPackage(FakeClient(), config=config)
+        gc.collect()
+        tracemalloc.start()
+        app.analyze(payload)
+        results[END_TO_END]["peak_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return results
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _compare(results: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    regressions = []
+    for size, stages in results["results"].items():
+        for name, metrics in stages.items():
+            previous = baseline["results"].get(size, {}).get(name)
+            if previous and metrics["seconds"] > previous["seconds"] * REGRESSION_THRESHOLD:
+                regressions.append(
+                    f"{size} messages, {name}: {previous['seconds']:.3f}s -> {metrics['seconds']:.3f}s"
+                )
+    return regressions
+
+
+def main() -> None:
+    """Run the benchmark, save its results and compare them with a baseline."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="100,1000,10000,100000")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument("--baseline", type=Path, default=None)
+    args = parser.parse_args()
+
+    results = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "created_at": datetime.now().isoformat(),
+        "results": {},
+    }
+    for size in (int(size) for size in args.sizes.split(",")):
+        results["results"][str(size)] = benchmark(size, trace_memory=not args.no_memory)
+        for name, metrics in results["results"][str(size)].items():
+            memory = f"{metrics['peak_mb']:10.1f} MB" if "peak_mb" in metrics else ""
+            print(f"{size:>9} messages  {name:<20} {metrics['seconds']:10.4f} s {memory}")
+
+    output = args.output or RESULTS / f"analyze-{results['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"Saved results to {output}")
+
+    if args.baseline:
+        regressions = _compare(results, json.loads(args.baseline.read_text()))
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
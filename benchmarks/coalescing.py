@@ -0,0 +1,102 @@
+"""Offline benchmark of coalescing concurrent `analyze` calls into shared plugin submissions.
+
+Concurrent callers each send small chat streams in a loop, as active rooms do under load. The
+taggers are the stand-ins of `test/fakes.py`, with a fixed latency per task that plays the part
+of the plugin round trip. Every `coalesce_wait_s` value is run for the same duration, and its
+throughput, caller latency and plugin submissions per call are reported.
+
+The callers are threads of one process, which is the only setup coalescing helps: a host that
+serves concurrent calls from one long-lived process. Deployments where every container serves
+one invocation at a time never coalesce anything and only pay the wait.
+
+Usage: python benchmarks/coalescing.py [--callers 16] [--waits 0,0.005,0.02,0.05]
+"""
+import argparse
+import json
+import logging
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / "src")]
+
+from test.fakes import FakeClient  # noqa: E402
+from test.synthetic import generate_conversations  # noqa: E402
+
+from api import ChatAnalyticsPackage  # noqa: E402
+
+logging.disable(logging.INFO)
+
+
+def benchmark(
+    callers: int, messages: int, wait_s: float, latency_s: float, duration_s: float
+) -> Dict[str, Any]:
+    """Throughput and latency of `callers` threads calling analyze for `duration_s` seconds."""
+    payloads = [
+        [message.dict(format_dates=True, format_enums=True) for message in chat_stream]
+        for chat_stream in generate_conversations(callers, messages)
+    ]
+    client = FakeClient(latency_s=latency_s)
+    config = {"intent_cache_size": 0, "memo_ttl_s": 0, "coalesce_wait_s": wait_s}
+    latencies: List[float] = []
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration_s
+
+    def call(payload: List[Dict[str, Any]]) -> None:
+        while time.monotonic() < stop_at:
+            t0 = time.perf_counter()
+            ChatAnalyticsPackage(client, config=config).analyze(payload)
+            with lock:
+                latencies.append(time.perf_counter() - t0)
+
+    threads = [threading.Thread(target=call, args=(payload,)) for payload in payloads]
+    t0 = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - t0
+
+    latencies.sort()
+    return {
+        "calls": len(latencies),
+        "calls_per_s": len(latencies) / elapsed,
+        "p50_ms": 1000 * statistics.median(latencies),
+        "p95_ms": 1000 * latencies[int(0.95 * (len(latencies) - 1))],
+        "submissions_per_call": (len(client.oneai.files) + len(client.zero_shot.files))
+        / len(latencies),
+    }
+
+
+def main() -> None:
+    """Run the benchmark for every wait and print (and optionally save) the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--callers", type=int, default=16)
+    parser.add_argument("--messages", type=int, default=10, help="messages per call")
+    parser.add_argument("--waits", default="0,0.005,0.02,0.05")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per plugin task")
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    results = {}
+    for wait_s in (float(wait) for wait in args.waits.split(",")):
+        results[str(wait_s)] = benchmark(
+            args.callers, args.messages, wait_s, args.latency, args.duration
+        )
+        metrics = results[str(wait_s)]
+        print(
+            f"wait {wait_s:6.3f} s  {metrics['calls_per_s']:8.1f} calls/s  "
+            f"p50 {metrics['p50_ms']:7.1f} ms  p95 {metrics['p95_ms']:7.1f} ms  "
+            f"{metrics['submissions_per_call']:5.2f} submissions/call"
+        )
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
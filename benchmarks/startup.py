@@ -0,0 +1,61 @@
+"""Cold-start benchmark: import time of the package and time to its first response.
+
+Every sample runs in a fresh interpreter, so nothing is shared between samples. The first
+response is the package's `__dir__` route, which needs no plugin, so the measurement shows the
+handler's own startup cost without any network round trip.
+
+Usage: python benchmarks/startup.py [--runs 10] [--output startup.json]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+SRC = Path(__file__).parent.parent / "src"
+
+SAMPLE = """
+import json, logging, time
+logging.disable(logging.CRITICAL)
+t0 = time.perf_counter()
+import api
+t1 = time.perf_counter()
+from steamship.invocable import InvocableRequest
+from steamship.invocable.invocable_request import Invocation
+app = api.ChatAnalyticsPackage(client=None)
+t2 = time.perf_counter()
+response = app(InvocableRequest(invocation=Invocation(http_verb="GET", invocation_path="/__dir__")))
+t3 = time.perf_counter()
+assert response
+print(json.dumps({"import_s": t1 - t0, "construct_s": t2 - t1, "first_response_s": t3 - t0}))
+"""
+
+
+def sample() -> dict:
+    """Measure one cold start in a fresh interpreter."""
+    output = subprocess.run(
+        [sys.executable, "-c", SAMPLE], cwd=SRC, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    """Run the benchmark and print (and optionally save) the median of every timing."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    samples = [sample() for _ in range(args.runs)]
+    results = {
+        key: statistics.median(sample[key] for sample in samples) for key in samples[0].keys()
+    }
+    results["runs"] = args.runs
+    print(json.dumps(results, indent=2))
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
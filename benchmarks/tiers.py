@@ -0,0 +1,113 @@
+"""Offline benchmark of the zero-shot intent model tiers: latency and agreement per tier.
+
+Every tier's model is run locally with the `transformers` zero-shot pipeline, which must be
+installed, on a labeled corpus: NDJSON messages with an intent, such as an `analyze_ndjson`
+output or stored examples, or synthetic labeled examples by default. For each tier it reports
+the latency per message and how often the tier agrees with the labels and with the most
+accurate tier. `--stand-in` runs the deterministic stand-in tagger instead, to check the script
+without downloading models.
+
+Usage: python benchmarks/tiers.py [--corpus labeled.ndjson] [--tiers fast,default,accurate]
+"""
+import argparse
+import json
+import logging
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Sequence
+
+ROOT = Path(__file__).parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / "src")]
+
+from test.fakes import FakeZeroShotTagger  # noqa: E402
+from test.synthetic import generate_labeled_examples  # noqa: E402
+
+from steamship import Block  # noqa: E402
+
+from alignment import block_intent  # noqa: E402
+from api_spec import Message  # noqa: E402
+from streaming import read_ndjson  # noqa: E402
+from tiers import TIERS, ModelTier, parse_tiers  # noqa: E402
+
+logging.disable(logging.INFO)
+
+
+def _transformers_classifier(tier: ModelTier) -> Callable[[str], str]:
+    try:
+        from transformers import pipeline
+    except ImportError:
+        sys.exit("This benchmark needs transformers: pip install transformers torch")
+    classify = pipeline("zero-shot-classification", model=tier.hf_model_path)
+    return lambda text: classify(text, candidate_labels=list(tier.labels))["labels"][0]
+
+
+def _stand_in_classifier(tier: ModelTier) -> Callable[[str], str]:
+    tagger = FakeZeroShotTagger("stand-in", {"labels": ",".join(tier.labels)})
+    return lambda text: tagger.tag_block(Block(text=text)).tags[0].name
+
+
+def _intent(label: str) -> str:
+    return block_intent(Block(tags=[{"kind": "intent", "name": label}])).value
+
+
+def benchmark(
+    tiers: Sequence[ModelTier], corpus: List[Message], stand_in: bool
+) -> Dict[str, Dict[str, Any]]:
+    """Latency and agreement of every tier on a labeled corpus."""
+    predictions: Dict[str, List[str]] = {}
+    results: Dict[str, Dict[str, Any]] = {}
+    for tier in tiers:
+        classify = (_stand_in_classifier if stand_in else _transformers_classifier)(tier)
+        classify(corpus[0].text)  # Loads the model before timing.
+        latencies = []
+        predicted = []
+        for message in corpus:
+            t0 = time.perf_counter()
+            label = classify(message.text)
+            latencies.append(time.perf_counter() - t0)
+            predicted.append(_intent(label))
+        predictions[tier.name] = predicted
+        latencies.sort()
+        results[tier.name] = {
+            "model": tier.hf_model_path,
+            "labels": len(tier.labels),
+            "mean_ms": 1000 * statistics.mean(latencies),
+            "p95_ms": 1000 * latencies[int(0.95 * (len(latencies) - 1))],
+            "label_agreement": statistics.mean(
+                prediction == message.intent.value for prediction, message in zip(predicted, corpus)
+            ),
+        }
+    reference = predictions[tiers[-1].name]
+    for tier in tiers:
+        results[tier.name][f"agreement_with_{tiers[-1].name}"] = statistics.mean(
+            a == b for a, b in zip(predictions[tier.name], reference)
+        )
+    return results
+
+
+def main() -> None:
+    """Run the benchmark and print (and optionally save) the results per tier."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", type=Path, default=None, help="labeled NDJSON messages")
+    parser.add_argument("--size", type=int, default=200, help="synthetic corpus size")
+    parser.add_argument("--tiers", default=",".join(TIERS))
+    parser.add_argument("--stand-in", action="store_true", help="use the stand-in tagger")
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    if args.corpus:
+        with args.corpus.open() as lines:
+            corpus = [Message.parse_obj(item) for item in read_ndjson(lines)]
+        corpus = [message for message in corpus if message.intent is not None]
+    else:
+        corpus = generate_labeled_examples(args.size)
+    results = benchmark(parse_tiers(args.tiers), corpus, args.stand_in)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""Incrementally maintained counts of sentiments and intents over the stored examples."""
+import calendar
+import threading
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from steamship import Block
+
+from alignment import INTENT_TAG_KIND, SENTIMENT_TAG_KIND
+from api_spec import Message
+
+DIMENSIONS = ("user", "thread", "time")
+FIELDS = ("sentiment", "intent")
+MESSAGES = "messages"
+
+
+def time_bucket(timestamp: datetime, bucket_s: int) -> str:
+    """Start of the UTC time bucket of a timestamp, naive timestamps being taken as UTC."""
+    epoch = calendar.timegm(timestamp.utctimetuple())
+    start = datetime.fromtimestamp(epoch - epoch % bucket_s, tz=timezone.utc)
+    return start.isoformat()
+
+
+def _enum_value(value: Any) -> Optional[str]:
+    return getattr(value, "value", value) or None
+
+
+class AggregateIndex:
+    """Message, sentiment and intent counts per user, thread and time bucket.
+
+    Counts are held in memory for millisecond queries, together with the ids of the stored files
+    they include, so that every file is counted once. `state` turns both into a JSON document
+    that is saved in the workspace, and `catch_up` loads it in a new process and only reads the
+    files stored since.
+    """
+
+    def __init__(self, bucket_s: int = 3600):
+        self.bucket_s = bucket_s
+        # dimension -> key -> field -> value -> count; the message count is kept under MESSAGES.
+        self._counts: Dict[str, Dict[str, Dict[str, Dict[str, int]]]] = {
+            dimension: defaultdict(lambda: defaultdict(lambda: defaultdict(int)))
+            for dimension in DIMENSIONS
+        }
+        self.files: Set[str] = set()
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self.built = False
+
+    def _increments(self, message: Message) -> Iterable[Tuple[str, str, str, str]]:
+        keys = {
+            "user": str(message.user_id),
+            "thread": str(message.root_message_id or message.message_id),
+            "time": time_bucket(message.timestamp, self.bucket_s),
+        }
+        values = {
+            "sentiment": _enum_value(message.sentiment),
+            "intent": _enum_value(message.intent),
+        }
+        for dimension, key in keys.items():
+            yield dimension, key, MESSAGES, MESSAGES
+            for field, value in values.items():
+                if value is not None:
+                    yield dimension, key, field, value
+
+    def add(self, chat_stream: Sequence[Message], file_id: Optional[str] = None) -> None:
+        """Count newly stored messages, unless the file `file_id` they were stored in was."""
+        increments: Dict[Tuple[str, str, str, str], int] = defaultdict(int)
+        for message in chat_stream:
+            for increment in self._increments(message):
+                increments[increment] += 1
+        with self._lock:
+            if file_id is not None:
+                if file_id in self.files:
+                    return
+                self.files.add(file_id)
+            for (dimension, key, field, value), count in increments.items():
+                self._counts[dimension][key][field][value] += count
+
+    def catch_up(
+        self,
+        load: Callable[[], Optional[Dict[str, Any]]],
+        stored_files: Callable[[], Iterable[Tuple[str, Callable[[], Sequence[Message]]]]],
+        save: Callable[[Dict[str, Any]], None],
+    ) -> int:
+        """Count the stored files the counts do not include yet, and save the counts if any were.
+
+        On first use, the state returned by `load` is loaded. `stored_files` returns the id of
+        every stored file with a callable that reads its messages, so that only the files not
+        counted yet are read. Concurrent callers wait for each other. Return the number of files
+        counted.
+        """
+        with self._build_lock:
+            if not self.built:
+                state = load()
+                if state is not None:
+                    self.load(state)
+                self.built = True
+            new_files = [
+                (file_id, read) for file_id, read in stored_files() if file_id not in self.files
+            ]
+            for file_id, read in new_files:
+                self.add(read(), file_id)
+            if new_files:
+                save(self.state())
+            return len(new_files)
+
+    def rebuild(
+        self,
+        stored_files: Iterable[Tuple[str, Callable[[], Sequence[Message]]]],
+        save: Callable[[Dict[str, Any]], None],
+    ) -> int:
+        """Replace all counts with those of the given stored files and save them.
+
+        Return the number of messages counted.
+        """
+        with self._build_lock:
+            self.clear()
+            messages = 0
+            for file_id, read in stored_files:
+                chat_stream = read()
+                self.add(chat_stream, file_id)
+                messages += len(chat_stream)
+            self.built = True
+            save(self.state())
+            return messages
+
+    def clear(self) -> None:
+        """Forget all counts."""
+        with self._lock:
+            for counts in self._counts.values():
+                counts.clear()
+            self.files.clear()
+
+    def state(self) -> Dict[str, Any]:
+        """Return the counts and the ids of the files they include, as a JSON document."""
+        with self._lock:
+            return {
+                "bucket_s": self.bucket_s,
+                "files": sorted(self.files),
+                "counts": [
+                    [dimension, key, field, value, count]
+                    for dimension, keys in self._counts.items()
+                    for key, fields in keys.items()
+                    for field, values in fields.items()
+                    for value, count in values.items()
+                ],
+            }
+
+    def load(self, state: Dict[str, Any]) -> None:
+        """Replace all counts with those of a document returned by `state`."""
+        self.clear()
+        with self._lock:
+            self.files.update(state["files"])
+            for dimension, key, field, value, count in state["counts"]:
+                self._counts[dimension][key][field][value] = count
+
+    def query(
+        self,
+        dimension: str,
+        keys: Optional[Sequence[str]] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+    ) -> Dict[str, Dict[str, Any]]:
+        """Count the messages and labels per key of a dimension, optionally only for `keys`.
+
+        For the time dimension, `start` and `end` restrict the buckets to those whose start is in
+        [start, end), given as ISO timestamps.
+        """
+        if dimension not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension {dimension!r}, expected one of {DIMENSIONS}")
+        lower, upper = _utc(start), _utc(end)
+        with self._lock:
+            counts = self._counts[dimension]
+            selected = [key for key in keys if key in counts] if keys is not None else list(counts)
+            if dimension == "time" and (lower or upper):
+                selected = [
+                    key
+                    for key in selected
+                    if (lower is None or datetime.fromisoformat(key) >= lower)
+                    and (upper is None or datetime.fromisoformat(key) < upper)
+                ]
+            result = {}
+            for key in sorted(selected):
+                fields = counts[key]
+                result[key] = {
+                    MESSAGES: fields[MESSAGES][MESSAGES],
+                    **{field: dict(fields[field]) for field in FIELDS},
+                }
+        return result
+
+
+def _utc(timestamp: Optional[str]) -> Optional[datetime]:
+    if not timestamp:
+        return None
+    parsed = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo is not None else parsed.replace(tzinfo=timezone.utc)
+
+
+def messages_from_blocks(blocks: Iterable[Block]) -> List[Message]:
+    """Messages stored by add_examples, rebuilt from the tags of their blocks."""
+    messages = []
+    for block in blocks:
+        tags = {tag.kind: tag.name for tag in block.tags or []}
+        if "message_id" not in tags or "timestamp" not in tags:
+            continue
+        messages.append(
+            Message(
+                message_id=tags["message_id"],
+                timestamp=tags["timestamp"],
+                user_id=tags.get("user_id", ""),
+                text=block.text,
+                sentiment=tags.get(SENTIMENT_TAG_KIND) or None,
+                intent=tags.get(INTENT_TAG_KIND) or None,
+                root_message_id=tags.get("root_message_id") or None,
+            )
+        )
+    return messages
+
+
+_INDEXES: Dict[Tuple[Any, ...], AggregateIndex] = {}
+_LOCK = threading.Lock()
+
+
+def aggregates_state(bucket_s: int) -> str:
+    """Name under which the counts of an index with `bucket_s` are saved in the workspace."""
+    return f"aggregates-{bucket_s}"
+
+
+def get_aggregate_index(workspace: Tuple[Any, ...], bucket_s: int) -> AggregateIndex:
+    """Process-wide aggregate index of a workspace, as identified by `plugins.client_key`."""
+    key = (*workspace, bucket_s)
+    with _LOCK:
+        if key not in _INDEXES:
+            _INDEXES[key] = AggregateIndex(bucket_s=bucket_s)
+        return _INDEXES[key]
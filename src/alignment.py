@@ -0,0 +1,154 @@
+"""Alignment of plugin tags onto the messages of a chat stream."""
+import heapq
+from collections import Counter
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from steamship import Block, Tag
+
+from api_spec import Intent, Message, Sentiment
+
+THREAD_TAG_KIND: str = "dialogue-segmentation"
+SENTIMENT_TAG_KIND: str = "sentiments"
+INTENT_TAG_KIND: str = "intent"
+
+
+def message_ranges(chat_stream: Sequence[Message]) -> List[Tuple[int, int]]:
+    """Character range of every message within the concatenated stream text.
+
+    Messages are concatenated without a separator, so every range starts where the previous one
+    ends.
+    """
+    ranges, i = [], 0
+    for message in chat_stream:
+        ranges.append((i, i + len(message.text)))
+        i += len(message.text)
+    return ranges
+
+
+def concatenate(chat_stream: Sequence[Message]) -> Tuple[str, List[Tag]]:
+    """Concatenate a chat stream into a single text with one speaker tag per message."""
+    tags = [
+        Tag(kind="speaker", start_idx=start, end_idx=end, name=message.user_id)
+        for message, (start, end) in zip(chat_stream, message_ranges(chat_stream))
+    ]
+    return "".join(message.text for message in chat_stream), tags
+
+
+def overlapping_spans(
+    ranges: Iterable[Tuple[int, int]], span_tags: Iterable[Tag]
+) -> Iterator[List[Tag]]:
+    """Yield, for every (start, end) range, the span tags that overlap it.
+
+    Ranges and spans are half-open, so a span that ends exactly where a range starts, or starts
+    exactly where it ends, does not overlap it. An empty range only overlaps the spans that
+    strictly contain its offset, so an empty message never takes the span of a neighbour.
+
+    Ranges must be sorted by start offset, which message ranges always are. Spans are swept once
+    in start order and retired from a heap keyed on their end offset, so the whole stream costs
+    O((N + S) log S) instead of rescanning every span for every message. Overlapping spans are
+    yielded in start order.
+    """
+    ordered = sorted(span_tags, key=lambda tag: tag.start_idx)
+    active: List[Tuple[int, int, Tag]] = []
+    next_span = 0
+    for start, end in ranges:
+        while next_span < len(ordered) and ordered[next_span].start_idx < end:
+            tag = ordered[next_span]
+            heapq.heappush(active, (tag.end_idx, next_span, tag))
+            next_span += 1
+        while active and active[0][0] <= start:
+            heapq.heappop(active)
+        yield [tag for _, _, tag in sorted(active, key=lambda entry: entry[1])]
+
+
+def majority_sentiment(sentiment_tags: Sequence[Tag]) -> Sentiment:
+    """Most common sentiment among the given tags, NEUTRAL if there are none."""
+    if not sentiment_tags:
+        return Sentiment.NEUTRAL
+    name = Counter(tag.name for tag in sentiment_tags).most_common(1)[0][0]
+    return Sentiment.POSITIVE if name == "POS" else Sentiment.NEGATIVE
+
+
+def block_intent(block: Block) -> Optional[Intent]:
+    """Intent predicted by the zero-shot tagger for a single message block."""
+    intent_tags = [tag for tag in block.tags or [] if tag.kind == INTENT_TAG_KIND]
+    if not intent_tags:
+        return None
+    name = intent_tags[0].name
+    return Intent(("salutation" if name == "hello" else name).title())
+
+
+def thread_starts(ranges: Sequence[Tuple[int, int]], thread_tags: Iterable[Tag]) -> List[bool]:
+    """Whether each message opens a new thread according to the dialogue segmentation spans.
+
+    A message opens a new thread when it starts at or after the end of the current segment.
+    """
+    ordered = sorted(thread_tags, key=lambda tag: tag.start_idx)
+    thread_idx = 0
+    starts = []
+    for start, _ in ranges:
+        opens_thread = thread_idx < len(ordered) and start >= ordered[thread_idx].end_idx
+        while thread_idx < len(ordered) and start >= ordered[thread_idx].end_idx:
+            thread_idx += 1
+        starts.append(opens_thread)
+    return starts
+
+
+def message_sentiments(
+    ranges: Sequence[Tuple[int, int]], sentiment_tags: Iterable[Tag]
+) -> List[Sentiment]:
+    """Majority sentiment of the spans overlapping each message."""
+    return [majority_sentiment(spans) for spans in overlapping_spans(ranges, sentiment_tags)]
+
+
+def oneai_features(
+    chat_stream: Sequence[Message], oneai_tags: Iterable[Tag]
+) -> Tuple[List[bool], List[Sentiment]]:
+    """Per-message thread starts and sentiments from the OneAI tags of the concatenated stream."""
+    oneai_tags = list(oneai_tags)
+    ranges = message_ranges(chat_stream)
+    return (
+        thread_starts(ranges, [tag for tag in oneai_tags if tag.kind == THREAD_TAG_KIND]),
+        message_sentiments(ranges, [tag for tag in oneai_tags if tag.kind == SENTIMENT_TAG_KIND]),
+    )
+
+
+def assign_threads(chat_stream: Sequence[Message], starts: Sequence[bool]) -> None:
+    """Fill in missing root_message_ids given the messages that open a new thread.
+
+    A message that opens a thread becomes its root. Caller-supplied roots are kept and carried
+    forward to the following messages of the same thread.
+    """
+    root_message_id = None
+    for message, opens_thread in zip(chat_stream, starts):
+        if opens_thread:
+            root_message_id = message.root_message_id or message.message_id
+        if message.root_message_id is None:
+            message.root_message_id = root_message_id or message.message_id
+        root_message_id = message.root_message_id
+
+
+def assign_sentiments(chat_stream: Sequence[Message], sentiments: Sequence[Sentiment]) -> None:
+    """Fill in missing sentiments."""
+    for message, sentiment in zip(chat_stream, sentiments):
+        if message.sentiment is None:
+            message.sentiment = sentiment
+
+
+def assign_intents(chat_stream: Sequence[Message], intents: Sequence[Optional[Intent]]) -> None:
+    """Fill in missing intents from the per-message intents predicted by the zero-shot tagger."""
+    for message, intent in zip(chat_stream, intents):
+        if message.intent is None:
+            message.intent = intent
+
+
+def annotate(
+    chat_stream: Sequence[Message],
+    starts: Sequence[bool],
+    sentiments: Sequence[Sentiment],
+    intents: Sequence[Optional[Intent]],
+) -> None:
+    """Apply the per-message tagger outputs to the chat stream in place."""
+    assign_threads(chat_stream, starts)
+    assign_intents(chat_stream, intents)
+    assign_sentiments(chat_stream, sentiments)
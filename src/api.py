@@ -1,32 +1,121 @@
 """App that summarizes meetings using Amazon Transcribe and OneAI skills."""
-from collections import Counter
-from itertools import zip_longest
-from typing import Any, Dict, List, Type
+import io
+import json
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from functools import partial
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Type,
+)
 
 from pydantic import parse_obj_as
-from steamship import Block, File, Steamship, Tag
-from steamship.invocable import Config, InvocableResponse, PackageService, create_handler, post
+from steamship import Block, File, PluginInstance
+from steamship.invocable import Config, InvocableResponse, PackageService, create_handler, get, post
 
+from aggregates import AggregateIndex, aggregates_state, get_aggregate_index, messages_from_blocks
+from alignment import INTENT_TAG_KIND, annotate, block_intent, concatenate, oneai_features
 from api_spec import Intent, Message, Sentiment
+from coalescing import get_coalescer
+from columnar import ARROW, MIME_TYPES, check_format, to_bytes
+from compact import compact_stream, supplied_fields
+from fast_path import dump_messages, parse_messages
+from ingest import chunked, example_key, get_example_index, ingest
+from intent_cache import IntentCache, cache_namespace, deduplicate, get_intent_cache
+from local_intent import (
+    LOCAL_INTENT_STATE,
+    LocalIntentClassifier,
+    get_local_intent_classifier,
+    labeled_examples,
+    set_local_intent_classifier,
+)
+from metrics import REGISTRY, RequestMetrics
+from orchestration import Deadline, PendingTask, wait_all
+from planner import WorkPlan
+from plugins import client_key, use_plugin
+from prethreading import certain_starts, needs_segmentation, segments
+from profiling import capture, sampled
+from scheduling import DEFAULT_LANE, get_lane_scheduler, parse_lane
+from sessions import MessageMemo, get_message_memo, get_session_store, message_key
+from streaming import read_ndjson, write_ndjson
+from tiers import DEFAULT_TIER, TIERS, ModelTier, parse_tiers, select_tier
+from windowing import pack_windows, split_windows, stitch
+from workspace_state import load_state, save_state
 
 PRIORITY_LABEL: str = "priority"
-HF_MODEL_PATH: str = "typeform/distilbert-base-uncased-mnli"
+HF_MODEL_PATH: str = TIERS[DEFAULT_TIER].hf_model_path
+
+
+class ChatAnalyticsConfig(Config):
+    """Config used to initialize a ChatAnalyticsPackage."""
+
+    intent_cache_size: int = 10000
+    intent_cache_path: Optional[str] = None
+    intent_cache_max_rows: int = 1000000
+    window_max_messages: int = 1000
+    window_max_chars: int = 100000
+    window_overlap: int = 20
+    max_in_flight_windows: int = 4
+    session_tail_size: int = 20
+    session_ttl_s: float = 3600
+    max_sessions: int = 10000
+    fast_path: bool = False
+    examples_chunk_size: int = 500
+    max_in_flight_uploads: int = 4
+    upload_retries: int = 3
+    upload_backoff_s: float = 0.5
+    examples_index_path: Optional[str] = None
+    latency_budget_s: float = 60
+    poll_initial_delay_s: float = 0.05
+    poll_max_delay_s: float = 1.0
+    response_metrics: bool = False
+    local_intent_threshold: float = 0.9
+    prethread_max_gap_s: Optional[float] = 3600
+    aggregate_bucket_s: int = 3600
+    memo_ttl_s: float = 300
+    memo_max_messages: int = 100000
+    ndjson_batch_size: int = 500
+    coalesce_wait_s: float = 0
+    coalesce_max_messages: int = 1000
+    max_in_flight_requests: int = 0
+    max_in_flight_normal_priority: int = 12
+    max_in_flight_low_priority: int = 4
+    intent_tiers: str = DEFAULT_TIER
+    profile_dir: Optional[str] = None
+    profile_sample_rate: float = 0
 
 
 class ChatAnalyticsPackage(PackageService):
     """App that transcribes and summarizes audio using Amazon Transcribe and OneAI skills."""
 
+    config: ChatAnalyticsConfig
+
     def config_cls(self) -> Type[Config]:
         """Config used to initialize a ChatAnalyticsPackage."""
-        return Config
+        return ChatAnalyticsConfig
 
     ONEAI_TAGGER_HANDLE = "oneai-tagger"
+    ONEAI_SENTIMENT_TAGGER_HANDLE = "oneai-tagger-sentiments"
     ZERO_SHOT_TAGGER_HANDLE = "zero-shot-tagger-default"
 
-    def __init__(self, client: Steamship = None, config: Dict[str, Any] = None):
-        super().__init__(client, config)
-
-        self.oneai_tagger = client.use_plugin(
+    @property
+    def oneai_tagger(self) -> PluginInstance:
+        """Tagger of OneAI dialogue segmentation and sentiments, bound on first use."""
+        return use_plugin(
+            self.client,
             plugin_handle=self.ONEAI_TAGGER_HANDLE,
             instance_handle=self.ONEAI_TAGGER_HANDLE + "1",
             config={
@@ -34,146 +123,1057 @@ class ChatAnalyticsPackage(PackageService):
             },
         )
 
-        self.intent_tagger = client.use_plugin(
+    @property
+    def oneai_sentiment_tagger(self) -> PluginInstance:
+        """Tagger of OneAI sentiments only, for pre-threaded segments, bound on first use."""
+        return use_plugin(
+            self.client,
+            plugin_handle=self.ONEAI_TAGGER_HANDLE,
+            instance_handle=self.ONEAI_SENTIMENT_TAGGER_HANDLE + "1",
+            config={
+                "skills": "sentiments",
+            },
+        )
+
+    @property
+    def intent_tagger(self) -> PluginInstance:
+        """Zero-shot intent tagger of the default model tier, bound on first use."""
+        return self._intent_tagger(TIERS[DEFAULT_TIER])
+
+    def _intent_tagger(self, tier: ModelTier) -> PluginInstance:
+        """Zero-shot intent tagger of a model tier, bound on first use."""
+        return use_plugin(
+            self.client,
             plugin_handle=self.ZERO_SHOT_TAGGER_HANDLE,
-            instance_handle=self.ZERO_SHOT_TAGGER_HANDLE + "1",
+            instance_handle=self._intent_plugin_name(tier) + "1",
             config={
-                "hf_model_path": HF_MODEL_PATH,
-                "labels": "hello,praise,complaint,question,request,explanation",
+                "hf_model_path": tier.hf_model_path,
+                "labels": ",".join(tier.labels),
                 "tag_kind": "intent",
                 "multi_label": False,
                 "use_gpu": False,
             },
         )
 
+    def _intent_plugin_name(self, tier: ModelTier) -> str:
+        # The default tier keeps the instance handle deployments already have.
+        if tier.name == DEFAULT_TIER:
+            return self.ZERO_SHOT_TAGGER_HANDLE
+        return f"{self.ZERO_SHOT_TAGGER_HANDLE}-{tier.name}"
+
     @post("analyze")
-    def analyze(self, chat_stream: List[Dict[str, Any]]) -> InvocableResponse[List[Message]]:
-        """Analyze a stream of chat messages and add useful features."""
-        chat_stream = self._parse_input(chat_stream)
-
-        tags, text = [], []
-        i = 0
-        for message in chat_stream:
-            text.append(message.text)
-            message_length = len(message.text)
-            tags.append(
-                Tag(
-                    kind="speaker",
-                    start_idx=i,
-                    end_idx=i + message_length,
-                    name=message.user_id,
+    def analyze(
+        self,
+        chat_stream: List[Dict[str, Any]],
+        latency_budget_s: Optional[float] = None,
+        priority: Optional[str] = None,
+        compact: bool = False,
+        profile: bool = False,
+        format: Optional[str] = None,
+    ) -> InvocableResponse[List[Message]]:
+        """Analyze a stream of chat messages and add useful features.
+
+        Messages already analyzed by a recent call that overlaps this one are reused, and only
+        the messages after them are tagged, with their tail as context.
+        `latency_budget_s` overrides the configured time the plugins are given to respond, and
+        `priority` ("high", "normal" or "low") picks the lane the request queues in for them.
+        With `compact`, only the message ids and the inferred fields are returned, each field as
+        [value, count] runs over the messages. With `profile`, the call is profiled and the
+        response names the directory of the reports.
+        With `format` ("arrow" or "parquet"), the analyzed messages are returned as a columnar
+        file, laid out as by export_examples, instead of JSON. The file only holds the messages,
+        so it cannot be combined with `compact` or `profile`, and fields that fell back to
+        defaults are logged instead of flagged.
+        """
+        if format is not None:
+            check_format(format)
+            if compact or profile:
+                raise ValueError("A columnar format cannot be combined with compact or profile")
+        with self._profiling("analyze", profile) as profile_path:
+            return self._analyze(
+                chat_stream, latency_budget_s, priority, compact, profile_path, format
+            )
+
+    def _analyze(
+        self,
+        chat_stream: List[Dict[str, Any]],
+        latency_budget_s: Optional[float],
+        priority: Optional[str],
+        compact: bool,
+        profile_path: Optional[str],
+        format: Optional[str] = None,
+    ) -> InvocableResponse[List[Message]]:
+        """Body of analyze, naming the directory of its profile reports if it is profiled."""
+        lane = parse_lane(priority)
+        metrics = RequestMetrics()
+        with metrics.stage("parse"):
+            chat_stream = self._parse_stream(chat_stream)
+            supplied = supplied_fields(chat_stream) if compact else None
+            keys = [message_key(item) for item in self._dump_stream(chat_stream)]
+            memo = self._message_memo()
+            remembered = memo.get_many(keys) if memo is not None else [None] * len(chat_stream)
+            reused = next(
+                (idx for idx, message in enumerate(remembered) if message is None), len(keys)
+            )
+            context = remembered[max(0, reused - self.config.session_tail_size) : reused]
+        metrics.count("memo_hits", reused)
+        metrics.count("memo_misses", len(chat_stream) - reused)
+
+        degraded = {}
+        if reused < len(chat_stream):
+            degraded = self._annotate(
+                chat_stream[reused:],
+                context=context,
+                latency_budget_s=latency_budget_s,
+                metrics=metrics,
+                lane=lane,
+            )
+        chat_stream = remembered[:reused] + chat_stream[reused:]
+        if memo is not None:
+            fallbacks = {message_id for ids in degraded.values() for message_id in ids}
+            memo.put_many(
+                (key, message)
+                for key, message in zip(keys[reused:], chat_stream[reused:])
+                if message.message_id not in fallbacks
+            )
+
+        if format is not None:
+            if degraded:
+                logging.warning(f"Fields fell back to defaults in a columnar response: {degraded}")
+            with metrics.stage("serialize"):
+                body = to_bytes(chat_stream, format)
+            metrics.export("analyze")
+            return InvocableResponse(_bytes=body, mime_type=MIME_TYPES[format])
+        with metrics.stage("serialize"):
+            response = self._stream_response(chat_stream, degraded, supplied)
+        if profile_path is not None:
+            response["profile"] = profile_path
+        return self._respond("analyze", response, metrics)
+
+    @post("analyze_session")
+    def analyze_session(
+        self,
+        session_id: str,
+        chat_stream: List[Dict[str, Any]],
+        latency_budget_s: Optional[float] = None,
+        priority: Optional[str] = None,
+        compact: bool = False,
+        session_tail: Optional[List[Dict[str, Any]]] = None,
+    ) -> InvocableResponse[List[Message]]:
+        """Analyze the messages newly appended to a live chat session.
+
+        Only the new messages are tagged, together with a short tail of the session's earlier
+        messages that gives the dialogue segmentation its context and carries the current thread.
+        The response's `session` holds the new tail, and whether an earlier tail was `found`, in
+        this process or in `session_tail`. The tail is only kept in the memory of the process that served the call, so
+        callers pass it back as `session_tail` for the next call to continue the same threads
+        wherever it runs; without it, a call that reaches a fresh process starts new threads.
+        """
+        lane = parse_lane(priority)
+        metrics = RequestMetrics()
+        with metrics.stage("parse"):
+            chat_stream = self._parse_stream(chat_stream)
+            supplied = supplied_fields(chat_stream) if compact else None
+            context = self._parse_stream(session_tail) if session_tail is not None else None
+        sessions = get_session_store(
+            client_key(self.client),
+            ttl_s=self.config.session_ttl_s,
+            max_sessions=self.config.max_sessions,
+        )
+
+        if context is None:
+            context = sessions.find(session_id)
+        found = context is not None
+        context = context or []
+        degraded = self._annotate(
+            chat_stream,
+            context=context,
+            latency_budget_s=latency_budget_s,
+            metrics=metrics,
+            lane=lane,
+        )
+        tail = sessions.update(
+            session_id, context + chat_stream, tail_size=self.config.session_tail_size
+        )
+
+        with metrics.stage("serialize"):
+            response = self._stream_response(chat_stream, degraded, supplied)
+            response["session"] = {"found": found, "tail": self._dump_stream(tail)}
+        return self._respond("analyze_session", response, metrics)
+
+    @post("batch_analyze")
+    def batch_analyze(
+        self,
+        conversations: List[List[Dict[str, Any]]],
+        latency_budget_s: Optional[float] = None,
+        priority: Optional[str] = None,
+        compact: bool = False,
+    ) -> InvocableResponse[List[List[Message]]]:
+        """Analyze many independent conversations, sharing plugin submissions between them."""
+        lane = parse_lane(priority)
+        metrics = RequestMetrics()
+        with metrics.stage("parse"):
+            conversations = [self._parse_stream(chat_stream) for chat_stream in conversations]
+            supplied = [
+                supplied_fields(chat_stream) if compact else None for chat_stream in conversations
+            ]
+
+        degraded = self._annotate_streams(
+            conversations, latency_budget_s=latency_budget_s, metrics=metrics, lane=lane
+        )
+
+        with metrics.stage("serialize"):
+            response = {
+                "conversations": [
+                    self._stream_response(chat_stream, stream_degraded, stream_supplied)
+                    for chat_stream, stream_degraded, stream_supplied in zip(
+                        conversations, degraded, supplied
+                    )
+                ]
+            }
+        return self._respond("batch_analyze", response, metrics)
+
+    @post("analyze_ndjson")
+    def analyze_ndjson(
+        self, ndjson: str, latency_budget_s: Optional[float] = None, priority: Optional[str] = None
+    ) -> InvocableResponse[str]:
+        """Analyze a chat stream given as newline-delimited JSON, one message per line.
+
+        Messages are analyzed in batches of `ndjson_batch_size` and returned in the same format.
+        The package service returns whole response bodies, so the whole output is joined into one
+        string and memory still grows with the size of the stream. Only in-process callers of
+        `stream_analyze` get output, and memory, bounded by the batch size.
+        """
+        return InvocableResponse(
+            string="".join(self.stream_analyze(io.StringIO(ndjson), latency_budget_s, priority))
+        )
+
+    def stream_analyze(
+        self,
+        lines: Iterable[str],
+        latency_budget_s: Optional[float] = None,
+        priority: Optional[str] = None,
+    ) -> Iterator[str]:
+        """Analyze NDJSON lines lazily, yielding the annotated messages as each batch finishes.
+
+        Only one batch is held in memory at a time. Each batch is tagged with the last
+        `session_tail_size` messages of the previous one as context, so that threads continue
+        across batches. `latency_budget_s` applies to every batch.
+        """
+        lane = parse_lane(priority)
+        metrics = RequestMetrics()
+        context: List[Message] = []
+        for items in chunked(read_ndjson(lines), self.config.ndjson_batch_size):
+            with metrics.stage("parse"):
+                chat_stream = self._parse_stream(items)
+            degraded = self._annotate(
+                chat_stream,
+                context=context,
+                latency_budget_s=latency_budget_s,
+                metrics=metrics,
+                lane=lane,
+            )
+            if degraded:
+                logging.warning(f"Fields fell back to defaults while streaming: {degraded}")
+            tail_start = max(0, len(context) + len(chat_stream) - self.config.session_tail_size)
+            context = (context + chat_stream)[tail_start:]
+            with metrics.stage("serialize"):
+                lines_out = list(write_ndjson(self._dump_stream(chat_stream)))
+            yield from lines_out
+        metrics.export("analyze_ndjson")
+
+    @get("metrics")
+    def metrics(self) -> InvocableResponse[str]:
+        """Histograms of the stage timings and sizes of all requests, in Prometheus text format."""
+        return InvocableResponse(string=REGISTRY.render())
+
+    def _profiling(self, endpoint: str, requested: bool) -> ContextManager[Optional[str]]:
+        """Profile an invocation if requested or sampled, yielding where its reports are written.
+
+        Unprofiled invocations only pay for the sampling decision.
+        """
+        if not sampled(requested, self.config.profile_sample_rate):
+            return nullcontext()
+        directory = self.config.profile_dir or os.path.join(tempfile.gettempdir(), "profiles")
+        return self._profile_capture(directory, endpoint)
+
+    @staticmethod
+    @contextmanager
+    def _profile_capture(directory: str, endpoint: str) -> Iterator[Optional[str]]:
+        with capture(directory, endpoint) as path:
+            if path is not None:
+                logging.info(f"Profiling {endpoint} into {path}")
+            yield path
+
+    def _respond(
+        self, endpoint: str, response: Dict[str, Any], metrics: RequestMetrics
+    ) -> InvocableResponse:
+        """Record the metrics of a request and attach them to its response."""
+        metrics.export(endpoint)
+        return InvocableResponse(json=self._attach_metrics(response, metrics))
+
+    def _attach_metrics(self, response: Dict[str, Any], metrics: RequestMetrics) -> Dict[str, Any]:
+        """Attach the metrics of a request to its response if so configured.
+
+        The work planned and skipped because the caller supplied fields, and the share of the
+        inferred intents answered by another message with the same text, are always attached.
+        """
+        summary = metrics.dict()
+        if summary["plan"]:
+            response["plan"] = summary["plan"]
+        if "intent_dedup" in summary["ratios"]:
+            response["intent_dedup"] = summary["ratios"]["intent_dedup"]
+        if self.config.response_metrics:
+            response["metrics"] = summary
+        return response
+
+    def _stream_response(
+        self,
+        chat_stream: List[Message],
+        degraded: Dict[str, List[str]],
+        supplied: Optional[List[Set[str]]] = None,
+    ) -> Dict[str, Any]:
+        """Response for an analyzed stream, flagging fields a plugin could not provide in time.
+
+        Given the fields the caller supplied per message, the response is compact.
+        """
+        if supplied is not None:
+            response = compact_stream(chat_stream, supplied)
+        else:
+            response = {"chat_stream": self._dump_stream(chat_stream)}
+        if degraded:
+            response["degraded"] = degraded
+        return response
+
+    def _annotate(
+        self,
+        chat_stream: List[Message],
+        context: Sequence[Message] = (),
+        latency_budget_s: Optional[float] = None,
+        metrics: Optional[RequestMetrics] = None,
+        lane: str = DEFAULT_LANE,
+    ) -> Dict[str, List[str]]:
+        """Tag a chat stream and fill in its missing fields in place.
+
+        `context` holds already analyzed messages that precede the stream. They are sent to the
+        dialogue segmentation so that threads continue across calls, but are not tagged again.
+        Returns the ids of the messages left with a default value, per field.
+
+        If `coalesce_wait_s` is set, concurrent calls are held for up to that long, or until
+        they add up to `coalesce_max_messages`, and tagged together in shared submissions. Only
+        calls served by the same process at once are merged, so this only helps hosts that serve
+        concurrent calls from one long-lived process.
+        """
+        if self.config.coalesce_wait_s <= 0:
+            return self._annotate_streams(
+                [chat_stream], [context], latency_budget_s, metrics, lane=lane
+            )[0]
+        coalescer = get_coalescer(
+            (*client_key(self.client), self.config.json(sort_keys=True), lane),
+            max_wait_s=self.config.coalesce_wait_s,
+            max_size=self.config.coalesce_max_messages,
+        )
+        degraded, shared_metrics = coalescer.submit(
+            (chat_stream, context, latency_budget_s),
+            len(chat_stream),
+            partial(self._annotate_coalesced, lane=lane),
+        )
+        if metrics is not None:
+            metrics.merge(shared_metrics)
+        return degraded
+
+    def _annotate_coalesced(
+        self,
+        requests: List[Tuple[List[Message], Sequence[Message], Optional[float]]],
+        lane: str = DEFAULT_LANE,
+    ) -> List[Tuple[Dict[str, List[str]], RequestMetrics]]:
+        """Tag the chat streams of a coalesced batch, within the tightest of their budgets."""
+        budgets = [budget for _, _, budget in requests if budget is not None]
+        metrics = RequestMetrics()
+        metrics.count("coalesced_requests", len(requests))
+        degraded = self._annotate_streams(
+            [chat_stream for chat_stream, _, _ in requests],
+            [context for _, context, _ in requests],
+            min(budgets) if budgets else None,
+            metrics,
+            lane=lane,
+        )
+        # Exported once for the batch; every caller only merges it into its own response.
+        metrics.export("coalesced")
+        return [(stream_degraded, metrics) for stream_degraded in degraded]
+
+    def _annotate_streams(
+        self,
+        chat_streams: List[List[Message]],
+        contexts: Optional[List[Sequence[Message]]] = None,
+        latency_budget_s: Optional[float] = None,
+        metrics: Optional[RequestMetrics] = None,
+        lane: str = DEFAULT_LANE,
+    ) -> List[Dict[str, List[str]]]:
+        """Tag several independent chat streams at once and fill in their fields in place.
+
+        Streams are first cut at certain thread starts, and only the segments whose threads are
+        still ambiguous are sent to dialogue segmentation. The windows of all streams are packed
+        into as few OneAI submissions as the window budget allows, one block per window, and all
+        messages share the intent submissions. Every task
+        is submitted up front and all are polled together until the latency budget runs out.
+        Messages whose task missed it or failed get a NEUTRAL sentiment, a thread of their own or
+        no intent, and their ids are returned per stream and field.
+
+        Submitting and polling happen while holding a slot of the request's priority `lane`.
+        """
+        if latency_budget_s is None:
+            latency_budget_s = self.config.latency_budget_s
+        deadline = Deadline(latency_budget_s)
+        metrics = metrics or RequestMetrics()
+        with metrics.stage("plan"):
+            contexts = contexts or [()] * len(chat_streams)
+            streams = [
+                list(context) + chat_stream for context, chat_stream in zip(contexts, chat_streams)
+            ]
+            messages = [message for chat_stream in chat_streams for message in chat_stream]
+            plan = WorkPlan(messages)
+            needs_oneai = iter(plan.needs_oneai)
+            stream_needs_oneai = [
+                [False] * len(context) + [next(needs_oneai) for _ in chat_stream]
+                for context, chat_stream in zip(contexts, chat_streams)
+            ]
+
+            stream_certain_starts = [
+                certain_starts(stream, self.config.prethread_max_gap_s) for stream in streams
+            ]
+            units, unit_segmented = self._plan_units(streams, stream_certain_starts)
+            tagged_units = []
+            for idx, (stream_idx, start, end) in enumerate(units):
+                tagged = any(stream_needs_oneai[stream_idx][start:end])
+                plan.record_window(tagged)
+                if tagged:
+                    tagged_units.append(idx)
+            tagged_windows = [
+                streams[units[idx][0]][units[idx][1] : units[idx][2]] for idx in tagged_units
+            ]
+            batches = self._pack_windows(
+                tagged_windows, [unit_segmented[idx] for idx in tagged_units]
+            )
+
+            intent_messages = [
+                message for message, needed in zip(messages, plan.needs_intent) if needed
+            ]
+            tier = select_tier(
+                parse_tiers(self.config.intent_tiers), len(intent_messages), deadline.remaining()
+            )
+            intent_cache = self._intent_cache(tier)
+            cached_intents = intent_cache.get_many([message.text for message in intent_messages])
+            known_intents = self._predict_intents_locally(intent_messages, cached_intents, metrics)
+            intent_misses = [
+                message for message, intent in zip(intent_messages, known_intents) if intent is None
+            ]
+            unique, miss_slots = deduplicate(
+                [message.text for message in intent_misses], uncased=tier.uncased
+            )
+            intent_blocks = [intent_misses[idx] for idx in unique]
+            intent_chunks = self._split_windows(intent_blocks)
+        metrics.count("messages", len(messages))
+        metrics.count("characters", sum(len(message.text) for message in messages))
+        metrics.count("context_messages", sum(len(context) for context in contexts))
+        metrics.count("oneai_windows", len(tagged_windows))
+        metrics.count("oneai_submissions", len(batches))
+        metrics.count(
+            "segmentation_messages",
+            sum(
+                len(tagged_windows[idx])
+                for segmented, batch in batches
+                if segmented
+                for idx in batch
+            ),
+        )
+        metrics.count("intent_cache_hits", sum(intent is not None for intent in cached_intents))
+        metrics.count("intent_blocks", len(intent_blocks))
+        metrics.count("intent_submissions", len(intent_chunks))
+        metrics.ratio("intent_dedup", len(intent_misses) - len(intent_blocks), len(intent_misses))
+
+        with self._lane_slot(lane, deadline, metrics) as admitted:
+            with metrics.stage("submit"):
+                with ThreadPoolExecutor(max_workers=self.config.max_in_flight_windows) as executor:
+                    window_tasks = list(
+                        executor.map(
+                            lambda batch: self._submit_windows(
+                                [tagged_windows[idx] for idx in batch[1]],
+                                metrics,
+                                segment=batch[0],
+                                admitted=admitted,
+                            ),
+                            batches,
+                        )
+                    )
+                    intent_tasks = list(
+                        executor.map(
+                            lambda chunk: self._submit_intents(
+                                intent_blocks[chunk[0] : chunk[1]], metrics, tier, admitted
+                            ),
+                            intent_chunks,
+                        )
+                    )
+            with metrics.stage("plugins"):
+                wait_all(
+                    window_tasks + intent_tasks,
+                    deadline,
+                    initial_delay_s=self.config.poll_initial_delay_s,
+                    max_delay_s=self.config.poll_max_delay_s,
+                )
+        metrics.record_tasks(window_tasks + intent_tasks)
+
+        with metrics.stage("align"):
+            unit_features = [
+                ([False] * (end - start), [Sentiment.NEUTRAL] * (end - start))
+                for _, start, end in units
+            ]
+            unit_missed = [[False] * (end - start) for _, start, end in units]
+            for (_, batch), task in zip(batches, window_tasks):
+                windows = [tagged_windows[idx] for idx in batch]
+                for idx, features in zip(batch, self._window_features(windows, task)):
+                    unit_features[tagged_units[idx]] = features
+                    unit_missed[tagged_units[idx]] = [not task.succeeded] * len(tagged_windows[idx])
+
+            resolved = iter(
+                zip(
+                    *self._collect_intents(
+                        intent_cache,
+                        known_intents,
+                        intent_blocks,
+                        miss_slots,
+                        intent_chunks,
+                        intent_tasks,
+                    )
                 )
             )
-            i += message_length
+            intents, intents_missed = [], []
+            for needed in plan.needs_intent:
+                intent, missed = next(resolved) if needed else (None, False)
+                intents.append(intent)
+                intents_missed.append(missed)
 
-        single_block_file = File(
-            blocks=[
-                Block(
-                    text="".join(text),
-                    tags=tags,
+            metrics.record_plan(plan.summary())
+            logging.info(
+                f"Analyzed {len(messages)} messages of {len(chat_streams)} streams "
+                f"in {len(batches)} OneAI submissions: {metrics.plan}, "
+                f"plugins: {metrics.plugins}"
+            )
+
+            stream_windows: List[List[Tuple[int, int]]] = [[] for _ in streams]
+            stream_features: List[List[Tuple[List[bool], List[Sentiment]]]] = [[] for _ in streams]
+            stream_missed: List[List[List[bool]]] = [[] for _ in streams]
+            for (stream_idx, start, end), features, missed in zip(
+                units, unit_features, unit_missed
+            ):
+                stream_windows[stream_idx].append((start, end))
+                stream_features[stream_idx].append(features)
+                stream_missed[stream_idx].append(missed)
+
+            degraded = []
+            offset = 0
+            for context, chat_stream, stream, windows, features, missed, certain in zip(
+                contexts,
+                chat_streams,
+                streams,
+                stream_windows,
+                stream_features,
+                stream_missed,
+                stream_certain_starts,
+            ):
+                starts = [
+                    opens_thread or certainly_opens_thread
+                    for opens_thread, certainly_opens_thread in zip(
+                        stitch(windows, [starts for starts, _ in features]), certain
+                    )
+                ]
+                sentiments = stitch(windows, [sentiments for _, sentiments in features])
+                oneai_missed = stitch(windows, missed)[len(context) :]
+                stream_intents = intents[offset : offset + len(chat_stream)]
+                annotate(stream, starts, sentiments, [None] * len(context) + stream_intents)
+
+                degraded.append(
+                    self._degraded_fields(
+                        chat_stream,
+                        oneai_missed,
+                        plan.needs_sentiment[offset : offset + len(chat_stream)],
+                        plan.needs_thread[offset : offset + len(chat_stream)],
+                        intents_missed[offset : offset + len(chat_stream)],
+                    )
                 )
-            ],
+                offset += len(chat_stream)
+        return degraded
+
+    def _predict_intents_locally(
+        self,
+        chat_stream: List[Message],
+        cached_intents: List[Optional[Intent]],
+        metrics: RequestMetrics,
+    ) -> List[Optional[Intent]]:
+        """Fill in the cache misses the local classifier is confident about."""
+        misses = [
+            message.text for message, intent in zip(chat_stream, cached_intents) if intent is None
+        ]
+        if not misses or self.config.local_intent_threshold > 1:
+            return cached_intents
+        classifier = self._local_intent_classifier()
+        local_iter = iter(classifier.predict(misses, threshold=self.config.local_intent_threshold))
+        known_intents = [
+            next(local_iter) if intent is None else intent for intent in cached_intents
+        ]
+        local_hits = sum(intent is not None for intent in known_intents) - sum(
+            intent is not None for intent in cached_intents
         )
+        metrics.count("intent_local_candidates", len(misses))
+        metrics.count("intent_local_hits", local_hits)
+        return known_intents
 
-        multi_block_file = File(
-            blocks=[
-                Block.CreateRequest(
-                    text=message.text,
-                )
-                for message in chat_stream
-            ],
+    @post("train_intent_classifier")
+    def train_intent_classifier(self) -> InvocableResponse:
+        """Retrain the local intent classifier on the examples added with add_examples.
+
+        Messages the classifier is confident about are no longer sent to the zero-shot tagger.
+        """
+        response = File.query(
+            self.client, tag_filter_query=f'blocktag and kind "{INTENT_TAG_KIND}"'
+        )
+        examples = labeled_examples(
+            file if file.blocks else file.refresh() for file in response.files
+        )
+
+        previous = self._local_intent_classifier()
+        classifier = LocalIntentClassifier()
+        report = classifier.fit(examples)
+        save_state(self.client, LOCAL_INTENT_STATE, classifier.state())
+        set_local_intent_classifier(client_key(self.client), classifier)
+        report["previous_hit_rate"] = previous.hit_rate
+        logging.info(f"Retrained the local intent classifier: {report}")
+        return InvocableResponse(json=report)
+
+    def _local_intent_classifier(self) -> LocalIntentClassifier:
+        return get_local_intent_classifier(
+            client_key(self.client), load=partial(load_state, self.client, LOCAL_INTENT_STATE)
         )
 
-        tag_result_oneai_task = self.oneai_tagger.tag(doc=single_block_file)
-        tag_result_intent_task = self.intent_tagger.tag(doc=multi_block_file)
+    def _collect_intents(
+        self,
+        intent_cache: IntentCache,
+        known_intents: List[Optional[Intent]],
+        blocks: List[Message],
+        slots: List[int],
+        chunks: List[Tuple[int, int]],
+        tasks: List[PendingTask],
+    ) -> Tuple[List[Optional[Intent]], List[bool]]:
+        """Intent of every message, already known or from the intent tasks, and whether it missed.
 
-        tag_result_oneai_task.wait()
-        single_block_file = tag_result_oneai_task.output.file
+        `blocks` holds one message per distinct text without a known intent, and `slots` the
+        block each such message maps to, in order. `chunks` partition the blocks as submitted,
+        and the intents the tasks predicted for them are added to `intent_cache`.
+        """
+        predicted: List[Optional[Intent]] = []
+        missed: List[bool] = []
+        for (start, end), task in zip(chunks, tasks):
+            if task.succeeded:
+                predicted.extend(block_intent(block) for block in task.output_file.blocks)
+            else:
+                predicted.extend([None] * (end - start))
+            missed.extend([not task.succeeded] * (end - start))
+        intent_cache.put_many(
+            (message.text, intent)
+            for message, intent in zip(blocks, predicted)
+            if intent is not None
+        )
 
-        tag_result_intent_task.wait()
-        multi_block_file = tag_result_intent_task.output.file
+        predicted_iter = ((predicted[slot], missed[slot]) for slot in slots)
+        intents, intents_missed = [], []
+        for intent in known_intents:
+            intent, intent_missed = (intent, False) if intent is not None else next(predicted_iter)
+            intents.append(intent)
+            intents_missed.append(intent_missed)
+        return intents, intents_missed
 
-        thread_tags = sorted(
-            [
-                tag
-                for tag in single_block_file.blocks[0].tags
-                if tag.kind == "dialogue-segmentation"
+    @staticmethod
+    def _degraded_fields(
+        chat_stream: List[Message],
+        oneai_missed: List[bool],
+        needs_sentiment: List[bool],
+        needs_thread: List[bool],
+        intent_missed: List[bool],
+    ) -> Dict[str, List[str]]:
+        """Ids of the messages whose inferred fields fell back to defaults, per field."""
+        fields = {
+            "sentiment": [
+                missed and needed for missed, needed in zip(oneai_missed, needs_sentiment)
             ],
-            key=lambda x: x.start_idx,
-        )
-        sentiment_tags = sorted(
-            [tag for tag in single_block_file.blocks[0].tags if tag.kind == "sentiments"],
-            key=lambda x: x.start_idx,
-        )
-        i = 0
-        thread_idx = 0
-        root_message_id = None
-        for message, message_block in zip_longest(chat_stream, multi_block_file.blocks):
-            if i > thread_tags[thread_idx].end_idx:
-                thread_idx += 1
-                root_message_id = (
-                    message.message_id
-                    if message.root_message_id is None
-                    else message.root_message_id
-                )
-            if message.root_message_id is None:
-                message.root_message_id = root_message_id or message.message_id
+            "root_message_id": [
+                missed and needed for missed, needed in zip(oneai_missed, needs_thread)
+            ],
+            "intent": intent_missed,
+        }
+        degraded = {
+            field: [message.message_id for message, flag in zip(chat_stream, flags) if flag]
+            for field, flags in fields.items()
+        }
+        return {field: ids for field, ids in degraded.items() if ids}
+
+    def _split_windows(self, chat_stream: List[Message], overlap: int = 0) -> List[Tuple[int, int]]:
+        return split_windows(
+            chat_stream,
+            max_messages=self.config.window_max_messages,
+            max_chars=self.config.window_max_chars,
+            overlap=overlap,
+        )
+
+    def _plan_units(
+        self, streams: List[List[Message]], stream_certain_starts: List[List[bool]]
+    ) -> Tuple[List[Tuple[int, int, int]], List[bool]]:
+        """Windows of every stream for OneAI as (stream, start, end), and whether they are segmented.
+
+        Windows never cross a certain thread start, and only segmented ones overlap.
+        """
+        units: List[Tuple[int, int, int]] = []
+        unit_segmented: List[bool] = []
+        for stream_idx, stream in enumerate(streams):
+            for region_start, region_end, segmented in self._regions(
+                stream, stream_certain_starts[stream_idx]
+            ):
+                overlap = self.config.window_overlap if segmented else 0
+                for start, end in self._split_windows(
+                    stream[region_start:region_end], overlap=overlap
+                ):
+                    units.append((stream_idx, region_start + start, region_start + end))
+                    unit_segmented.append(segmented)
+        return units, unit_segmented
+
+    def _pack_windows(
+        self, windows: List[List[Message]], segmented: List[bool]
+    ) -> List[Tuple[bool, List[int]]]:
+        """Pack windows into OneAI submissions, segmented and sentiment-only ones separately."""
+        batches: List[Tuple[bool, List[int]]] = []
+        for segment in (True, False):
+            kind = [idx for idx, flag in enumerate(segmented) if flag == segment]
+            sizes = [
+                (len(windows[idx]), sum(len(message.text) for message in windows[idx]))
+                for idx in kind
+            ]
+            for batch in pack_windows(
+                sizes,
+                max_messages=self.config.window_max_messages,
+                max_chars=self.config.window_max_chars,
+            ):
+                batches.append((segment, [kind[idx] for idx in batch]))
+        return batches
+
+    def _regions(
+        self, chat_stream: List[Message], certain: List[bool]
+    ) -> List[Tuple[int, int, bool]]:
+        """Pre-threaded [start, end) regions of a stream and whether they need segmentation.
+
+        Every segment between certain thread starts whose threads are still ambiguous is a
+        region of its own. Runs of the other segments only need sentiments and are merged.
+        """
+        regions: List[Tuple[int, int, bool]] = []
+        for start, end in segments(certain):
+            segmented = needs_segmentation(chat_stream[start:end])
+            if regions and not segmented and not regions[-1][2]:
+                regions[-1] = (regions[-1][0], end, False)
             else:
-                root_message_id = message.root_message_id
-
-            if message.intent is None:
-                intent_tags = [tag for tag in message_block.tags if tag.kind == "intent"]
-                if intent_tags:
-                    intent_tag = intent_tags[0]
-                    intent_tag.name = (
-                        "salutation" if intent_tag.name == "hello" else intent_tag.name
+                regions.append((start, end, segmented))
+        return regions
+
+    def _submit_windows(
+        self,
+        windows: List[List[Message]],
+        metrics: RequestMetrics,
+        segment: bool = True,
+        admitted: bool = True,
+    ) -> PendingTask:
+        """Submit windows for sentiment analysis, and dialogue segmentation if `segment`.
+
+        One block is submitted per window. Unless the request was `admitted` to its lane, nothing
+        is submitted and the task misses the deadline.
+        """
+        if not admitted:
+            return PendingTask.not_submitted(
+                self.ONEAI_TAGGER_HANDLE if segment else self.ONEAI_SENTIMENT_TAGGER_HANDLE
+            )
+        with metrics.stage("build_files"):
+            blocks = []
+            for window in windows:
+                text, speaker_tags = concatenate(window)
+                blocks.append(
+                    Block(
+                        text=text,
+                        tags=speaker_tags,
                     )
-                    message.intent = Intent(intent_tag.name.title())
+                )
 
-            if message.sentiment is None:
-                local_sentiment_tags = [
-                    sentiment_tag
-                    for sentiment_tag in sentiment_tags
-                    if sentiment_tag.start_idx - len(message.text) <= i <= sentiment_tag.end_idx
-                ]
-                if local_sentiment_tags:
-                    sentiment_tag = Counter(
-                        sentiment_tag.name for sentiment_tag in local_sentiment_tags
-                    ).most_common(1)[0][0]
-                    message.sentiment = (
-                        Sentiment.POSITIVE if sentiment_tag == "POS" else Sentiment.NEGATIVE
+        if segment:
+            return PendingTask(
+                self.ONEAI_TAGGER_HANDLE, self.oneai_tagger.tag(doc=File(blocks=blocks))
+            )
+        return PendingTask(
+            self.ONEAI_SENTIMENT_TAGGER_HANDLE,
+            self.oneai_sentiment_tagger.tag(doc=File(blocks=blocks)),
+        )
+
+    def _window_features(
+        self, windows: List[List[Message]], task: PendingTask
+    ) -> List[Tuple[List[bool], List[Sentiment]]]:
+        """Thread starts and sentiments of each window, or defaults if the task did not succeed.
+
+        Without a segmentation every message is put in a thread of its own, rather than all of
+        them in one thread.
+        """
+        if not task.succeeded:
+            return [([True] * len(window), [Sentiment.NEUTRAL] * len(window)) for window in windows]
+        return [
+            oneai_features(window, block.tags)
+            for window, block in zip(windows, task.output_file.blocks)
+        ]
+
+    def _submit_intents(
+        self,
+        chat_stream: List[Message],
+        metrics: RequestMetrics,
+        tier: ModelTier,
+        admitted: bool = True,
+    ) -> PendingTask:
+        """Submit messages to the intent tagger of a model tier, one block each.
+
+        Unless the request was `admitted` to its lane, nothing is submitted and the task misses
+        the deadline.
+        """
+        if not admitted:
+            return PendingTask.not_submitted(self._intent_plugin_name(tier))
+        with metrics.stage("build_files"):
+            multi_block_file = File(
+                blocks=[
+                    Block.CreateRequest(
+                        text=message.text,
                     )
-                else:
-                    message.sentiment = Sentiment.NEUTRAL
+                    for message in chat_stream
+                ],
+            )
 
-            i += len(message.text) + 1
+        return PendingTask(
+            self._intent_plugin_name(tier), self._intent_tagger(tier).tag(doc=multi_block_file)
+        )
 
-        return InvocableResponse(
-            json={
-                "chat_stream": [
-                    message.dict(format_dates=True, format_enums=True) for message in chat_stream
-                ]
-            }
+    @contextmanager
+    def _lane_slot(self, lane: str, deadline: Deadline, metrics: RequestMetrics) -> Iterator[bool]:
+        """Hold a slot of a priority lane while the plugins are in use, if lanes are enabled.
+
+        Yield whether the request was admitted. A request that waits for its whole latency budget
+        without a slot is not admitted, and must not use the plugins: its fields fall back to
+        their defaults, as for tasks that miss the budget.
+
+        Slots are counted by the process, so they only bound the requests of a host that serves
+        concurrent calls from one long-lived process. Where every container serves one
+        invocation at a time, every request gets a slot and the lane gauges only ever show it.
+        """
+        if self.config.max_in_flight_requests <= 0:
+            yield True
+            return
+        scheduler = get_lane_scheduler(
+            client_key(self.client),
+            capacity=self.config.max_in_flight_requests,
+            limits={
+                "normal": self.config.max_in_flight_normal_priority,
+                "low": self.config.max_in_flight_low_priority,
+            },
+            label=PRIORITY_LABEL,
+        )
+        with metrics.stage("queue"):
+            acquired = scheduler.acquire(lane, timeout_s=deadline.remaining())
+        if not acquired:
+            logging.warning(f"No slot in the {lane} lane within the latency budget, using defaults")
+            metrics.count("lane_timeouts", 1)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                scheduler.release(lane)
+
+    def _message_memo(self) -> Optional[MessageMemo]:
+        if self.config.memo_ttl_s <= 0:
+            return None
+        return get_message_memo(
+            client_key(self.client),
+            ttl_s=self.config.memo_ttl_s,
+            max_messages=self.config.memo_max_messages,
         )
 
+    def _intent_cache(self, tier: ModelTier) -> IntentCache:
+        return get_intent_cache(
+            cache_namespace(tier.hf_model_path, tier.labels),
+            max_size=self.config.intent_cache_size,
+            path=self.config.intent_cache_path,
+            max_rows=self.config.intent_cache_max_rows,
+            uncased=tier.uncased,
+        )
+
+    def _parse_stream(self, chat_stream: List[Dict[str, Any]]) -> List[Message]:
+        """Parse a chat stream for analysis, into compact records if the fast path is enabled."""
+        if self.config.fast_path:
+            return parse_messages(chat_stream)
+        return self._parse_input(chat_stream)
+
+    def _dump_stream(self, chat_stream: List[Message]) -> List[Dict[str, Any]]:
+        if self.config.fast_path:
+            return dump_messages(chat_stream)
+        return [message.dict(format_dates=True, format_enums=True) for message in chat_stream]
+
     def _parse_input(self, chat_stream):
-        if isinstance(chat_stream, list) and not isinstance(chat_stream[0], Message):
+        if (
+            isinstance(chat_stream, list)
+            and chat_stream
+            and not isinstance(chat_stream[0], Message)
+        ):
             chat_stream = parse_obj_as(List[Message], chat_stream)
         return chat_stream
 
     @post("add_examples")
-    def add_examples(self, chat_stream: List[Message]) -> InvocableResponse:
-        """Add examples for the AI to train on."""
-        chat_stream = self._parse_input(chat_stream)
+    def add_examples(self, chat_stream: List[Message], profile: bool = False) -> InvocableResponse:
+        """Add examples for the AI to train on.
+
+        With `profile`, the call is profiled and the response is a JSON object whose `profile`
+        names the directory of the reports, next to the usual `message`.
+        """
+        message = "Successfully uploaded examples."
+        with self._profiling("add_examples", profile) as profile_path:
+            chat_stream = self._parse_input(chat_stream)
+            self._upload_examples(chat_stream)
+        if profile_path is not None:
+            return InvocableResponse(json={"message": message, "profile": profile_path})
+        return InvocableResponse(string=message)
 
-        File.create(
+    @post("bulk_add_examples")
+    def bulk_add_examples(self, chat_stream: List[Dict[str, Any]]) -> InvocableResponse:
+        """Add a large number of examples, skipping the ones already uploaded.
+
+        Examples are parsed and uploaded in chunks of `examples_chunk_size`, with up to
+        `max_in_flight_uploads` chunks uploading concurrently. The response reports how many
+        examples were uploaded, skipped as duplicates or failed, and the throughput.
+        """
+        report = ingest(
+            chat_stream,
+            parse=self._parse_input,
+            upload=self._upload_examples,
+            index=get_example_index(client_key(self.client), self.config.examples_index_path),
+            chunk_size=self.config.examples_chunk_size,
+            max_in_flight=self.config.max_in_flight_uploads,
+            retries=self.config.upload_retries,
+            backoff_s=self.config.upload_backoff_s,
+            stored_keys=self._stored_example_keys,
+        )
+        return InvocableResponse(json=report.dict())
+
+    def _upload_examples(self, chat_stream: List[Message]) -> File:
+        """Upload one chunk of examples as a file, and count them in the aggregate index.
+
+        An index that was not loaded in this process yet counts the file when it catches up.
+        """
+        index = self._aggregate_index()
+        file = File.create(
             self.client,
             blocks=[
                 Block.CreateRequest(text=message.text, tags=message.extract_tags())
                 for message in chat_stream
             ],
         )
-        return InvocableResponse(string="Successfully uploaded examples.")
+        if index.built:
+            index.add(chat_stream, file.id)
+        return file
+
+    @post("query_aggregates")
+    def query_aggregates(
+        self,
+        dimension: str,
+        keys: Optional[List[str]] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+    ) -> InvocableResponse:
+        """Message, sentiment and intent counts of the stored examples per user, thread or time.
+
+        `dimension` is one of "user", "thread" or "time". `keys` restricts the result to some
+        users, threads or buckets, and `start` and `end` restrict time buckets to [start, end).
+
+        The counts are saved in the workspace with the files they include. Every query only
+        reads the files stored since, by any process, and saves the counts again if there were
+        any. Deleted examples are only uncounted by rebuild_aggregates.
+        """
+        index = self._aggregate_index()
+        index.catch_up(
+            load=partial(load_state, self.client, aggregates_state(index.bucket_s)),
+            stored_files=self._stored_example_files,
+            save=partial(save_state, self.client, aggregates_state(index.bucket_s)),
+        )
+        return InvocableResponse(
+            json={
+                "dimension": dimension,
+                "bucket_s": index.bucket_s,
+                "groups": index.query(dimension, keys=keys, start=start, end=end),
+            }
+        )
+
+    @post("rebuild_aggregates")
+    def rebuild_aggregates(self) -> InvocableResponse:
+        """Recount the aggregate index from all stored examples."""
+        index = self._aggregate_index()
+        messages = index.rebuild(
+            self._stored_example_files(),
+            save=partial(save_state, self.client, aggregates_state(index.bucket_s)),
+        )
+        return InvocableResponse(json={"messages": messages})
+
+    @post("export_examples")
+    def export_examples(self, format: str = ARROW) -> InvocableResponse:
+        """All stored examples as an Arrow IPC file ("arrow") or as Parquet ("parquet").
+
+        User ids, thread roots, sentiments and intents are dictionary-encoded, and the file can
+        be memory-mapped with `columnar.read_table` for vectorized rollups. Needs pyarrow.
+        """
+        check_format(format)
+        return InvocableResponse(
+            _bytes=to_bytes(self._stored_examples(), format), mime_type=MIME_TYPES[format]
+        )
+
+    def _stored_examples(
+        self, tag_filter_query: str = 'blocktag and kind "message_id"'
+    ) -> List[Message]:
+        response = File.query(self.client, tag_filter_query=tag_filter_query)
+        return messages_from_blocks(
+            block
+            for file in response.files
+            for block in (file.blocks if file.blocks else file.refresh().blocks)
+        )
+
+    def _stored_example_keys(self, chat_stream: List[Message]) -> Set[str]:
+        """Keys of the given examples that are already stored in the workspace."""
+        message_ids = {str(message.message_id) for message in chat_stream}
+        names = " or ".join(f"name {json.dumps(message_id)}" for message_id in sorted(message_ids))
+        return {
+            example_key(message)
+            for message in self._stored_examples(f'blocktag and kind "message_id" and ({names})')
+            if message.message_id in message_ids
+        }
+
+    def _stored_example_files(self) -> List[Tuple[str, Callable[[], List[Message]]]]:
+        """Id of every file of stored examples, with a callable that reads its examples."""
+        response = File.query(self.client, tag_filter_query='blocktag and kind "message_id"')
+        return [
+            (
+                file.id,
+                lambda file=file: messages_from_blocks(
+                    (file if file.blocks else file.refresh()).blocks
+                ),
+            )
+            for file in response.files
+        ]
+
+    def _aggregate_index(self) -> AggregateIndex:
+        return get_aggregate_index(client_key(self.client), bucket_s=self.config.aggregate_bucket_s)
 
 
 handler = create_handler(ChatAnalyticsPackage)
@@ -0,0 +1,93 @@
+"""Micro-batching of concurrent requests into shared plugin submissions.
+
+Only requests served at the same time by the same process are merged. That needs a long-lived
+host that serves calls on several threads; where every container serves one invocation at a
+time, as the Steamship Lambda handler does, no two calls ever meet and holding them only adds
+latency.
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+
+class _Request:
+    def __init__(self, item: Any):
+        self.item = item
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.done = threading.Event()
+
+
+class Coalescer:
+    """Holds concurrent requests for up to `max_wait_s` and runs them together.
+
+    The first request to arrive leads a batch: it waits until `max_wait_s` has passed or the
+    batch holds `max_size` units of work, then runs every request of the batch in one call and
+    hands each caller its own result. Requests arriving meanwhile lead the next batch.
+    """
+
+    def __init__(self, max_wait_s: float, max_size: int):
+        self.max_wait_s = max_wait_s
+        self.max_size = max_size
+        self.batches = 0
+        self.requests = 0
+        self._pending: List[_Request] = []
+        self._size = 0
+        self._leading = False
+        self._cond = threading.Condition()
+
+    def submit(self, item: Any, size: int, run: Callable[[List[Any]], Sequence[Any]]) -> Any:
+        """Return the result of `item`, computed by `run` over the items of the batch it joined.
+
+        `run` takes the items of a batch and returns their results in the same order.
+        """
+        request = _Request(item)
+        with self._cond:
+            self._pending.append(request)
+            self._size += size
+            leads = not self._leading
+            self._leading = True
+            if self._size >= self.max_size:
+                self._cond.notify_all()
+        if leads:
+            self._lead(run)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _lead(self, run: Callable[[List[Any]], Sequence[Any]]) -> None:
+        deadline = time.monotonic() + self.max_wait_s
+        with self._cond:
+            while self._size < self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch, self._pending, self._size = self._pending, [], 0
+            self._leading = False
+            self.batches += 1
+            self.requests += len(batch)
+        try:
+            results = run([request.item for request in batch])
+            for request, result in zip(batch, results):
+                request.result = result
+        except Exception as error:
+            for request in batch:
+                request.error = error
+        finally:
+            for request in batch:
+                request.done.set()
+
+
+_COALESCERS: Dict[Tuple[Any, ...], Coalescer] = {}
+_LOCK = threading.Lock()
+
+
+def get_coalescer(key: Tuple[Any, ...], max_wait_s: float, max_size: int) -> Coalescer:
+    """Process-wide coalescer for requests that can share submissions, as identified by `key`."""
+    key = (*key, max_wait_s, max_size)
+    with _LOCK:
+        if key not in _COALESCERS:
+            _COALESCERS[key] = Coalescer(max_wait_s=max_wait_s, max_size=max_size)
+        return _COALESCERS[key]
@@ -0,0 +1,130 @@
+"""Columnar export of analyzed messages to Arrow IPC or Parquet, and vectorized rollups.
+
+pyarrow is imported on first use, so that calls which return JSON do not pay for loading it.
+"""
+from datetime import timezone
+from typing import Any, Sequence
+
+from api_spec import Message
+
+ARROW = "arrow"
+PARQUET = "parquet"
+FORMATS = (ARROW, PARQUET)
+MIME_TYPES = {ARROW: "application/vnd.apache.arrow.file", PARQUET: "application/vnd.apache.parquet"}
+# Low-cardinality columns, stored as indices into a dictionary of their distinct values.
+DICTIONARY_COLUMNS = ("user_id", "sentiment", "intent", "root_message_id")
+BATCH_ROWS = 65536
+
+
+def _pyarrow() -> Any:
+    try:
+        import pyarrow
+    except ImportError as error:
+        raise ImportError(
+            "Columnar export needs pyarrow, install it with `pip install pyarrow`"
+        ) from error
+    return pyarrow
+
+
+def check_format(format: str) -> None:
+    """Raise a ValueError for an unknown export format."""
+    if format not in FORMATS:
+        raise ValueError(f"Unknown format {format!r}, expected one of {FORMATS}")
+
+
+def schema() -> Any:
+    """Arrow schema of exported messages, with dictionary-encoded low-cardinality columns."""
+    pa = _pyarrow()
+    dictionary = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema(
+        [
+            ("message_id", pa.string()),
+            ("timestamp", pa.timestamp("us", tz="UTC")),
+            ("user_id", dictionary),
+            ("text", pa.string()),
+            ("sentiment", dictionary),
+            ("intent", dictionary),
+            ("root_message_id", dictionary),
+        ]
+    )
+
+
+def to_table(chat_stream: Sequence[Message]) -> Any:
+    """Arrow table of analyzed messages, naive timestamps being taken as UTC."""
+    pa = _pyarrow()
+    columns = {
+        "message_id": [message.message_id for message in chat_stream],
+        "timestamp": [
+            message.timestamp.astimezone(timezone.utc)
+            if message.timestamp.tzinfo is not None
+            else message.timestamp.replace(tzinfo=timezone.utc)
+            for message in chat_stream
+        ],
+        "user_id": [message.user_id for message in chat_stream],
+        "text": [message.text for message in chat_stream],
+        "sentiment": [getattr(message.sentiment, "value", None) for message in chat_stream],
+        "intent": [getattr(message.intent, "value", None) for message in chat_stream],
+        "root_message_id": [message.root_message_id for message in chat_stream],
+    }
+    table_schema = schema()
+    arrays = []
+    for field in table_schema:
+        if field.name in DICTIONARY_COLUMNS:
+            arrays.append(pa.array(columns[field.name], type=pa.string()).dictionary_encode())
+        else:
+            arrays.append(pa.array(columns[field.name], type=field.type))
+    return pa.Table.from_arrays(arrays, schema=table_schema)
+
+
+def write_table(table: Any, sink: Any, format: str = ARROW) -> None:
+    """Write a table to a path or pyarrow sink as an Arrow IPC file or as Parquet."""
+    check_format(format)
+    pa = _pyarrow()
+    if format == PARQUET:
+        import pyarrow.parquet as pq
+
+        pq.write_table(table, sink)
+        return
+    table = table.unify_dictionaries()
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table, max_chunksize=BATCH_ROWS)
+
+
+def to_bytes(chat_stream: Sequence[Message], format: str = ARROW) -> bytes:
+    """Analyzed messages serialized as an Arrow IPC file or as Parquet."""
+    pa = _pyarrow()
+    sink = pa.BufferOutputStream()
+    write_table(to_table(chat_stream), sink, format)
+    return sink.getvalue().to_pybytes()
+
+
+def read_table(path: str) -> Any:
+    """Memory-map an exported file, Parquet if its name ends in .parquet and Arrow IPC otherwise.
+
+    Arrow IPC columns are read without copying, so files larger than memory can be queried.
+    """
+    pa = _pyarrow()
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        return pq.read_table(path, memory_map=True)
+    with pa.memory_map(path, "r") as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def rollup(table: Any, by: str, field: str) -> Any:
+    """Count the messages per value of `by` and of `field`, such as sentiments per thread."""
+    pa = _pyarrow()
+    import pyarrow.compute as pc
+
+    columns = {
+        name: pc.cast(table.column(name), pa.string())
+        if name in DICTIONARY_COLUMNS
+        else table[name]
+        for name in dict.fromkeys([by, field, "message_id"])
+    }
+    counts = pa.table(columns).group_by([by, field]).aggregate([("message_id", "count")])
+    counts = counts.rename_columns(
+        ["messages" if name == "message_id_count" else name for name in counts.column_names]
+    )
+    return counts.sort_by([(by, "ascending"), (field, "ascending")])
@@ -0,0 +1,42 @@
+"""Compact responses that return only the inferred fields, run-length encoded per field."""
+from typing import Any, Dict, List, Sequence, Set
+
+from api_spec import Message
+
+FIELDS = ("sentiment", "intent", "root_message_id")
+
+
+def supplied_fields(chat_stream: Sequence[Message]) -> List[Set[str]]:
+    """Fields the caller supplied for each message, which a compact response leaves out."""
+    return [
+        {field for field in FIELDS if getattr(message, field) is not None}
+        for message in chat_stream
+    ]
+
+
+def run_lengths(values: Sequence[Any]) -> List[List[Any]]:
+    """Encode runs of equal consecutive values as [value, count] pairs."""
+    runs: List[List[Any]] = []
+    for value in values:
+        if runs and runs[-1][0] == value:
+            runs[-1][1] += 1
+        else:
+            runs.append([value, 1])
+    return runs
+
+
+def expand(runs: Sequence[Sequence[Any]]) -> List[Any]:
+    """Values of a run-length encoded field, one per message."""
+    return [value for value, count in runs for _ in range(count)]
+
+
+def compact_stream(chat_stream: Sequence[Message], supplied: Sequence[Set[str]]) -> Dict[str, Any]:
+    """Message ids of an analyzed stream and its inferred fields, None where it was supplied."""
+    response: Dict[str, Any] = {"message_ids": [message.message_id for message in chat_stream]}
+    for field in FIELDS:
+        values = (
+            None if field in fields else getattr(message, field)
+            for message, fields in zip(chat_stream, supplied)
+        )
+        response[field] = run_lengths([getattr(value, "value", value) for value in values])
+    return response
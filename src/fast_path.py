@@ -0,0 +1,120 @@
+"""Opt-in fast path that parses and serializes messages without per-message pydantic models.
+
+`Message` stays the public schema. Inputs in its canonical JSON form are validated directly into
+compact `__slots__` records, and anything else falls back to `Message` itself, so the fast path
+accepts, rejects and outputs exactly what the pydantic path does.
+"""
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from api_spec import Intent, Message, Sentiment
+
+# Timestamps that `datetime.fromisoformat` and pydantic parse identically. Before Python 3.11,
+# fromisoformat only accepts fractions of 3 or 6 digits.
+CANONICAL_TIMESTAMP = re.compile(
+    r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(\.\d{3}|\.\d{6})?(Z|[+-]\d{2}:\d{2})?"
+)
+FIELDS = list(Message.__fields__.keys())
+SENTIMENTS = {sentiment.value: sentiment for sentiment in Sentiment}
+INTENTS = {intent.value: intent for intent in Intent}
+
+
+class FastMessage:
+    """Compact record with the same fields as `Message`."""
+
+    __slots__ = FIELDS
+
+    def __init__(
+        self,
+        message_id: str,
+        timestamp: datetime,
+        user_id: str,
+        text: str,
+        sentiment: Optional[Sentiment] = None,
+        intent: Optional[Intent] = None,
+        root_message_id: Optional[str] = None,
+    ):
+        self.message_id = message_id
+        self.timestamp = timestamp
+        self.user_id = user_id
+        self.text = text
+        self.sentiment = sentiment
+        self.intent = intent
+        self.root_message_id = root_message_id
+
+    @classmethod
+    def from_message(cls, message: Message) -> "FastMessage":
+        """Record holding the fields of a validated `Message`."""
+        return cls(**{field: getattr(message, field) for field in FIELDS})
+
+    def copy(self) -> "FastMessage":
+        """Shallow copy of the record."""
+        return FastMessage(**{field: getattr(self, field) for field in FIELDS})
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the record as `Message.dict(format_dates=True, format_enums=True)` does."""
+        return {
+            "message_id": self.message_id,
+            "timestamp": self.timestamp.isoformat(),
+            "user_id": self.user_id,
+            "text": self.text,
+            "sentiment": self.sentiment.value if self.sentiment is not None else None,
+            "intent": self.intent.value if self.intent is not None else None,
+            "root_message_id": self.root_message_id,
+        }
+
+
+def _parse_timestamp(value: Any) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, str) and CANONICAL_TIMESTAMP.fullmatch(value):
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            # Out of range values such as month 13; pydantic reports them.
+            return None
+    return None
+
+
+def _parse_enum(value: Any, members: Dict[str, Any]) -> Any:
+    if isinstance(value, str):
+        return members.get(getattr(value, "value", value))
+    return None
+
+
+def parse_message(item: Any) -> FastMessage:
+    """Validate one message, falling back to `Message` for anything but its canonical form."""
+    if isinstance(item, FastMessage):
+        return item
+    if isinstance(item, dict):
+        message_id, user_id, text = item.get("message_id"), item.get("user_id"), item.get("text")
+        root_message_id = item.get("root_message_id")
+        timestamp = _parse_timestamp(item.get("timestamp"))
+        sentiment = _parse_enum(item.get("sentiment"), SENTIMENTS)
+        intent = _parse_enum(item.get("intent"), INTENTS)
+        if (
+            type(message_id) is str
+            and type(user_id) is str
+            and type(text) is str
+            and (root_message_id is None or type(root_message_id) is str)
+            and timestamp is not None
+            and (sentiment is not None or item.get("sentiment") is None)
+            and (intent is not None or item.get("intent") is None)
+        ):
+            return FastMessage(
+                message_id, timestamp, user_id, text, sentiment, intent, root_message_id
+            )
+    if not isinstance(item, Message):
+        item = Message.parse_obj(item)
+    return FastMessage.from_message(item)
+
+
+def parse_messages(items: Iterable[Any]) -> List[FastMessage]:
+    """Validate a chat stream into compact records."""
+    return [parse_message(item) for item in items]
+
+
+def dump_messages(chat_stream: Iterable[FastMessage]) -> List[Dict[str, Any]]:
+    """Serialize compact records exactly as the pydantic path serializes messages."""
+    return [message.to_dict() for message in chat_stream]
@@ -0,0 +1,212 @@
+"""Bulk ingestion of labeled examples in bounded, deduplicated, concurrently uploaded chunks."""
+import hashlib
+import json
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from api_spec import Message
+
+
+def example_key(message: Message) -> str:
+    """Identity of a stored example: its message_id plus a hash of its content and labels."""
+    content = json.dumps(message.dict(format_dates=True, format_enums=True), sort_keys=True)
+    return f"{message.message_id}:{hashlib.sha256(content.encode('utf-8')).hexdigest()}"
+
+
+class ExampleIndex:
+    """Keys of the examples already stored in a workspace, optionally kept in SQLite.
+
+    The workspace itself is the record of what is stored, and every chunk is looked up there.
+    The optional SQLite file survives restarts and saves those lookups for the examples it
+    knows. Without it the index knows nothing, so memory does not grow with the keys seen.
+    """
+
+    def __init__(self, namespace: str, path: Optional[str] = None):
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            import sqlite3
+
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS examples "
+                "(namespace TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (namespace, key))"
+            )
+            self._db.commit()
+
+    def missing(self, keys: Sequence[str]) -> Set[str]:
+        """Return the keys that are not stored yet."""
+        with self._lock:
+            candidates = list(set(keys))
+            if self._db is None:
+                return set(candidates)
+            stored: Set[str] = set()
+            # Stay below SQLite's default limit on host parameters.
+            for start in range(0, len(candidates), 500):
+                chunk = candidates[start : start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                stored.update(
+                    key
+                    for (key,) in self._db.execute(
+                        "SELECT key FROM examples "
+                        f"WHERE namespace = ? AND key IN ({placeholders})",  # noqa: S608
+                        [self.namespace, *chunk],
+                    )
+                )
+            return set(candidates) - stored
+
+    def add(self, keys: Iterable[str]) -> None:
+        """Mark examples as stored."""
+        if self._db is None:
+            return
+        keys = list(keys)
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO examples (namespace, key) VALUES (?, ?)",
+                [(self.namespace, key) for key in keys],
+            )
+            self._db.commit()
+
+
+_INDEXES: Dict[Tuple[Any, ...], ExampleIndex] = {}
+_LOCK = threading.Lock()
+
+
+def get_example_index(workspace: Tuple[Any, ...], path: Optional[str] = None) -> ExampleIndex:
+    """Process-wide example index for a workspace, as identified by `plugins.client_key`."""
+    key = (*workspace, path)
+    with _LOCK:
+        if key not in _INDEXES:
+            _INDEXES[key] = ExampleIndex("|".join(str(part) for part in workspace), path)
+        return _INDEXES[key]
+
+
+def chunked(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Split an iterable into lists of at most `size` items, without materializing it."""
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def with_retry(upload: Callable[[], Any], retries: int, backoff_s: float) -> Any:
+    """Call `upload`, retrying failures with exponential backoff."""
+    for attempt in range(retries + 1):
+        try:
+            return upload()
+        except Exception as error:  # noqa: B902
+            if attempt == retries:
+                raise
+            delay = backoff_s * 2**attempt
+            logging.warning(f"Upload failed ({error}), retrying in {delay:.1f}s.")
+            time.sleep(delay)
+
+
+class IngestReport:
+    """Progress and throughput of a bulk ingestion."""
+
+    def __init__(self):
+        self.received = 0
+        self.uploaded = 0
+        self.skipped = 0
+        self.failed = 0
+        self.chunks = 0
+        self._started = time.perf_counter()
+
+    def dict(self) -> Dict[str, Any]:
+        """Report as a JSON-serializable dictionary."""
+        seconds = time.perf_counter() - self._started
+        return {
+            "received": self.received,
+            "uploaded": self.uploaded,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "chunks": self.chunks,
+            "seconds": seconds,
+            "messages_per_second": self.uploaded / seconds if seconds > 0 else 0.0,
+        }
+
+
+def _missing(
+    chat_stream: List[Message],
+    keys: List[str],
+    index: ExampleIndex,
+    stored_keys: Optional[Callable[[List[Message]], Set[str]]],
+) -> Set[str]:
+    """Return the keys of a chunk that are neither in the index nor among its stored keys."""
+    missing = index.missing(keys)
+    if missing and stored_keys is not None:
+        stored = stored_keys([message for message, key in zip(chat_stream, keys) if key in missing])
+        index.add(stored)
+        missing -= stored
+    return missing
+
+
+def ingest(
+    items: Iterable[Any],
+    parse: Callable[[List[Any]], List[Message]],
+    upload: Callable[[List[Message]], Any],
+    index: ExampleIndex,
+    chunk_size: int,
+    max_in_flight: int,
+    retries: int = 3,
+    backoff_s: float = 0.5,
+    stored_keys: Optional[Callable[[List[Message]], Set[str]]] = None,
+) -> IngestReport:
+    """Parse, deduplicate and upload examples chunk by chunk.
+
+    At most `max_in_flight` chunks are parsed or uploading at any time, so memory stays bounded
+    by the chunk size rather than the input size. Examples already in `index`, among the
+    `stored_keys` of the examples of a chunk that the index does not know, or in a chunk still
+    in flight are skipped. Chunks that still fail after `retries` are counted as failed.
+    """
+    report = IngestReport()
+    pending: Set[str] = set()
+    in_flight: Dict[Future, Tuple[List[str], int]] = {}
+
+    def collect(futures: Iterable[Future]) -> None:
+        for future in futures:
+            keys, size = in_flight.pop(future)
+            pending.difference_update(keys)
+            try:
+                future.result()
+            except Exception as error:  # noqa: B902
+                logging.error(f"Giving up on a chunk of {size} examples: {error}")
+                report.failed += size
+                continue
+            index.add(keys)
+            report.uploaded += size
+            logging.info(f"Ingested {report.uploaded} examples so far: {report.dict()}")
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        for raw_chunk in chunked(items, chunk_size):
+            report.received += len(raw_chunk)
+            chat_stream = parse(raw_chunk)
+            keys = [example_key(message) for message in chat_stream]
+            missing = _missing(chat_stream, keys, index, stored_keys)
+            chunk, chunk_keys = [], []
+            for message, key in zip(chat_stream, keys):
+                if key in missing and key not in pending:
+                    pending.add(key)
+                    chunk.append(message)
+                    chunk_keys.append(key)
+            report.skipped += len(chat_stream) - len(chunk)
+            if not chunk:
+                continue
+            report.chunks += 1
+            future = executor.submit(
+                with_retry, lambda chunk=chunk: upload(chunk), retries, backoff_s
+            )
+            in_flight[future] = (chunk_keys, len(chunk))
+            if len(in_flight) >= max_in_flight:
+                done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                collect(done)
+        collect(list(in_flight))
+    return report
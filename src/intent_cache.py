@@ -0,0 +1,194 @@
+"""Content-addressed cache of zero-shot intent predictions."""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from api_spec import Intent
+
+
+def normalize_text(text: str, uncased: bool = True) -> str:
+    """Normalize a message text so trivially different copies share a cache entry.
+
+    Runs of whitespace do not change a zero-shot prediction, and neither does case if the model
+    is `uncased`. Texts for a cased model keep their case.
+    """
+    normalized = " ".join(text.split())
+    return normalized.casefold() if uncased else normalized
+
+
+def deduplicate(texts: Sequence[str], uncased: bool = True) -> Tuple[List[int], List[int]]:
+    """Find the first copy of each distinct normalized text, and the copy each text maps to.
+
+    Returns `(unique, slots)` such that `texts[unique[slots[idx]]]` normalizes like `texts[idx]`.
+    """
+    first: Dict[str, int] = {}
+    unique, slots = [], []
+    for idx, text in enumerate(texts):
+        normalized = normalize_text(text, uncased)
+        if normalized not in first:
+            first[normalized] = len(unique)
+            unique.append(idx)
+        slots.append(first[normalized])
+    return unique, slots
+
+
+def cache_namespace(model_path: str, labels: Sequence[str]) -> str:
+    """Namespace that invalidates cached intents whenever the model or label set changes."""
+    return f"{model_path}|{','.join(sorted(labels))}"
+
+
+class IntentCache:
+    """Two-tier cache of intents keyed by a hash of the normalized text, model and labels.
+
+    Texts are only casefolded for an `uncased` model.
+
+    The first tier is an in-process LRU. The optional second tier is a SQLite file that survives
+    restarts and is trimmed to `max_rows` entries, evicting the least recently used ones.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        max_size: int = 10000,
+        path: Optional[str] = None,
+        max_rows: int = 1000000,
+        uncased: bool = True,
+    ):
+        self.namespace = namespace
+        self.uncased = uncased
+        self.max_size = max_size
+        self.max_rows = max_rows
+        self.hits = 0
+        self.misses = 0
+        self._lru: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._rows = 0
+        if path:
+            # Only deployments that configure the on-disk tier pay for importing sqlite3.
+            import sqlite3
+
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS intents "
+                "(key TEXT PRIMARY KEY, intent TEXT NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS intents_accessed ON intents (accessed)")
+            self._db.commit()
+            self._rows = self._db.execute("SELECT COUNT(*) FROM intents").fetchone()[0]
+
+    def key(self, text: str) -> str:
+        """Cache key of a message text."""
+        payload = f"{self.namespace}\0{normalize_text(text, self.uncased)}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[Intent]]:
+        """Look up the cached intent of every text, None for misses."""
+        keys = [self.key(text) for text in texts]
+        with self._lock:
+            found: Dict[str, str] = {}
+            for key in keys:
+                if key in self._lru:
+                    self._lru.move_to_end(key)
+                    found[key] = self._lru[key]
+            missing = list({key for key in keys if key not in found})
+            if missing and self._db is not None:
+                for key, intent in self._select(missing):
+                    found[key] = intent
+                    self._remember(key, intent)
+            results = [Intent(found[key]) if key in found else None for key in keys]
+            hits = sum(result is not None for result in results)
+            self.hits += hits
+            self.misses += len(results) - hits
+        return results
+
+    def get(self, text: str) -> Optional[Intent]:
+        """Look up the cached intent of a single text."""
+        return self.get_many([text])[0]
+
+    def put_many(self, items: Iterable[Tuple[str, Intent]]) -> None:
+        """Store the intents predicted for the given texts."""
+        entries = {self.key(text): Intent(intent).value for text, intent in items}
+        if not entries:
+            return
+        with self._lock:
+            for key, intent in entries.items():
+                self._remember(key, intent)
+            if self._db is not None:
+                self._upsert(entries)
+
+    def put(self, text: str, intent: Intent) -> None:
+        """Store the intent predicted for a single text."""
+        self.put_many([(text, intent)])
+
+    def _remember(self, key: str, intent: str) -> None:
+        if self.max_size <= 0:
+            return
+        self._lru[key] = intent
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_size:
+            self._lru.popitem(last=False)
+
+    def _select(self, keys: List[str]) -> List[Tuple[str, str]]:
+        rows = []
+        # Stay below SQLite's default limit on host parameters.
+        for start in range(0, len(keys), 500):
+            chunk = keys[start : start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows.extend(
+                self._db.execute(
+                    f"SELECT key, intent FROM intents WHERE key IN ({placeholders})",  # noqa: S608
+                    chunk,
+                ).fetchall()
+            )
+        if rows:
+            now = time.time()
+            self._db.executemany(
+                "UPDATE intents SET accessed = ? WHERE key = ?", [(now, key) for key, _ in rows]
+            )
+            self._db.commit()
+        return rows
+
+    def _upsert(self, entries: Dict[str, str]) -> None:
+        now = time.time()
+        before = self._db.total_changes
+        self._db.executemany(
+            "INSERT OR IGNORE INTO intents (key, intent, accessed) VALUES (?, ?, ?)",
+            [(key, intent, now) for key, intent in entries.items()],
+        )
+        self._rows += self._db.total_changes - before
+        self._db.executemany(
+            "UPDATE intents SET intent = ?, accessed = ? WHERE key = ?",
+            [(intent, now, key) for key, intent in entries.items()],
+        )
+        if self._rows > self.max_rows:
+            self._db.execute(
+                "DELETE FROM intents WHERE key IN "
+                "(SELECT key FROM intents ORDER BY accessed LIMIT ?)",
+                (self._rows - self.max_rows,),
+            )
+            self._rows = self.max_rows
+        self._db.commit()
+
+
+_CACHES: Dict[Tuple[str, int, Optional[str], int, bool], IntentCache] = {}
+_LOCK = threading.Lock()
+
+
+def get_intent_cache(
+    namespace: str,
+    max_size: int,
+    path: Optional[str] = None,
+    max_rows: int = 1000000,
+    uncased: bool = True,
+) -> IntentCache:
+    """Process-wide intent cache for a configuration, shared across handler instances."""
+    key = (namespace, max_size, path, max_rows, uncased)
+    with _LOCK:
+        if key not in _CACHES:
+            _CACHES[key] = IntentCache(
+                namespace, max_size=max_size, path=path, max_rows=max_rows, uncased=uncased
+            )
+        return _CACHES[key]
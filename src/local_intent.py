@@ -0,0 +1,195 @@
+"""Intent classifier trained on the examples added with add_examples, run in the process.
+
+A multinomial logistic regression over hashed word and character n-grams, written in plain
+Python so that it needs no extra dependency. It answers messages it is confident about, and
+leaves the others to the zero-shot tagger.
+"""
+import math
+import random
+import threading
+import zlib
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from steamship import File
+
+from alignment import INTENT_TAG_KIND
+from api_spec import Intent
+from intent_cache import normalize_text
+
+N_FEATURES = 2**18
+LOCAL_INTENT_STATE = "local-intent-classifier"
+INTENT_VALUES = {intent.value for intent in Intent}
+
+
+def labeled_examples(files: Iterable[File]) -> List[Tuple[str, Intent]]:
+    """Text and intent of every block stored by add_examples with a valid intent tag."""
+    examples = []
+    for file in files:
+        for block in file.blocks or []:
+            names = [tag.name for tag in block.tags or [] if tag.kind == INTENT_TAG_KIND]
+            if names and names[0] in INTENT_VALUES:
+                examples.append((block.text, Intent(names[0])))
+    return examples
+
+
+def hashed_features(text: str, n_features: int = N_FEATURES) -> Dict[int, float]:
+    """L2-normalized counts of the hashed word unigrams, bigrams and character trigrams."""
+    words = normalize_text(text).split()
+    grams = [f"w:{word}" for word in words]
+    grams.extend(f"b:{first} {second}" for first, second in zip(words, words[1:]))
+    for word in words:
+        padded = f"<{word}>"
+        grams.extend(f"c:{padded[idx : idx + 3]}" for idx in range(len(padded) - 2))
+    counts = Counter(zlib.crc32(gram.encode("utf-8")) % n_features for gram in grams)
+    norm = math.sqrt(sum(count * count for count in counts.values())) or 1.0
+    return {feature: count / norm for feature, count in counts.items()}
+
+
+def _softmax(scores: List[float]) -> List[float]:
+    top = max(scores)
+    exps = [math.exp(score - top) for score in scores]
+    total = sum(exps)
+    return [value / total for value in exps]
+
+
+class LocalIntentClassifier:
+    """Hashed n-gram linear intent model with sparse weights.
+
+    The model has no intercept, so a text none of whose n-grams were seen in training gets a
+    uniform distribution and is never answered locally, whatever the label frequencies.
+    Untrained models predict nothing, so every message still goes to the zero-shot tagger.
+    """
+
+    def __init__(self, n_features: int = N_FEATURES):
+        self.n_features = n_features
+        self.labels: List[str] = [intent.value for intent in Intent]
+        self.weights: Dict[int, List[float]] = {}
+        self.examples = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def trained(self) -> bool:
+        """Whether the model has been trained on any example."""
+        return self.examples > 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of the messages asked about that were answered locally."""
+        asked = self.hits + self.misses
+        return self.hits / asked if asked else 0.0
+
+    def probabilities(self, features: Dict[int, float]) -> List[float]:
+        """Probability of every label given hashed features."""
+        scores = [0.0] * len(self.labels)
+        for feature, value in features.items():
+            weights = self.weights.get(feature)
+            if weights is not None:
+                for idx, weight in enumerate(weights):
+                    scores[idx] += weight * value
+        return _softmax(scores)
+
+    def predict(self, texts: Sequence[str], threshold: float) -> List[Optional[Intent]]:
+        """Intent of every text whose most likely label reaches `threshold`, None otherwise."""
+        if not self.trained:
+            return [None] * len(texts)
+        predictions: List[Optional[Intent]] = []
+        for text in texts:
+            probabilities = self.probabilities(hashed_features(text, self.n_features))
+            best = max(range(len(self.labels)), key=probabilities.__getitem__)
+            predictions.append(
+                Intent(self.labels[best]) if probabilities[best] >= threshold else None
+            )
+        hits = sum(prediction is not None for prediction in predictions)
+        with self._lock:
+            self.hits += hits
+            self.misses += len(predictions) - hits
+        return predictions
+
+    def fit(
+        self,
+        examples: Sequence[Tuple[str, Intent]],
+        epochs: int = 5,
+        learning_rate: float = 0.5,
+        seed: int = 0,
+    ) -> Dict[str, Any]:
+        """Train from scratch with stochastic gradient descent on the cross-entropy loss."""
+        label_idx = {label: idx for idx, label in enumerate(self.labels)}
+        data = [
+            (hashed_features(text, self.n_features), label_idx[Intent(intent).value])
+            for text, intent in examples
+        ]
+        self.weights = {}
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(data)
+            rate = learning_rate / (1 + epoch)
+            for features, target in data:
+                probabilities = self.probabilities(features)
+                gradient = [
+                    probability - (idx == target) for idx, probability in enumerate(probabilities)
+                ]
+                for feature, value in features.items():
+                    weights = self.weights.setdefault(feature, [0.0] * len(self.labels))
+                    for idx, grad in enumerate(gradient):
+                        weights[idx] -= rate * grad * value
+        self.examples = len(data)
+        correct = sum(
+            max(range(len(self.labels)), key=self.probabilities(features).__getitem__) == target
+            for features, target in data
+        )
+        return {
+            "examples": len(data),
+            "labels": dict(Counter(self.labels[target] for _, target in data)),
+            "training_accuracy": correct / len(data) if data else 0.0,
+        }
+
+    def state(self) -> Dict[str, Any]:
+        """Return the model as a JSON-serializable dictionary."""
+        return {
+            "n_features": self.n_features,
+            "labels": self.labels,
+            "weights": {str(feature): weights for feature, weights in self.weights.items()},
+            "examples": self.examples,
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "LocalIntentClassifier":
+        """Rebuild a model from the dictionary returned by `state`."""
+        classifier = cls(n_features=state["n_features"])
+        classifier.labels = state["labels"]
+        classifier.weights = {
+            int(feature): weights for feature, weights in state["weights"].items()
+        }
+        classifier.examples = state["examples"]
+        return classifier
+
+
+_CLASSIFIERS: Dict[Tuple[Any, ...], LocalIntentClassifier] = {}
+_LOCK = threading.Lock()
+
+
+def get_local_intent_classifier(
+    workspace: Tuple[Any, ...], load: Callable[[], Optional[Dict[str, Any]]]
+) -> LocalIntentClassifier:
+    """Process-wide classifier of a workspace, loaded with `load` on first use in the process.
+
+    `load` returns the state of the model last saved for the workspace, or None if it has none.
+    """
+    with _LOCK:
+        if workspace not in _CLASSIFIERS:
+            state = load()
+            _CLASSIFIERS[workspace] = (
+                LocalIntentClassifier.from_state(state) if state else LocalIntentClassifier()
+            )
+        return _CLASSIFIERS[workspace]
+
+
+def set_local_intent_classifier(
+    workspace: Tuple[Any, ...], classifier: LocalIntentClassifier
+) -> None:
+    """Replace the classifier of a workspace in this process."""
+    with _LOCK:
+        _CLASSIFIERS[workspace] = classifier
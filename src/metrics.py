@@ -0,0 +1,239 @@
+"""Per-request stage timings and sizes, aggregated in-process into Prometheus-style histograms."""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+from orchestration import PendingTask, summarize
+
+DURATION_BUCKETS: Tuple[float, ...] = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+SIZE_BUCKETS: Tuple[float, ...] = (1, 10, 100, 1000, 10000, 100000, 1000000)
+RATIO_BUCKETS: Tuple[float, ...] = (0.0, 0.1, 0.25, 0.5, 0.75, 0.9, 1.0)
+METRIC_PREFIX = "chat_analytics"
+HELP = {
+    "stage_seconds": "Time spent in each stage of a request.",
+    "plugin_seconds": "Time plugin tasks spent queued and running.",
+    "request_size": "Sizes of the work done by a request.",
+    "request_ratio": "Ratios between sizes of the work done by a request.",
+    "lane_wait_seconds": "Time requests waited for a slot in their priority lane.",
+    "lane_queue_depth": "Requests waiting for a slot in each priority lane.",
+    "lane_in_flight": "Requests holding a slot in each priority lane.",
+}
+
+
+class Histogram:
+    """Cumulative histogram with fixed bucket upper bounds."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """Add an observation."""
+        for idx, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[idx] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Labeled histograms and gauges shared by all requests of the process."""
+
+    def __init__(self):
+        self._histograms: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Histogram] = {}
+        self._gauges: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, value: float, buckets: Sequence[float], **labels: str) -> None:
+        """Add an observation to the histogram of a metric name and label set."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if key not in self._histograms:
+                self._histograms[key] = Histogram(buckets)
+            self._histograms[key].observe(value)
+
+    def set(self, name: str, value: float, **labels: str) -> None:
+        """Set the current value of the gauge of a metric name and label set."""
+        with self._lock:
+            self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def render(self) -> str:
+        """All histograms and gauges in the Prometheus text exposition format."""
+        lines: List[str] = []
+        with self._lock:
+            for name in sorted({name for name, _ in self._gauges}):
+                metric = f"{METRIC_PREFIX}_{name}"
+                if name in HELP:
+                    lines.append(f"# HELP {metric} {HELP[name]}")
+                lines.append(f"# TYPE {metric} gauge")
+                for (gauge_name, labels), value in sorted(self._gauges.items()):
+                    if gauge_name == name:
+                        lines.append(f"{metric}{_labels(labels)} {_number(value)}")
+            for name in sorted({name for name, _ in self._histograms}):
+                metric = f"{METRIC_PREFIX}_{name}"
+                if name in HELP:
+                    lines.append(f"# HELP {metric} {HELP[name]}")
+                lines.append(f"# TYPE {metric} histogram")
+                for (hist_name, labels), histogram in sorted(self._histograms.items()):
+                    if hist_name != name:
+                        continue
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f"{metric}_bucket{_labels(labels, le=_number(bound))} {count}")
+                    lines.append(f"{metric}_bucket{_labels(labels, le='+Inf')} {histogram.count}")
+                    lines.append(f"{metric}_sum{_labels(labels)} {_number(histogram.sum)}")
+                    lines.append(f"{metric}_count{_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _labels(labels: Tuple[Tuple[str, str], ...], **extra: str) -> str:
+    pairs = [*labels, *extra.items()]
+    if not pairs:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in pairs
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+REGISTRY = MetricsRegistry()
+
+
+class RequestMetrics:
+    """Stage durations, sizes and plugin timings of a single request.
+
+    Durations of a stage that runs in several threads are summed. Metrics of work the request
+    shared with others are included in `dict` but not exported with the request.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self.sizes: Dict[str, int] = {}
+        self.ratios: Dict[str, float] = {}
+        self.plan: Dict[str, int] = {}
+        self.plugins: Dict[str, Dict[str, Any]] = {}
+        self._tasks: List[PendingTask] = []
+        self._shared: List["RequestMetrics"] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time the enclosed block as a stage."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            with self._lock:
+                self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+    def count(self, name: str, value: int) -> None:
+        """Add to a size of the request."""
+        with self._lock:
+            self.sizes[name] = self.sizes.get(name, 0) + value
+
+    def ratio(self, name: str, numerator: int, denominator: int) -> None:
+        """Record a ratio of the request, unless it is undefined."""
+        if denominator:
+            with self._lock:
+                self.ratios[name] = numerator / denominator
+
+    def record_plan(self, summary: Dict[str, int]) -> None:
+        """Add the work a `planner.WorkPlan` planned and skipped."""
+        with self._lock:
+            for name, value in summary.items():
+                self.plan[name] = self.plan.get(name, 0) + value
+
+    def record_tasks(self, pending: Sequence[PendingTask]) -> None:
+        """Keep the timings of the plugin tasks of the request and count the tags they returned."""
+        self._tasks.extend(pending)
+        self.plugins = summarize(self._tasks)
+        for task in pending:
+            if task.succeeded:
+                tags = sum(len(block.tags or []) for block in task.output_file.blocks)
+                self.count(f"{task.plugin}_tags", tags)
+
+    def merge(self, other: "RequestMetrics") -> None:
+        """Include the metrics of work this request shared with others, such as a coalesced batch.
+
+        The shared work is exported once by whoever ran it, not with every request that merged it.
+        """
+        with self._lock:
+            self._shared.append(other)
+
+    def dict(self) -> Dict[str, Any]:
+        """Metrics, including those of shared work, as a JSON-serializable dictionary."""
+        stages: Dict[str, float] = {}
+        sizes: Dict[str, int] = {}
+        ratios: Dict[str, float] = {}
+        plan: Dict[str, int] = {}
+        tasks: List[PendingTask] = []
+        for metrics in [self, *self._shared]:
+            for name, seconds in metrics.stages.items():
+                stages[name] = stages.get(name, 0.0) + seconds
+            for name, value in metrics.sizes.items():
+                sizes[name] = sizes.get(name, 0) + value
+            ratios.update(metrics.ratios)
+            for name, value in metrics.plan.items():
+                plan[name] = plan.get(name, 0) + value
+            tasks.extend(metrics._tasks)
+        return {
+            "stages": stages,
+            "sizes": sizes,
+            "ratios": ratios,
+            "plan": plan,
+            "plugins": summarize(tasks) if self._shared else self.plugins,
+        }
+
+    def export(self, endpoint: str, registry: MetricsRegistry = REGISTRY) -> None:
+        """Add the metrics of the request, but not those of shared work, to the histograms."""
+        for stage, seconds in self.stages.items():
+            registry.observe(
+                "stage_seconds", seconds, DURATION_BUCKETS, endpoint=endpoint, stage=stage
+            )
+        for size, value in self.sizes.items():
+            registry.observe("request_size", value, SIZE_BUCKETS, endpoint=endpoint, size=size)
+        for name, value in self.plan.items():
+            registry.observe(
+                "request_size", value, SIZE_BUCKETS, endpoint=endpoint, size=f"plan_{name}"
+            )
+        for ratio, value in self.ratios.items():
+            registry.observe("request_ratio", value, RATIO_BUCKETS, endpoint=endpoint, ratio=ratio)
+        for task in self._tasks:
+            if task.queue_s is not None:
+                registry.observe(
+                    "plugin_seconds",
+                    task.queue_s,
+                    DURATION_BUCKETS,
+                    plugin=task.plugin,
+                    phase="queue",
+                )
+            if task.duration_s is not None:
+                registry.observe(
+                    "plugin_seconds",
+                    task.duration_s - (task.queue_s or 0.0),
+                    DURATION_BUCKETS,
+                    plugin=task.plugin,
+                    phase="run",
+                )
@@ -0,0 +1,128 @@
+"""Polling of concurrently submitted plugin tasks under a shared per-request latency budget."""
+import time
+from collections import defaultdict
+from typing import Any, Dict, Optional, Sequence
+
+from steamship.base import TaskState
+
+DONE_STATES = (TaskState.succeeded, TaskState.failed)
+
+
+class Deadline:
+    """Point in time by which a request has to respond, or none if `budget_s` is None."""
+
+    def __init__(self, budget_s: Optional[float] = None):
+        self._expires_at = None if budget_s is None else time.monotonic() + budget_s
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline, None without a deadline."""
+        if self._expires_at is None:
+            return None
+        return max(0.0, self._expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        """Whether the deadline has passed."""
+        return self.remaining() == 0.0
+
+
+class _NotSubmitted:
+    """Stand-in for a task that was never submitted, and so never leaves the waiting state."""
+
+    state = TaskState.waiting
+
+    def refresh(self) -> None:
+        """Leave the task waiting."""
+
+
+class PendingTask:
+    """A submitted plugin task and how long the plugin took to complete it.
+
+    `queue_s` is the time until the task was first seen out of the waiting state, so both it and
+    `duration_s` are only as precise as the polling interval.
+    """
+
+    def __init__(self, plugin: str, task: Any):
+        self.plugin = plugin
+        self.task = task
+        self.queue_s: Optional[float] = None
+        self.duration_s: Optional[float] = None
+        self._submitted_at = time.monotonic()
+        self._record_progress()
+
+    @classmethod
+    def not_submitted(cls, plugin: str) -> "PendingTask":
+        """Return a task of `plugin` that was not submitted, and so missed the deadline."""
+        return cls(plugin, _NotSubmitted())
+
+    @property
+    def done(self) -> bool:
+        """Whether the task has succeeded or failed."""
+        return self.task.state in DONE_STATES
+
+    @property
+    def succeeded(self) -> bool:
+        """Whether the task has succeeded."""
+        return self.task.state == TaskState.succeeded
+
+    @property
+    def output_file(self) -> Any:
+        """Return the tagged file of a succeeded task."""
+        return self.task.output.file
+
+    def refresh(self) -> None:
+        """Fetch the state of the task unless it is already done."""
+        if not self.done:
+            self.task.refresh()
+            self._record_progress()
+
+    def _record_progress(self) -> None:
+        elapsed = time.monotonic() - self._submitted_at
+        if self.queue_s is None and self.task.state != TaskState.waiting:
+            self.queue_s = elapsed
+        if self.done and self.duration_s is None:
+            self.duration_s = elapsed
+
+
+def wait_all(
+    pending: Sequence[PendingTask],
+    deadline: Deadline,
+    initial_delay_s: float = 0.05,
+    max_delay_s: float = 1.0,
+) -> None:
+    """Poll all tasks together until they are done or the deadline passes.
+
+    The delay between polls starts at `initial_delay_s`, so fast tasks are picked up quickly, and
+    doubles up to `max_delay_s`, so slow ones are not polled needlessly often. Tasks still
+    running at the deadline are left behind: the SDK has no way to cancel them.
+    """
+    delay = initial_delay_s
+    while True:
+        for task in pending:
+            task.refresh()
+        if all(task.done for task in pending):
+            return
+        remaining = deadline.remaining()
+        if remaining == 0.0:
+            return
+        time.sleep(delay if remaining is None else min(delay, remaining))
+        delay = min(delay * 2, max_delay_s)
+
+
+def summarize(pending: Sequence[PendingTask]) -> Dict[str, Dict[str, Any]]:
+    """Per plugin, the number of tasks, how many missed the deadline or failed, and durations."""
+    summary: Dict[str, Dict[str, Any]] = defaultdict(
+        lambda: {"tasks": 0, "missed": 0, "failed": 0, "max_queue_s": 0.0, "max_duration_s": 0.0}
+    )
+    for task in pending:
+        plugin = summary[task.plugin]
+        plugin["tasks"] += 1
+        if not task.done:
+            plugin["missed"] += 1
+        elif not task.succeeded:
+            plugin["failed"] += 1
+        if task.queue_s is not None:
+            plugin["max_queue_s"] = max(plugin["max_queue_s"], task.queue_s)
+        if task.duration_s is not None:
+            plugin["max_duration_s"] = max(plugin["max_duration_s"], task.duration_s)
+    return dict(summary)
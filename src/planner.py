@@ -0,0 +1,50 @@
+"""Planning of the inference a chat stream actually needs before any plugin is called."""
+from typing import Dict, List, Sequence
+
+from api_spec import Message
+
+
+class WorkPlan:
+    """Per-message masks of the fields that still need to be inferred.
+
+    Callers may supply intent, sentiment or root_message_id themselves. Those messages are left
+    out of the intent submission, and windows in which every message already has a sentiment
+    and a root are not sent to OneAI at all.
+    """
+
+    def __init__(self, chat_stream: Sequence[Message]):
+        self.needs_intent: List[bool] = [message.intent is None for message in chat_stream]
+        self.needs_sentiment: List[bool] = [message.sentiment is None for message in chat_stream]
+        self.needs_thread: List[bool] = [message.root_message_id is None for message in chat_stream]
+        self.windows_tagged = 0
+        self.windows_skipped = 0
+
+    @property
+    def needs_oneai(self) -> List[bool]:
+        """Whether each message needs dialogue segmentation or sentiment analysis."""
+        return [
+            needs_sentiment or needs_thread
+            for needs_sentiment, needs_thread in zip(self.needs_sentiment, self.needs_thread)
+        ]
+
+    def record_window(self, tagged: bool) -> None:
+        """Count a OneAI window as tagged or skipped."""
+        if tagged:
+            self.windows_tagged += 1
+        else:
+            self.windows_skipped += 1
+
+    def summary(self) -> Dict[str, int]:
+        """Amount of work planned and skipped, for reporting."""
+        n_messages = len(self.needs_intent)
+        n_intents = sum(self.needs_intent)
+        n_oneai = sum(self.needs_oneai)
+        return {
+            "messages": n_messages,
+            "intents_inferred": n_intents,
+            "intents_skipped": n_messages - n_intents,
+            "oneai_messages_inferred": n_oneai,
+            "oneai_messages_skipped": n_messages - n_oneai,
+            "oneai_windows_tagged": self.windows_tagged,
+            "oneai_windows_skipped": self.windows_skipped,
+        }
@@ -0,0 +1,48 @@
+"""Lazily bound plugin instances, memoized per process, client configuration and plugin config."""
+import hashlib
+import json
+import threading
+from typing import Any, Dict, Tuple
+
+from steamship import PluginInstance, Steamship
+
+_INSTANCES: Dict[Tuple[Any, ...], PluginInstance] = {}
+_LOCK = threading.Lock()
+
+
+def client_key(client: Steamship) -> Tuple[Any, ...]:
+    """Identity of the workspace and credentials a client talks to."""
+    config = getattr(client, "config", None)
+    if config is None:
+        return (client,)
+    api_key = hashlib.sha256(str(config.api_key or "").encode("utf-8")).hexdigest()
+    return (
+        str(config.api_base),
+        str(config.workspace_id or ""),
+        str(config.workspace_handle or ""),
+        api_key,
+    )
+
+
+def use_plugin(
+    client: Steamship, plugin_handle: str, instance_handle: str, config: Dict[str, Any]
+) -> PluginInstance:
+    """Return the plugin instance for a handle and config, creating it only on first use.
+
+    Handler instances are constructed for every invocation, so the instance is kept for the
+    lifetime of the process instead of being fetched from the engine again on every request.
+    """
+    key = (
+        *client_key(client),
+        plugin_handle,
+        instance_handle,
+        json.dumps(config, sort_keys=True),
+    )
+    with _LOCK:
+        if key not in _INSTANCES:
+            _INSTANCES[key] = client.use_plugin(
+                plugin_handle=plugin_handle,
+                instance_handle=instance_handle,
+                config=config,
+            )
+        return _INSTANCES[key]
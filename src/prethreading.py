@@ -0,0 +1,58 @@
+"""Local pre-threading that cuts a chat stream at thread boundaries that need no model.
+
+Long idle gaps and caller-supplied roots are certain thread boundaries. Cutting the stream there
+lets each segment be segmented on its own, without overlap across the cut, and segments whose
+threads are already fully determined skip dialogue segmentation altogether.
+"""
+from typing import List, Optional, Sequence, Tuple
+
+from api_spec import Message
+
+
+def _gap_s(previous: Message, message: Message) -> Optional[float]:
+    try:
+        return (message.timestamp - previous.timestamp).total_seconds()
+    except TypeError:
+        # Naive and timezone-aware timestamps cannot be compared.
+        return None
+
+
+def certain_starts(chat_stream: Sequence[Message], max_gap_s: Optional[float]) -> List[bool]:
+    """Whether each message certainly opens a new thread.
+
+    That is the case for the first message, for a message more than `max_gap_s` seconds after the
+    previous one, for a message that is its own root, and for a message whose caller-supplied
+    root differs from the previous message's one.
+    """
+    starts = []
+    for idx, message in enumerate(chat_stream):
+        if idx == 0:
+            starts.append(True)
+            continue
+        previous = chat_stream[idx - 1]
+        gap_s = _gap_s(previous, message) if max_gap_s is not None else None
+        starts.append(
+            (gap_s is not None and gap_s > max_gap_s)
+            or message.root_message_id == message.message_id
+            or (
+                message.root_message_id is not None
+                and previous.root_message_id is not None
+                and message.root_message_id != previous.root_message_id
+            )
+        )
+    return starts
+
+
+def segments(starts: Sequence[bool]) -> List[Tuple[int, int]]:
+    """[start, end) ranges of the segments between certain thread starts."""
+    cuts = [idx for idx, opens_thread in enumerate(starts) if opens_thread or idx == 0]
+    return list(zip(cuts, cuts[1:] + [len(starts)]))
+
+
+def needs_segmentation(segment: Sequence[Message]) -> bool:
+    """Whether the threads within a segment are still ambiguous.
+
+    The first message of a segment opens a thread, so they are only ambiguous if a later
+    message has no caller-supplied root.
+    """
+    return any(message.root_message_id is None for message in segment[1:])
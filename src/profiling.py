@@ -0,0 +1,102 @@
+"""Opt-in profiling of single invocations with cProfile and tracemalloc.
+
+The profilers are only imported once an invocation is profiled, so that processes that never
+profile do not pay for importing them.
+"""
+import io
+import os
+import random
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Iterator, Optional
+
+TOP_N: int = 30
+CPU_PROFILE: str = "cpu.prof"
+CPU_REPORT: str = "cpu.txt"
+ALLOCATIONS_REPORT: str = "allocations.txt"
+
+# A process runs a single cProfile profiler at a time.
+_ACTIVE = threading.Lock()
+
+
+def sampled(requested: bool, sample_rate: float) -> bool:
+    """Whether an invocation is profiled, on request or for a `sample_rate` fraction of them."""
+    return requested or (sample_rate > 0 and random.random() < sample_rate)
+
+
+def invocation_dir(directory: str, endpoint: str) -> str:
+    """Directory of its own for the reports of one invocation of an endpoint."""
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    return os.path.join(directory, f"{endpoint}-{stamp}-{uuid.uuid4().hex[:8]}")
+
+
+def _cpu_report(profiler: Any, top_n: int) -> str:
+    import pstats
+
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top_n)
+    return out.getvalue()
+
+
+def _allocations_report(snapshot: Any, peak: Optional[int], top_n: int) -> str:
+    import tracemalloc
+
+    snapshot = snapshot.filter_traces(
+        [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ]
+    )
+    statistics = snapshot.statistics("lineno")
+    lines = [f"Held at exit: {sum(stat.size for stat in statistics) / 1024:.1f} KiB"]
+    if peak is not None:
+        lines.append(f"Peak: {peak / 1024:.1f} KiB")
+    lines.append(f"Top {top_n} allocating lines:")
+    lines.extend(str(stat) for stat in statistics[:top_n])
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def capture(directory: str, endpoint: str, top_n: int = TOP_N) -> Iterator[Optional[str]]:
+    """Profile the enclosed block into a directory of its own under `directory`, yielding it.
+
+    The directory receives the raw cProfile statistics (`cpu.prof`, readable with pstats or
+    snakeviz), the functions with the highest cumulative time (`cpu.txt`) and the source lines
+    holding the most memory at the end of the block (`allocations.txt`). cProfile only sees the
+    calling thread, while tracemalloc traces every thread. If another invocation is already being
+    profiled, the block runs unprofiled and None is yielded.
+    """
+    if not _ACTIVE.acquire(blocking=False):
+        yield None
+        return
+    import cProfile
+    import tracemalloc
+
+    try:
+        path = invocation_dir(directory, endpoint)
+        os.makedirs(path, exist_ok=True)
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield path
+        finally:
+            profiler.disable()
+            snapshot = tracemalloc.take_snapshot()
+            # The peak only covers the block if tracing started with it.
+            peak = tracemalloc.get_traced_memory()[1] if started_tracing else None
+            if started_tracing:
+                tracemalloc.stop()
+            profiler.dump_stats(os.path.join(path, CPU_PROFILE))
+            with open(os.path.join(path, CPU_REPORT), "w") as file:
+                file.write(_cpu_report(profiler, top_n))
+            with open(os.path.join(path, ALLOCATIONS_REPORT), "w") as file:
+                file.write(_allocations_report(snapshot, peak, top_n))
+    finally:
+        _ACTIVE.release()
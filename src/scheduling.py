@@ -0,0 +1,108 @@
+"""Priority lanes that bound how many requests of each priority tag with the plugins at once.
+
+Slots are counted in process memory, so the bounds hold among the concurrent requests of one
+process. They shape load on a host that serves many calls from one long-lived process; where
+every container serves one invocation at a time, every request is admitted at once.
+"""
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from metrics import DURATION_BUCKETS, REGISTRY, MetricsRegistry
+
+# Lanes from the most to the least urgent.
+LANES = ("high", "normal", "low")
+DEFAULT_LANE = "normal"
+
+
+def parse_lane(priority: Optional[str]) -> str:
+    """Lane of a caller-supplied priority, the default lane if none was given."""
+    if priority is None:
+        return DEFAULT_LANE
+    lane = priority.lower()
+    if lane not in LANES:
+        raise ValueError(f"Unknown priority {priority!r}, expected one of {LANES}")
+    return lane
+
+
+class LaneScheduler:
+    """Admits requests to their plugin phase by priority, within per-lane and total bounds.
+
+    At most `capacity` requests hold a slot at once, and at most `limits[lane]` of them from a
+    lane. A freed slot goes to a waiting request of the most urgent lane that is under its
+    limit, so bulk work in the lower lanes only uses capacity the urgent lanes leave spare.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        limits: Dict[str, int],
+        label: str = "priority",
+        registry: MetricsRegistry = REGISTRY,
+    ):
+        self.capacity = capacity
+        self.limits = {lane: min(limits.get(lane, capacity), capacity) for lane in LANES}
+        self.label = label
+        self.registry = registry
+        self.waiting = {lane: 0 for lane in LANES}
+        self.in_flight = {lane: 0 for lane in LANES}
+        self._cond = threading.Condition()
+
+    def acquire(self, lane: str, timeout_s: Optional[float] = None) -> bool:
+        """Wait for a slot of a lane, for at most `timeout_s` seconds, and whether it was obtained."""
+        t0 = time.monotonic()
+        with self._cond:
+            self.waiting[lane] += 1
+            self._export(lane)
+            try:
+                admitted = self._cond.wait_for(lambda: self._admits(lane), timeout=timeout_s)
+            finally:
+                self.waiting[lane] -= 1
+            if admitted:
+                self.in_flight[lane] += 1
+            self._export(lane)
+            # Lanes behind this one may now be the most urgent with a runnable request.
+            self._cond.notify_all()
+        self.registry.observe(
+            "lane_wait_seconds",
+            time.monotonic() - t0,
+            DURATION_BUCKETS,
+            **{self.label: lane},
+        )
+        return admitted
+
+    def release(self, lane: str) -> None:
+        """Free a slot of a lane."""
+        with self._cond:
+            self.in_flight[lane] -= 1
+            self._export(lane)
+            self._cond.notify_all()
+
+    def _admits(self, lane: str) -> bool:
+        if sum(self.in_flight.values()) >= self.capacity:
+            return False
+        if self.in_flight[lane] >= self.limits[lane]:
+            return False
+        for urgent in LANES[: LANES.index(lane)]:
+            if self.waiting[urgent] and self.in_flight[urgent] < self.limits[urgent]:
+                return False
+        return True
+
+    def _export(self, lane: str) -> None:
+        self.registry.set("lane_queue_depth", self.waiting[lane], **{self.label: lane})
+        self.registry.set("lane_in_flight", self.in_flight[lane], **{self.label: lane})
+
+
+_SCHEDULERS: Dict[Tuple[Any, ...], LaneScheduler] = {}
+_LOCK = threading.Lock()
+
+
+def get_lane_scheduler(
+    workspace: Tuple[Any, ...], capacity: int, limits: Dict[str, int], label: str
+) -> LaneScheduler:
+    """Process-wide lane scheduler of a workspace, as identified by `plugins.client_key`."""
+    key = (*workspace, capacity, tuple(sorted(limits.items())), label)
+    with _LOCK:
+        if key not in _SCHEDULERS:
+            _SCHEDULERS[key] = LaneScheduler(capacity, limits, label=label)
+        return _SCHEDULERS[key]
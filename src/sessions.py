@@ -0,0 +1,165 @@
+"""In-process state of live chat sessions and overlapping windows analyzed incrementally."""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from api_spec import Message
+
+
+class SessionStore:
+    """Tail of already analyzed messages per session, evicted after `ttl_s` seconds of inactivity.
+
+    The tail carries the thread state of a session: its last message holds the current
+    root_message_id and the messages before it give the dialogue segmentation its context. It only
+    lives in the process, so it is a cache of the tail that callers are given back with every
+    response, and a call that reaches another process needs the caller to send that tail.
+    """
+
+    def __init__(self, ttl_s: float = 3600, max_sessions: int = 10000):
+        self.ttl_s = ttl_s
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, Tuple[float, List[Message]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def tail(self, session_id: str) -> List[Message]:
+        """Return copies of the last analyzed messages of a session, empty for unknown sessions."""
+        return self.find(session_id) or []
+
+    def find(self, session_id: str) -> Optional[List[Message]]:
+        """Return copies of the last analyzed messages of a session, None for unknown sessions."""
+        with self._lock:
+            self._expire()
+            if session_id not in self._sessions:
+                return None
+            _, tail = self._sessions[session_id]
+            return [message.copy() for message in tail]
+
+    def update(
+        self, session_id: str, chat_stream: Sequence[Message], tail_size: int
+    ) -> List[Message]:
+        """Keep the last `tail_size` messages of an analyzed stream as the session's new tail.
+
+        The new tail is returned, for callers to send back if their next call may reach a process
+        that does not hold it.
+        """
+        tail = [message.copy() for message in chat_stream[-tail_size:]] if tail_size > 0 else []
+        with self._lock:
+            self._sessions[session_id] = (time.monotonic(), tail)
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return [message.copy() for message in tail]
+
+    def discard(self, session_id: str) -> None:
+        """Forget a session."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self) -> int:
+        """Count the sessions that have not expired."""
+        with self._lock:
+            self._expire()
+            return len(self._sessions)
+
+    def _expire(self) -> None:
+        deadline = time.monotonic() - self.ttl_s
+        while self._sessions:
+            session_id, (updated_at, _) = next(iter(self._sessions.items()))
+            if updated_at >= deadline:
+                break
+            del self._sessions[session_id]
+
+
+def message_key(item: Dict[str, Any]) -> str:
+    """Identity of a serialized input message: its message_id plus a hash of its content."""
+    content = json.dumps(item, sort_keys=True)
+    return f"{item['message_id']}:{hashlib.sha256(content.encode('utf-8')).hexdigest()}"
+
+
+class MessageMemo:
+    """Analyzed messages keyed by message_id and content, evicted `ttl_s` seconds after last use.
+
+    Clients that send overlapping windows of a conversation resend most messages unchanged. Their
+    analyzed copies, thread included, are reused as is, and serve as the segmentation context of
+    the messages that follow them.
+    """
+
+    def __init__(self, ttl_s: float = 300, max_messages: int = 100000):
+        self.ttl_s = ttl_s
+        self.max_messages = max_messages
+        self.hits = 0
+        self.misses = 0
+        self._messages: "OrderedDict[str, Tuple[float, Message]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[Message]]:
+        """Return copies of the analyzed messages, None for those not seen within the TTL."""
+        now = time.monotonic()
+        found = []
+        with self._lock:
+            self._expire(now)
+            for key in keys:
+                if key in self._messages:
+                    _, message = self._messages[key]
+                    self._messages[key] = (now, message)
+                    self._messages.move_to_end(key)
+                    found.append(message.copy())
+                else:
+                    found.append(None)
+            hits = sum(message is not None for message in found)
+            self.hits += hits
+            self.misses += len(found) - hits
+        return found
+
+    def put_many(self, items: Iterable[Tuple[str, Message]]) -> None:
+        """Remember analyzed messages under their key."""
+        now = time.monotonic()
+        with self._lock:
+            for key, message in items:
+                self._messages[key] = (now, message.copy())
+                self._messages.move_to_end(key)
+            while len(self._messages) > self.max_messages:
+                self._messages.popitem(last=False)
+
+    def __len__(self) -> int:
+        """Count the messages that have not expired."""
+        with self._lock:
+            self._expire(time.monotonic())
+            return len(self._messages)
+
+    def _expire(self, now: float) -> None:
+        deadline = now - self.ttl_s
+        while self._messages:
+            key, (used_at, _) = next(iter(self._messages.items()))
+            if used_at >= deadline:
+                break
+            del self._messages[key]
+
+
+_STORES: Dict[Tuple[Any, ...], SessionStore] = {}
+_MEMOS: Dict[Tuple[Any, ...], MessageMemo] = {}
+_LOCK = threading.Lock()
+
+
+def get_session_store(workspace: Tuple[Any, ...], ttl_s: float, max_sessions: int) -> SessionStore:
+    """Process-wide session store of a workspace, as identified by `plugins.client_key`.
+
+    Session ids are only unique within a workspace, so workspaces never share a session's tail.
+    """
+    key = (*workspace, ttl_s, max_sessions)
+    with _LOCK:
+        if key not in _STORES:
+            _STORES[key] = SessionStore(ttl_s=ttl_s, max_sessions=max_sessions)
+        return _STORES[key]
+
+
+def get_message_memo(workspace: Tuple[Any, ...], ttl_s: float, max_messages: int) -> MessageMemo:
+    """Process-wide message memo of a workspace, as identified by `plugins.client_key`."""
+    key = (*workspace, ttl_s, max_messages)
+    with _LOCK:
+        if key not in _MEMOS:
+            _MEMOS[key] = MessageMemo(ttl_s=ttl_s, max_messages=max_messages)
+        return _MEMOS[key]
@@ -0,0 +1,23 @@
+"""Newline-delimited JSON readers and writers for analyzing streams in bounded batches."""
+import json
+from typing import Any, Dict, Iterable, Iterator
+
+
+def read_ndjson(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Parse one JSON object per line, skipping blank lines, without materializing the input."""
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError as error:
+            raise ValueError(f"Invalid JSON on line {number}: {error}") from error
+        if not isinstance(item, dict):
+            raise ValueError(f"Expected a JSON object on line {number}, got {type(item).__name__}")
+        yield item
+
+
+def write_ndjson(items: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """Serialize objects as newline-terminated JSON lines, as they come."""
+    for item in items:
+        yield json.dumps(item) + "\n"
@@ -0,0 +1,78 @@
+"""Zero-shot intent model tiers, trading accuracy for latency.
+
+Tiers are ordered from the fastest to the most accurate. Their latency estimates are rough
+per-block costs of the zero-shot tagger; `benchmarks/tiers.py` measures them on a labeled corpus.
+"""
+from typing import List, NamedTuple, Optional, Sequence
+
+
+class ModelTier(NamedTuple):
+    """A zero-shot model and label set, with an estimate of its latency.
+
+    `uncased` models predict the same intent for texts that only differ in case.
+    """
+
+    name: str
+    hf_model_path: str
+    labels: Sequence[str]
+    overhead_s: float
+    block_s: float
+    uncased: bool
+
+    def estimate_s(self, n_blocks: int) -> float:
+        """Estimated seconds to tag `n_blocks` message blocks."""
+        return self.overhead_s + self.block_s * n_blocks
+
+
+DEFAULT_TIER = "default"
+ALL_LABELS = ("hello", "praise", "complaint", "question", "request", "explanation")
+TIERS = {
+    tier.name: tier
+    for tier in (
+        ModelTier(
+            "fast",
+            "typeform/mobilebert-uncased-mnli",
+            ("hello", "complaint", "question", "request"),
+            overhead_s=0.5,
+            block_s=0.005,
+            uncased=True,
+        ),
+        ModelTier(
+            DEFAULT_TIER,
+            "typeform/distilbert-base-uncased-mnli",
+            ALL_LABELS,
+            overhead_s=0.5,
+            block_s=0.01,
+            uncased=True,
+        ),
+        ModelTier(
+            "accurate",
+            "facebook/bart-large-mnli",
+            ALL_LABELS,
+            overhead_s=0.5,
+            block_s=0.05,
+            uncased=False,
+        ),
+    )
+}
+
+
+def parse_tiers(names: str) -> List[ModelTier]:
+    """Tiers named in a comma-separated list, from the fastest to the most accurate."""
+    tiers = []
+    for name in (name.strip() for name in names.split(",")):
+        if name not in TIERS:
+            raise ValueError(f"Unknown intent tier {name!r}, expected one of {list(TIERS)}")
+        tiers.append(TIERS[name])
+    order = list(TIERS)
+    return sorted(set(tiers), key=lambda tier: order.index(tier.name))
+
+
+def select_tier(tiers: Sequence[ModelTier], n_blocks: int, budget_s: Optional[float]) -> ModelTier:
+    """Most accurate tier expected to tag `n_blocks` blocks within the budget, else the fastest."""
+    if budget_s is None:
+        return tiers[-1]
+    for tier in reversed(tiers):
+        if tier.estimate_s(n_blocks) <= budget_s:
+            return tier
+    return tiers[0]
@@ -0,0 +1,81 @@
+"""Splitting of long chat streams into overlapping windows and stitching of their results."""
+from typing import List, Sequence, Tuple, TypeVar
+
+from api_spec import Message
+
+T = TypeVar("T")
+
+
+def split_windows(
+    chat_stream: Sequence[Message], max_messages: int, max_chars: int, overlap: int = 0
+) -> List[Tuple[int, int]]:
+    """Split a chat stream into [start, end) windows of bounded message count and text length.
+
+    Consecutive windows share `overlap` messages so that the tagger sees context on both sides of
+    a window boundary. A single message longer than `max_chars` still gets a window of its own.
+    """
+    if max_messages <= 0:
+        raise ValueError("max_messages must be positive")
+    windows: List[Tuple[int, int]] = []
+    start = 0
+    while start < len(chat_stream):
+        end, chars = start, 0
+        while end < len(chat_stream) and end - start < max_messages:
+            chars += len(chat_stream[end].text)
+            if end > start and max_chars > 0 and chars > max_chars:
+                break
+            end += 1
+        windows.append((start, end))
+        if end == len(chat_stream):
+            break
+        start = max(start + 1, end - overlap)
+    return windows
+
+
+def ownership(windows: Sequence[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Range of messages whose results are taken from each window.
+
+    Overlapping messages are split halfway, so every message is owned by the window that sees the
+    most context around it.
+    """
+    owned = []
+    lower = 0
+    for (start, end), (next_start, _) in zip(windows, windows[1:]):
+        cut = max(lower, next_start + (end - next_start) // 2)
+        owned.append((lower, cut))
+        lower = cut
+    if windows:
+        owned.append((lower, windows[-1][1]))
+    return owned
+
+
+def stitch(windows: Sequence[Tuple[int, int]], window_values: Sequence[Sequence[T]]) -> List[T]:
+    """Merge per-window, per-message values into one value per message of the stream."""
+    values: List[T] = []
+    for (start, _), (lower, upper), local_values in zip(windows, ownership(windows), window_values):
+        values.extend(local_values[lower - start : upper - start])
+    return values
+
+
+def pack_windows(
+    sizes: Sequence[Tuple[int, int]], max_messages: int, max_chars: int
+) -> List[List[int]]:
+    """Group consecutive windows, given as (messages, chars) sizes, into budget-bounded batches.
+
+    Each batch becomes one plugin submission, so many small conversations share a round trip.
+    """
+    batches: List[List[int]] = []
+    messages = chars = 0
+    for idx, (window_messages, window_chars) in enumerate(sizes):
+        if batches and (
+            messages + window_messages > max_messages
+            or (max_chars > 0 and chars + window_chars > max_chars)
+        ):
+            batches.append([])
+            messages = chars = 0
+        if not batches:
+            batches.append([])
+        batches[-1].append(idx)
+        messages += window_messages
+        chars += window_chars
+    return batches
@@ -0,0 +1,46 @@
+"""Package state kept as files in the workspace, so that every process of the package sees it.
+
+Each piece of state is a JSON document stored as the text of a single block, in a file tagged
+with STATE_TAG_KIND and the name of the state. Saving writes a new file and deletes the older
+ones, and loading reads the most recently saved file.
+"""
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+from steamship import Block, File, Tag
+
+STATE_TAG_KIND: str = "chat-analytics-state"
+
+
+def _state_files(client: Any, name: str) -> List[File]:
+    response = File.query(
+        client,
+        tag_filter_query=f"filetag and kind {json.dumps(STATE_TAG_KIND)} "
+        f"and name {json.dumps(name)}",
+    )
+    return [file if file.blocks else file.refresh() for file in response.files]
+
+
+def _saved_at(file: File) -> float:
+    return json.loads(file.blocks[0].text)["saved_at"] if file.blocks else 0.0
+
+
+def load_state(client: Any, name: str) -> Optional[Dict[str, Any]]:
+    """Return the state last saved under `name` in the workspace, None if there is none."""
+    files = [file for file in _state_files(client, name) if file.blocks]
+    if not files:
+        return None
+    return json.loads(max(files, key=_saved_at).blocks[0].text)["state"]
+
+
+def save_state(client: Any, name: str, state: Dict[str, Any]) -> None:
+    """Save `state` under `name` in the workspace, replacing what was saved before."""
+    previous = _state_files(client, name)
+    File.create(
+        client,
+        blocks=[Block.CreateRequest(text=json.dumps({"saved_at": time.time(), "state": state}))],
+        tags=[Tag.CreateRequest(kind=STATE_TAG_KIND, name=name)],
+    )
+    for file in previous:
+        file.delete()
@@ -0,0 +1,224 @@
+"""Local stand-ins for the Steamship client and the tagger plugins used by the package.
+
+The fake taggers return deterministic synthetic tags derived from a checksum of the text, so
+results are stable across runs and machines, and no Steamship profile is needed.
+"""
+import json
+import re
+import threading
+import time
+import zlib
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from steamship import Block, File, Tag
+from steamship.base import TaskState
+
+INTENT_LABELS = ["hello", "praise", "complaint", "question", "request", "explanation"]
+
+
+def checksum(text: str) -> int:
+    """Stable checksum of a text, used to derive synthetic tags."""
+    return zlib.crc32(text.encode("utf-8"))
+
+
+class FakeTask:
+    """Task that completes `latency_s` seconds after it was submitted."""
+
+    def __init__(self, file: File, latency_s: float = 0.0):
+        self.task_id = str(id(self))
+        self.output = SimpleNamespace(file=file)
+        self._done_at = time.monotonic() + latency_s
+        self.state = TaskState.running
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Update the state of the task."""
+        if time.monotonic() >= self._done_at:
+            self.state = TaskState.succeeded
+
+    def wait(self, max_timeout_s: float = 60, retry_delay_s: float = 1) -> None:
+        """Block until the task has completed."""
+        time.sleep(max(0.0, self._done_at - time.monotonic()))
+        self.refresh()
+
+
+class FakeTagger:
+    """Plugin instance stand-in that records every file it is asked to tag."""
+
+    def __init__(self, handle: str, config: Dict[str, Any], latency_s: float = 0.0):
+        self.handle = handle
+        self.config = config
+        self.latency_s = latency_s
+        self.files: List[File] = []
+        self._lock = threading.Lock()
+
+    def tag(self, doc: File) -> FakeTask:
+        """Tag every block of a file."""
+        with self._lock:
+            self.files.append(doc)
+        return FakeTask(
+            File(blocks=[self.tag_block(block) for block in doc.blocks]), self.latency_s
+        )
+
+    def tag_block(self, block: Block) -> Block:
+        """Tags of a single block."""
+        raise NotImplementedError()
+
+    @property
+    def blocks_tagged(self) -> int:
+        """Count the blocks submitted so far."""
+        return sum(len(file.blocks) for file in self.files)
+
+
+class FakeOneAITagger(FakeTagger):
+    """Dialogue segmentation and sentiments over the speaker spans of a block."""
+
+    def __init__(
+        self, handle: str, config: Dict[str, Any], latency_s: float = 0.0, thread_every: int = 4
+    ):
+        super().__init__(handle, config, latency_s)
+        self.thread_every = thread_every
+
+    def tag_block(self, block: Block) -> Block:
+        """Segment at speaker spans whose checksum says so, and tag a sentiment per span."""
+        speaker_tags = [tag for tag in block.tags or [] if tag.kind == "speaker"]
+        tags = list(block.tags or [])
+        segment = "dialogue-segmentation" in self.config.get("skills", "dialogue-segmentation")
+        segment_start = 0
+        for tag in speaker_tags:
+            span_text = block.text[tag.start_idx : tag.end_idx]
+            if (
+                segment
+                and tag.start_idx > segment_start
+                and checksum(span_text) % self.thread_every == 0
+            ):
+                tags.append(
+                    Tag(
+                        kind="dialogue-segmentation", start_idx=segment_start, end_idx=tag.start_idx
+                    )
+                )
+                segment_start = tag.start_idx
+            sentiment = ["POS", "NEG", None][checksum(span_text) % 3]
+            if sentiment is not None:
+                tags.append(
+                    Tag(
+                        kind="sentiments",
+                        start_idx=tag.start_idx,
+                        end_idx=tag.end_idx,
+                        name=sentiment,
+                    )
+                )
+        if segment:
+            tags.append(
+                Tag(kind="dialogue-segmentation", start_idx=segment_start, end_idx=len(block.text))
+            )
+        return Block(text=block.text, tags=tags)
+
+
+class FakeZeroShotTagger(FakeTagger):
+    """Single-label intent per block."""
+
+    def tag_block(self, block: Block) -> Block:
+        """Tag one of the configured labels, chosen by the checksum of the text."""
+        labels = self.config.get("labels", ",".join(INTENT_LABELS)).split(",")
+        label = labels[checksum(block.text) % len(labels)]
+        return Block(
+            text=block.text, tags=[Tag(kind=self.config.get("tag_kind", "intent"), name=label)]
+        )
+
+
+class FakeClient:
+    """Steamship client stand-in that hands out fake taggers and stores uploaded files.
+
+    The first `fail_uploads` file uploads raise, to exercise retries.
+    """
+
+    def __init__(self, latency_s: float = 0.0, fail_uploads: int = 0):
+        self.latency_s = latency_s
+        self.fail_uploads = fail_uploads
+        self.plugins: Dict[str, FakeTagger] = {}
+        self.files: List[File] = []
+        self.config = None
+        self.operations: List[str] = []
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def post(self, operation: str, payload: Any = None, expect: Any = None, **_) -> Any:
+        """Store, query, get or delete files the way the Steamship engine does."""
+        self.operations.append(operation)
+        if operation == "file/query":
+            return expect(files=self.query(payload.tag_filter_query))
+        if operation == "file/get":
+            return next(file for file in self.files if file.id == payload.id)
+        if operation == "file/delete":
+            with self._lock:
+                self.files = [file for file in self.files if file.id != payload.id]
+            return None
+        if operation != "file/create":
+            raise NotImplementedError(operation)
+        with self._lock:
+            if self.fail_uploads > 0:
+                self.fail_uploads -= 1
+                raise ConnectionError("Simulated upload failure.")
+            self._created += 1
+            file = File(
+                id=str(self._created),
+                blocks=[
+                    Block(text=block.text, tags=[Tag(**tag.dict()) for tag in block.tags or []])
+                    for block in payload.blocks or []
+                ],
+                tags=[Tag(**tag.dict()) for tag in payload.tags or []],
+            )
+            file.client = self
+            self.files.append(file)
+        return file
+
+    def query(self, tag_filter_query: str) -> List[File]:
+        """Files matching a `filetag` or `blocktag` query on a kind and optionally some names."""
+        kind = json.loads(re.search(r'kind ("(?:[^"\\]|\\.)*")', tag_filter_query).group(1))
+        names = {
+            json.loads(name) for name in re.findall(r'name ("(?:[^"\\]|\\.)*")', tag_filter_query)
+        }
+
+        def matches(tags: Optional[List[Tag]]) -> bool:
+            return any(tag.kind == kind and (not names or tag.name in names) for tag in tags or [])
+
+        if tag_filter_query.startswith("filetag"):
+            return [file for file in self.files if matches(file.tags)]
+        return [file for file in self.files if any(matches(block.tags) for block in file.blocks)]
+
+    def use_plugin(
+        self,
+        plugin_handle: str,
+        instance_handle: Optional[str] = None,
+        config: Dict[str, Any] = None,
+        **_
+    ) -> FakeTagger:
+        """Return the fake tagger of a plugin instance, named as the package names them."""
+        instance_handle = instance_handle or plugin_handle + "1"
+        if instance_handle not in self.plugins:
+            tagger_cls = (
+                FakeOneAITagger if plugin_handle.startswith("oneai") else FakeZeroShotTagger
+            )
+            self.plugins[instance_handle] = tagger_cls(
+                instance_handle, config or {}, latency_s=self.latency_s
+            )
+        return self.plugins[instance_handle]
+
+    @property
+    def oneai(self) -> FakeTagger:
+        """Return the fake OneAI tagger."""
+        return self.use_plugin("oneai-tagger")
+
+    @property
+    def oneai_sentiments(self) -> FakeTagger:
+        """Return the fake OneAI tagger for sentiments only."""
+        return self.use_plugin(
+            "oneai-tagger", "oneai-tagger-sentiments1", config={"skills": "sentiments"}
+        )
+
+    @property
+    def zero_shot(self) -> FakeTagger:
+        """Return the fake zero-shot tagger."""
+        return self.use_plugin("zero-shot-tagger-default")
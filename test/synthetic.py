@@ -0,0 +1,87 @@
+"""Generator of synthetic, unthreaded chat streams of any size."""
+import random
+from datetime import datetime, timedelta
+from typing import List
+
+from api_spec import Intent, Message
+
+WORDS = (
+    "the bot font size thread customer issue styling colours team verbose settings message "
+    "please update ticket support reply channel export error login account billing plan"
+).split()
+BOILERPLATE = ["Thanks!", "+1", "Hi Team!", "ab.bot: please assign this message to a thread."]
+INTENT_TEMPLATES = {
+    Intent.SALUTATION: ["Hi team!", "Hello everyone", "Good morning all", "Hey there folks"],
+    Intent.PRAISE: ["Thanks so much, the {} works great", "Great job on the {}", "Love the new {}"],
+    Intent.COMPLAINT: ["The {} is broken again", "This {} keeps failing", "Terrible {} experience"],
+    Intent.QUESTION: ["How do I change the {}?", "Where can I find the {}?", "Why is the {} gone?"],
+    Intent.REQUEST: [
+        "Please update the {}",
+        "Could you add a {} option",
+        "Can someone reset my {}",
+    ],
+    Intent.EXPLANATION: ["It fails because the {} expired", "That happens since the {} changed"],
+}
+
+
+def generate_chat_stream(
+    n_messages: int,
+    n_users: int = 5,
+    mean_thread_length: float = 8.0,
+    min_words: int = 3,
+    max_words: int = 30,
+    boilerplate_rate: float = 0.1,
+    seed: int = 0,
+) -> List[Message]:
+    """Generate a chat stream of interleaved threads.
+
+    A new thread starts with probability 1 / mean_thread_length and follows a longer idle gap.
+    A fraction of the messages are repeated boilerplate, as in real support rooms.
+    """
+    rng = random.Random(seed)
+    timestamp = datetime(2022, 6, 15, 16, 18, 33)
+    chat_stream = []
+    for idx in range(n_messages):
+        new_thread = idx > 0 and rng.random() < 1.0 / mean_thread_length
+        timestamp += timedelta(seconds=rng.uniform(600, 3600) if new_thread else rng.uniform(1, 60))
+        if rng.random() < boilerplate_rate:
+            text = rng.choice(BOILERPLATE)
+        else:
+            words = rng.choices(WORDS, k=rng.randint(min_words, max_words))
+            text = " ".join(words).capitalize() + rng.choice([".", "?", "!"])
+        chat_stream.append(
+            Message(
+                message_id=str(idx),
+                timestamp=timestamp,
+                user_id=f"u{rng.randrange(n_users)}",
+                text=text,
+            )
+        )
+    return chat_stream
+
+
+def generate_conversations(
+    n_conversations: int, n_messages: int, seed: int = 0
+) -> List[List[Message]]:
+    """Generate many independent conversations of `n_messages` messages each."""
+    return [generate_chat_stream(n_messages, seed=seed + idx) for idx in range(n_conversations)]
+
+
+def generate_labeled_examples(n_messages: int, seed: int = 0) -> List[Message]:
+    """Generate messages labeled with the intent of the template their text was built from."""
+    rng = random.Random(seed)
+    timestamp = datetime(2022, 6, 15, 16, 18, 33)
+    examples = []
+    for idx in range(n_messages):
+        intent = rng.choice(list(INTENT_TEMPLATES))
+        text = rng.choice(INTENT_TEMPLATES[intent]).format(rng.choice(WORDS))
+        examples.append(
+            Message(
+                message_id=f"example-{idx}",
+                timestamp=timestamp + timedelta(seconds=idx),
+                user_id=f"u{rng.randrange(5)}",
+                text=text,
+                intent=intent,
+            )
+        )
+    return examples
@@ -0,0 +1,147 @@
+"""Offline tests for the aggregate index over stored examples."""
+import json
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from test.fakes import FakeClient
+from test.synthetic import generate_labeled_examples
+
+import pytest
+
+import aggregates
+from aggregates import AggregateIndex, time_bucket
+from api_spec import Message, Sentiment
+from src.api import ChatAnalyticsPackage
+
+
+def _message(idx: int, user_id: str, hours: float, sentiment: Sentiment = None) -> Message:
+    return Message(
+        message_id=str(idx),
+        timestamp=datetime(2022, 6, 15) + timedelta(hours=hours),
+        user_id=user_id,
+        text="text",
+        sentiment=sentiment,
+        root_message_id="0",
+    )
+
+
+def test_index_counts_per_dimension() -> None:
+    """Messages and labels are counted per user, thread and time bucket."""
+    index = AggregateIndex(bucket_s=3600)
+    index.add(
+        [
+            _message(0, "a", 0.1, Sentiment.POSITIVE),
+            _message(1, "a", 0.5, Sentiment.NEGATIVE),
+            _message(2, "b", 1.5, Sentiment.POSITIVE),
+            _message(3, "b", 2.5),
+        ]
+    )
+
+    assert index.query("user", keys=["a"]) == {
+        "a": {"messages": 2, "sentiment": {"Positive": 1, "Negative": 1}, "intent": {}}
+    }
+    assert index.query("thread")["0"]["messages"] == 4
+    assert list(index.query("time")) == [
+        "2022-06-15T00:00:00+00:00",
+        "2022-06-15T01:00:00+00:00",
+        "2022-06-15T02:00:00+00:00",
+    ]
+    assert list(index.query("time", start="2022-06-15T01:00:00", end="2022-06-15T02:00:00")) == [
+        "2022-06-15T01:00:00+00:00"
+    ]
+    with pytest.raises(ValueError):
+        index.query("channel")
+
+
+def test_index_round_trips_through_its_state() -> None:
+    """A loaded state gives the same counts and keeps counting each file once."""
+    index = AggregateIndex()
+    index.add([_message(0, "a", 0, Sentiment.POSITIVE)], file_id="1")
+    loaded = AggregateIndex()
+    loaded.load(json.loads(json.dumps(index.state())))
+    loaded.add([_message(0, "a", 0, Sentiment.POSITIVE)], file_id="1")
+    loaded.add([_message(1, "a", 0, Sentiment.POSITIVE)], file_id="2")
+
+    assert loaded.query("user")["a"]["sentiment"] == {"Positive": 2}
+    assert loaded.files == {"1", "2"}
+
+
+def test_query_endpoint_follows_ingestion() -> None:
+    """Counts are updated on ingest and match a rebuild from the stored examples."""
+    client = FakeClient()
+    examples = generate_labeled_examples(300)
+    app = ChatAnalyticsPackage(client, config={"aggregate_bucket_s": 60})
+    app.add_examples(examples[:100])
+    app.bulk_add_examples([example.dict(format_dates=True) for example in examples[100:]])
+
+    groups = app.query_aggregates("user").data["groups"]
+    expected = Counter((example.user_id, example.intent.value) for example in examples)
+    assert {
+        (user_id, intent): count
+        for user_id, counts in groups.items()
+        for intent, count in counts["intent"].items()
+    } == dict(expected)
+    assert (
+        sum(group["messages"] for group in app.query_aggregates("time").data["groups"].values())
+        == 300
+    )
+    assert time_bucket(examples[0].timestamp, 60) in app.query_aggregates("time").data["groups"]
+
+    assert app.rebuild_aggregates().data == {"messages": 300}
+    assert app.query_aggregates("user").data["groups"] == groups
+
+
+def test_cold_start_only_reads_new_files(monkeypatch) -> None:
+    """A new process loads the saved counts and only reads the files stored since."""
+    client = FakeClient()
+    examples = generate_labeled_examples(50)
+    ChatAnalyticsPackage(client).add_examples(examples[:30])
+    ChatAnalyticsPackage(client).query_aggregates("user")
+
+    aggregates._INDEXES.clear()
+    ChatAnalyticsPackage(client).add_examples(examples[30:])
+    aggregates._INDEXES.clear()
+    counted = []
+    add = AggregateIndex.add
+
+    def counting_add(self, chat_stream, file_id=None):
+        counted.append(len(chat_stream))
+        add(self, chat_stream, file_id)
+
+    monkeypatch.setattr(AggregateIndex, "add", counting_add)
+    groups = ChatAnalyticsPackage(client).query_aggregates("user").data["groups"]
+
+    assert counted == [20]
+    assert sum(group["messages"] for group in groups.values()) == 50
+    assert len([file for file in client.files if file.tags]) == 1
+    assert ChatAnalyticsPackage(client).rebuild_aggregates().data == {"messages": 50}
+    assert ChatAnalyticsPackage(client).query_aggregates("user").data["groups"] == groups
+
+
+def test_uploads_do_not_read_stored_examples() -> None:
+    """An upload in a process whose index was not loaded yet leaves the counting to queries."""
+    client = FakeClient()
+
+    ChatAnalyticsPackage(client).add_examples(generate_labeled_examples(10))
+
+    assert client.operations == ["file/create"]
+
+
+def test_concurrent_first_uploads_share_one_index(monkeypatch) -> None:
+    """Upload workers that create the index at the same time all count into the same one."""
+    init = AggregateIndex.__init__
+
+    def slow_init(self, *args, **kwargs):
+        time.sleep(0.05)
+        init(self, *args, **kwargs)
+
+    monkeypatch.setattr(AggregateIndex, "__init__", slow_init)
+    examples = generate_labeled_examples(400)
+    app = ChatAnalyticsPackage(
+        FakeClient(), config={"examples_chunk_size": 100, "max_in_flight_uploads": 4}
+    )
+
+    app.bulk_add_examples([example.dict(format_dates=True) for example in examples])
+
+    groups = app.query_aggregates("user").data["groups"]
+    assert sum(group["messages"] for group in groups.values()) == 400
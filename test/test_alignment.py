@@ -0,0 +1,141 @@
+"""Offline tests for aligning tagger output onto chat messages."""
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import List
+
+import pytest
+from steamship import Block, Tag
+
+from alignment import (
+    annotate,
+    block_intent,
+    concatenate,
+    message_ranges,
+    message_sentiments,
+    oneai_features,
+)
+from api_spec import Intent, Message, Sentiment
+
+
+def _synthetic_stream(rng: random.Random, n_messages: int) -> List[Message]:
+    start = datetime(2022, 6, 15, 16, 18, 33)
+    return [
+        Message(
+            message_id=str(idx),
+            timestamp=start + timedelta(seconds=idx),
+            user_id=str(rng.randint(0, 3)),
+            text=" ".join("word" for _ in range(rng.randint(1, 12))),
+        )
+        for idx in range(n_messages)
+    ]
+
+
+def _synthetic_spans(rng: random.Random, text_length: int, n_spans: int) -> List[Tag]:
+    spans = []
+    for _ in range(n_spans):
+        start = rng.randint(0, text_length)
+        end = min(text_length, start + rng.randint(1, 80))
+        spans.append(
+            Tag(kind="sentiments", start_idx=start, end_idx=end, name=rng.choice(["POS", "NEG"]))
+        )
+    return spans
+
+
+def _quadratic_sentiments(chat_stream: List[Message], sentiment_tags: List[Tag]) -> List[Sentiment]:
+    """Reference implementation: rescan every span for every message, with half-open overlap."""
+    sentiment_tags = sorted(sentiment_tags, key=lambda x: x.start_idx)
+    sentiments = []
+    i = 0
+    for message in chat_stream:
+        local_sentiment_tags = [
+            sentiment_tag
+            for sentiment_tag in sentiment_tags
+            if sentiment_tag.start_idx < i + len(message.text) and sentiment_tag.end_idx > i
+        ]
+        if local_sentiment_tags:
+            sentiment_tag = Counter(
+                sentiment_tag.name for sentiment_tag in local_sentiment_tags
+            ).most_common(1)[0][0]
+            sentiments.append(Sentiment.POSITIVE if sentiment_tag == "POS" else Sentiment.NEGATIVE)
+        else:
+            sentiments.append(Sentiment.NEUTRAL)
+        i += len(message.text)
+    return sentiments
+
+
+def test_speaker_tags_match_message_text() -> None:
+    """Speaker tags must cover exactly the text of their message, without drift."""
+    chat_stream = _synthetic_stream(random.Random(0), 50)
+    text, tags = concatenate(chat_stream)
+
+    assert len(tags) == len(chat_stream)
+    for message, tag in zip(chat_stream, tags):
+        assert text[tag.start_idx : tag.end_idx] == message.text
+        assert tag.name == message.user_id
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_sentiments_match_quadratic_scan(seed: int) -> None:
+    """The interval sweep must agree with a full rescan of the sentiment spans."""
+    rng = random.Random(seed)
+    chat_stream = _synthetic_stream(rng, rng.randint(1, 200))
+    text_length = message_ranges(chat_stream)[-1][1]
+    sentiment_tags = _synthetic_spans(rng, text_length, rng.randint(0, 100))
+
+    expected = _quadratic_sentiments(chat_stream, sentiment_tags)
+
+    assert message_sentiments(message_ranges(chat_stream), sentiment_tags) == expected
+
+
+@pytest.mark.parametrize(
+    "ranges, spans, expected",
+    [
+        (
+            [(0, 10), (10, 20), (20, 30)],
+            [(0, 10), (20, 30)],
+            [Sentiment.NEGATIVE, Sentiment.NEUTRAL, Sentiment.NEGATIVE],
+        ),
+        (
+            [(0, 10), (10, 10), (10, 20)],
+            [(0, 10), (10, 20)],
+            [Sentiment.NEGATIVE, Sentiment.NEUTRAL, Sentiment.NEGATIVE],
+        ),
+        ([(0, 10), (10, 10), (10, 20)], [(5, 15)], [Sentiment.NEGATIVE] * 3),
+    ],
+)
+def test_sentiments_of_touching_spans(ranges, spans, expected) -> None:
+    """Spans that only touch a message at its boundary do not count for it."""
+    sentiment_tags = [
+        Tag(kind="sentiments", start_idx=start, end_idx=end, name="NEG") for start, end in spans
+    ]
+
+    assert message_sentiments(ranges, sentiment_tags) == expected
+
+
+def test_annotate_threads_and_intents() -> None:
+    """Segments open new threads and caller-supplied fields are kept."""
+    chat_stream = _synthetic_stream(random.Random(1), 4)
+    chat_stream[2].root_message_id = "explicit"
+    chat_stream[3].intent = Intent.PRAISE
+    ranges = message_ranges(chat_stream)
+    oneai_tags = [
+        Tag(kind="dialogue-segmentation", start_idx=0, end_idx=ranges[1][1]),
+        Tag(kind="dialogue-segmentation", start_idx=ranges[2][0], end_idx=ranges[3][1]),
+    ]
+    intents = [
+        block_intent(Block(text=message.text, tags=[Tag(kind="intent", name="hello")]))
+        for message in chat_stream
+    ]
+
+    starts, sentiments = oneai_features(chat_stream, oneai_tags)
+    annotate(chat_stream, starts, sentiments, intents)
+
+    assert [message.root_message_id for message in chat_stream] == [
+        "0",
+        "0",
+        "explicit",
+        "explicit",
+    ]
+    assert [message.intent for message in chat_stream] == [Intent.SALUTATION] * 3 + [Intent.PRAISE]
+    assert all(message.sentiment == Sentiment.NEUTRAL for message in chat_stream)
@@ -0,0 +1,102 @@
+"""Offline tests for micro-batching concurrent analyze calls."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from test.fakes import FakeClient
+from test.synthetic import generate_conversations
+from typing import List
+
+import pytest
+
+from coalescing import Coalescer
+from metrics import REGISTRY
+from src.api import ChatAnalyticsPackage
+
+CONFIG = {"intent_cache_size": 0, "memo_ttl_s": 0, "response_metrics": True}
+
+
+def _exported_runs(plugin: str) -> int:
+    return sum(
+        histogram.count
+        for (name, labels), histogram in REGISTRY._histograms.items()
+        if name == "plugin_seconds" and dict(labels) == {"phase": "run", "plugin": plugin}
+    )
+
+
+def test_concurrent_requests_share_a_run() -> None:
+    """Requests arriving within the wait are run together and get their own results back."""
+    coalescer = Coalescer(max_wait_s=0.1, max_size=1000)
+    batches: List[List[int]] = []
+
+    def run(items: List[int]) -> List[int]:
+        batches.append(items)
+        return [item * 2 for item in items]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda item: coalescer.submit(item, 1, run), range(8)))
+
+    assert results == [item * 2 for item in range(8)]
+    assert len(batches) < 8
+    assert sorted(item for batch in batches for item in batch) == list(range(8))
+    assert (coalescer.batches, coalescer.requests) == (len(batches), 8)
+
+
+def test_size_threshold_cuts_the_wait_short() -> None:
+    """A batch that reaches max_size runs without waiting for the rest of max_wait_s."""
+    coalescer = Coalescer(max_wait_s=10, max_size=2)
+    t0 = time.monotonic()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = list(executor.map(lambda item: coalescer.submit(item, 1, list), ["a", "b"]))
+
+    assert sorted(results) == ["a", "b"]
+    assert time.monotonic() - t0 < 1
+
+
+def test_errors_reach_every_caller() -> None:
+    """A failed run raises in each request of its batch."""
+    coalescer = Coalescer(max_wait_s=0.05, max_size=1000)
+    errors = []
+    barrier = threading.Barrier(3)
+
+    def run(items):
+        raise RuntimeError("plugin down")
+
+    def call(item):
+        barrier.wait()
+        with pytest.raises(RuntimeError):
+            coalescer.submit(item, 1, run)
+        errors.append(item)
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        list(executor.map(call, range(3)))
+    assert sorted(errors) == [0, 1, 2]
+
+
+def test_concurrent_analyze_calls_share_submissions() -> None:
+    """Concurrent analyze calls are tagged in shared submissions and split back per caller."""
+    payloads = [
+        [message.dict(format_dates=True, format_enums=True) for message in chat_stream]
+        for chat_stream in generate_conversations(6, 10)
+    ]
+    expected = [
+        ChatAnalyticsPackage(FakeClient(), config=CONFIG).analyze(payload).data["chat_stream"]
+        for payload in payloads
+    ]
+    client = FakeClient(latency_s=0.01)
+    config = {**CONFIG, "coalesce_wait_s": 0.2}
+    barrier = threading.Barrier(len(payloads))
+    exported_before = _exported_runs("oneai-tagger")
+
+    def call(payload):
+        barrier.wait()
+        return ChatAnalyticsPackage(client, config=config).analyze(payload).data
+
+    with ThreadPoolExecutor(max_workers=len(payloads)) as executor:
+        responses = list(executor.map(call, payloads))
+
+    assert [response["chat_stream"] for response in responses] == expected
+    assert len(client.oneai.files) < len(payloads)
+    assert sum(
+        1 / response["metrics"]["sizes"]["coalesced_requests"] for response in responses
+    ) == pytest.approx(len(client.zero_shot.files))
+    assert _exported_runs("oneai-tagger") - exported_before == len(client.oneai.files)
@@ -0,0 +1,74 @@
+"""Offline tests for the columnar export of analyzed messages."""
+import base64
+from test.fakes import FakeClient
+from test.synthetic import generate_chat_stream, generate_labeled_examples
+
+import pytest
+
+from api_spec import Message
+from src.api import ChatAnalyticsPackage
+
+
+def test_unknown_format_is_rejected() -> None:
+    """Formats other than Arrow IPC and Parquet are refused before anything is read."""
+    with pytest.raises(ValueError):
+        ChatAnalyticsPackage(FakeClient()).export_examples(format="csv")
+
+
+@pytest.mark.parametrize("suffix", [".arrow", ".parquet"])
+def test_export_round_trips_through_a_memory_mapped_file(tmp_path, suffix) -> None:
+    """Stored examples come back column by column, with dictionary-encoded labels."""
+    pa = pytest.importorskip("pyarrow")
+    from columnar import read_table, rollup
+
+    client = FakeClient()
+    examples = generate_labeled_examples(200)
+    app = ChatAnalyticsPackage(client)
+    app.add_examples(examples)
+    path = tmp_path / f"examples{suffix}"
+    # The package service base64-encodes binary response bodies.
+    path.write_bytes(base64.b64decode(app.export_examples(format=suffix[1:]).data))
+
+    table = read_table(str(path))
+    assert table.num_rows == 200
+    assert pa.types.is_dictionary(table.schema.field("intent").type)
+    stored = {
+        row["message_id"]: row["intent"]
+        for row in table.select(["message_id", "intent"]).to_pylist()
+    }
+    assert stored == {example.message_id: example.intent.value for example in examples}
+
+    counts = rollup(table, by="user_id", field="intent").to_pylist()
+    assert sum(row["messages"] for row in counts) == 200
+    assert {row["user_id"] for row in counts} == {example.user_id for example in examples}
+
+
+def test_analyze_returns_columnar_messages() -> None:
+    """Analyzed messages come back as a columnar file with the same fields as the JSON ones."""
+    pa = pytest.importorskip("pyarrow")
+    payload = [
+        message.dict(format_dates=True, format_enums=True) for message in generate_chat_stream(20)
+    ]
+    config = {"intent_cache_size": 0, "memo_ttl_s": 0}
+    expected = ChatAnalyticsPackage(FakeClient(), config=config).analyze(payload).data
+    response = ChatAnalyticsPackage(FakeClient(), config=config).analyze(payload, format="arrow")
+
+    table = pa.ipc.open_file(pa.py_buffer(base64.b64decode(response.data))).read_all()
+    fields = ["message_id", "user_id", "text", "sentiment", "intent", "root_message_id"]
+    assert table.select(fields).to_pylist() == [
+        {field: message[field] for field in fields} for message in expected["chat_stream"]
+    ]
+    with pytest.raises(ValueError):
+        ChatAnalyticsPackage(FakeClient()).analyze(payload, compact=True, format="parquet")
+
+
+def test_to_table_keeps_missing_labels_null() -> None:
+    """Messages without a sentiment or thread export nulls, and naive timestamps are UTC."""
+    pytest.importorskip("pyarrow")
+    from columnar import to_table
+
+    message = Message(message_id="0", timestamp="2022-06-15T16:18:33", user_id="u", text="hi")
+    row = to_table([message]).to_pylist()[0]
+
+    assert row["sentiment"] is None and row["root_message_id"] is None
+    assert row["timestamp"].isoformat() == "2022-06-15T16:18:33+00:00"
@@ -0,0 +1,55 @@
+"""Offline tests for compact responses that only carry the inferred fields."""
+import json
+from test.fakes import FakeClient
+from test.synthetic import generate_chat_stream, generate_conversations
+
+from compact import FIELDS, expand, run_lengths
+from src.api import ChatAnalyticsPackage
+
+CONFIG = {"intent_cache_size": 0, "memo_ttl_s": 0}
+
+
+def test_run_lengths_round_trip() -> None:
+    """Runs of equal values are collapsed and expand back to the original values."""
+    values = ["0", "0", "0", "3", None, None, "0"]
+    assert run_lengths(values) == [["0", 3], ["3", 1], [None, 2], ["0", 1]]
+    assert expand(run_lengths(values)) == values
+    assert run_lengths([]) == []
+
+
+def test_compact_response_matches_full_response() -> None:
+    """Expanded compact fields equal the full response, except the fields the caller supplied."""
+    payload = [
+        message.dict(format_dates=True, format_enums=True)
+        for message in generate_chat_stream(200, min_words=60, max_words=120)
+    ]
+    payload[0]["sentiment"] = "Negative"
+    payload[1]["intent"] = "Praise"
+    full = ChatAnalyticsPackage(FakeClient(), config=CONFIG).analyze(payload).data
+    compact = ChatAnalyticsPackage(FakeClient(), config=CONFIG).analyze(payload, compact=True).data
+
+    assert compact["message_ids"] == [message["message_id"] for message in payload]
+    for field in FIELDS:
+        expected = [message[field] for message in full["chat_stream"]]
+        if field == "sentiment":
+            expected[0] = None
+        if field == "intent":
+            expected[1] = None
+        assert expand(compact[field]) == expected
+    assert len(compact["root_message_id"]) < len(payload) / 2
+    assert len(json.dumps(compact)) * 10 < len(json.dumps(full))
+
+
+def test_batch_analyze_compact_conversations() -> None:
+    """Every conversation of a batch is returned in the compact form."""
+    conversations = [
+        [message.dict(format_dates=True, format_enums=True) for message in chat_stream]
+        for chat_stream in generate_conversations(3, 10)
+    ]
+    response = ChatAnalyticsPackage(FakeClient(), config=CONFIG).batch_analyze(
+        conversations, compact=True
+    )
+
+    for chat_stream, compact in zip(conversations, response.data["conversations"]):
+        assert compact["message_ids"] == [message["message_id"] for message in chat_stream]
+        assert len(expand(compact["intent"])) == len(chat_stream)
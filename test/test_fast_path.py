@@ -0,0 +1,87 @@
+"""Offline tests for the opt-in fast parsing and serialization path."""
+import json
+from test.fakes import FakeClient
+from test.synthetic import generate_chat_stream
+from typing import List
+
+import pytest
+from pydantic import ValidationError, parse_obj_as
+
+from api_spec import Message
+from fast_path import dump_messages, parse_messages
+from src.api import ChatAnalyticsPackage
+
+EDGE_CASES = [
+    {"message_id": 5, "timestamp": "2022-06-15T16:18:33Z", "user_id": 1.5, "text": "hi"},
+    {"message_id": "6", "timestamp": "2022-06-15 16:18:33.12", "user_id": "a", "text": "x"},
+    {"message_id": "7", "timestamp": 1655300000, "user_id": "a", "text": "y", "extra": 1},
+    {
+        "message_id": "8",
+        "timestamp": "2022-06-15T16:18:33.000100+05:30",
+        "user_id": "a",
+        "text": "z",
+        "sentiment": "Positive",
+        "intent": "Praise",
+        "root_message_id": "7",
+    },
+]
+
+
+def _pydantic_json(items: List[dict]) -> str:
+    messages = parse_obj_as(List[Message], items)
+    return json.dumps([message.dict(format_dates=True, format_enums=True) for message in messages])
+
+
+def test_fast_path_output_is_identical() -> None:
+    """Parsing and serializing through the fast path gives byte-identical JSON."""
+    items = [
+        message.dict(format_dates=True, format_enums=True) for message in generate_chat_stream(500)
+    ] + EDGE_CASES
+
+    assert json.dumps(dump_messages(parse_messages(items))) == _pydantic_json(items)
+
+
+@pytest.mark.parametrize("fraction", ["1", "12", "1234", "12345"])
+def test_fast_path_accepts_any_fraction(fraction: str) -> None:
+    """Fractions that datetime.fromisoformat may not parse fall back to the pydantic path."""
+    item = {
+        "message_id": "1",
+        "timestamp": f"2022-06-15 16:18:33.{fraction}",
+        "user_id": "a",
+        "text": "x",
+    }
+
+    assert json.dumps(dump_messages(parse_messages([item]))) == _pydantic_json([item])
+
+
+@pytest.mark.parametrize(
+    "item",
+    [
+        {"message_id": "1", "timestamp": "yesterday", "user_id": "a", "text": "x"},
+        {"message_id": "1", "timestamp": "2022-06-15T16:18:33", "user_id": "a"},
+        {
+            "message_id": "1",
+            "timestamp": "2022-06-15T16:18:33",
+            "user_id": "a",
+            "text": "x",
+            "intent": "Nope",
+        },
+    ],
+)
+def test_fast_path_rejects_what_pydantic_rejects(item: dict) -> None:
+    """Invalid messages raise the same validation error as the pydantic path."""
+    with pytest.raises(ValidationError):
+        parse_messages([item])
+
+
+def test_analyze_fast_path_matches_default() -> None:
+    """analyze returns the same response with and without the fast path."""
+    payload = [
+        message.dict(format_dates=True, format_enums=True) for message in generate_chat_stream(200)
+    ]
+    default = ChatAnalyticsPackage(FakeClient(), config={"intent_cache_size": 0}).analyze(payload)
+    fast = ChatAnalyticsPackage(
+        FakeClient(), config={"intent_cache_size": 0, "fast_path": True}
+    ).analyze(payload)
+
+    assert json.dumps(fast.data) == json.dumps(default.data)
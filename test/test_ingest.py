@@ -0,0 +1,93 @@
+"""Offline tests for bulk, deduplicated example ingestion."""
+from test.fakes import FakeClient
+from test.synthetic import generate_chat_stream
+from typing import List
+
+from ingest import ExampleIndex, chunked, example_key
+from src.api import ChatAnalyticsPackage
+
+CONFIG = {"examples_chunk_size": 100, "max_in_flight_uploads": 3, "upload_backoff_s": 0}
+
+
+def _examples(n_messages: int) -> List[dict]:
+    return [
+        message.dict(format_dates=True, format_enums=True)
+        for message in generate_chat_stream(n_messages)
+    ]
+
+
+def test_chunked_is_bounded() -> None:
+    """Chunks hold at most the requested number of items and keep their order."""
+    chunks = list(chunked(iter(range(250)), 100))
+
+    assert [len(chunk) for chunk in chunks] == [100, 100, 50]
+    assert [item for chunk in chunks for item in chunk] == list(range(250))
+
+
+def test_bulk_add_examples_uploads_in_chunks() -> None:
+    """Every example is uploaded once, in files of at most one chunk."""
+    client = FakeClient()
+    report = ChatAnalyticsPackage(client, config=CONFIG).bulk_add_examples(_examples(1050)).data
+
+    assert report["uploaded"] == 1050 and report["skipped"] == 0 and report["failed"] == 0
+    assert report["chunks"] == 11
+    assert max(len(file.blocks) for file in client.files) == 100
+    assert sum(len(file.blocks) for file in client.files) == 1050
+
+
+def test_bulk_add_examples_skips_stored_examples() -> None:
+    """Re-sent and duplicated examples are skipped, changed labels are uploaded again."""
+    client = FakeClient()
+    examples = _examples(300)
+    ChatAnalyticsPackage(client, config=CONFIG).bulk_add_examples(examples[:200])
+
+    relabeled = {**examples[0], "intent": "Complaint" if examples[0]["intent"] else "Praise"}
+    payload = examples + examples[250:] + [relabeled]
+    report = ChatAnalyticsPackage(client, config=CONFIG).bulk_add_examples(payload).data
+
+    assert report["received"] == 351
+    assert report["uploaded"] == 101
+    assert report["skipped"] == 250
+    assert sum(len(file.blocks) for file in client.files) == 301
+
+
+def test_bulk_add_examples_skips_examples_stored_by_any_process() -> None:
+    """Examples already in the workspace are skipped without any record of their upload."""
+    client = FakeClient()
+    examples = _examples(150)
+    ChatAnalyticsPackage(client, config=CONFIG).add_examples(examples[:120])
+
+    report = ChatAnalyticsPackage(client, config=CONFIG).bulk_add_examples(examples).data
+
+    assert report["uploaded"] == 30 and report["skipped"] == 120
+    assert sum(len(file.blocks) for file in client.files) == 150
+
+
+def test_bulk_add_examples_retries_failed_uploads() -> None:
+    """Transient upload failures are retried and nothing is lost."""
+    client = FakeClient(fail_uploads=2)
+    report = ChatAnalyticsPackage(client, config=CONFIG).bulk_add_examples(_examples(500)).data
+
+    assert report["uploaded"] == 500 and report["failed"] == 0
+    assert sum(len(file.blocks) for file in client.files) == 500
+
+
+def test_bulk_add_examples_reports_exhausted_retries() -> None:
+    """Chunks that keep failing are reported and can be ingested again later."""
+    client = FakeClient(fail_uploads=10)
+    config = {**CONFIG, "upload_retries": 1}
+    report = ChatAnalyticsPackage(client, config=config).bulk_add_examples(_examples(100)).data
+    assert report["failed"] == 100 and report["uploaded"] == 0
+
+    client.fail_uploads = 0
+    report = ChatAnalyticsPackage(client, config=config).bulk_add_examples(_examples(100)).data
+    assert report["uploaded"] == 100
+
+
+def test_example_index_persists(tmp_path) -> None:
+    """Stored keys survive in the SQLite file and are scoped to their workspace."""
+    keys = [example_key(message) for message in generate_chat_stream(10)]
+    ExampleIndex("a", str(tmp_path / "examples.db")).add(keys[:5])
+
+    assert ExampleIndex("a", str(tmp_path / "examples.db")).missing(keys) == set(keys[5:])
+    assert ExampleIndex("b", str(tmp_path / "examples.db")).missing(keys) == set(keys)
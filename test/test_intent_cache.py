@@ -0,0 +1,96 @@
+"""Offline tests for the content-addressed intent cache."""
+from test.fakes import FakeClient
+from test.synthetic import generate_chat_stream
+
+import pytest
+
+from api_spec import Intent
+from intent_cache import IntentCache, cache_namespace, deduplicate
+from src.api import ChatAnalyticsPackage
+
+NAMESPACE = cache_namespace("model", ["hello", "praise"])
+
+
+def test_normalized_texts_share_an_entry() -> None:
+    """Case and whitespace differences hit the same entry."""
+    cache = IntentCache(NAMESPACE)
+    cache.put("Thanks!", Intent.PRAISE)
+
+    assert cache.get_many(["  thanks! ", "THANKS!", "Thanks?"]) == [
+        Intent.PRAISE,
+        Intent.PRAISE,
+        None,
+    ]
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_cased_models_keep_case() -> None:
+    """Texts for a cased model only share an entry or a slot if they differ in whitespace."""
+    cache = IntentCache(NAMESPACE, uncased=False)
+    cache.put("Thanks!", Intent.PRAISE)
+
+    assert cache.get_many(["  Thanks! ", "THANKS!"]) == [Intent.PRAISE, None]
+    assert deduplicate(["Thanks!", " Thanks!", "thanks!"], uncased=False) == ([0, 2], [0, 0, 1])
+
+
+def test_namespace_separates_models_and_labels() -> None:
+    """Changing the model or label set must not reuse cached intents."""
+    other_labels = IntentCache(cache_namespace("model", ["hello"]))
+    assert IntentCache(NAMESPACE).key("hi") != other_labels.key("hi")
+    assert cache_namespace("model", ["a", "b"]) == cache_namespace("model", ["b", "a"])
+
+
+def test_lru_evicts_least_recently_used() -> None:
+    """The in-process tier keeps at most max_size entries."""
+    cache = IntentCache(NAMESPACE, max_size=2)
+    cache.put("a", Intent.QUESTION)
+    cache.put("b", Intent.REQUEST)
+    cache.get("a")
+    cache.put("c", Intent.COMPLAINT)
+
+    assert cache.get_many(["a", "b", "c"]) == [Intent.QUESTION, None, Intent.COMPLAINT]
+
+
+def test_sqlite_tier_persists_and_evicts(tmp_path) -> None:
+    """The on-disk tier survives a new cache instance and is trimmed to max_rows."""
+    path = str(tmp_path / "intents.sqlite")
+    cache = IntentCache(NAMESPACE, max_size=0, path=path, max_rows=2)
+    cache.put("a", Intent.QUESTION)
+    cache.put("b", Intent.REQUEST)
+    cache.put("c", Intent.COMPLAINT)
+
+    reopened = IntentCache(NAMESPACE, path=path, max_rows=2)
+    assert reopened.get_many(["a", "b", "c"]) == [None, Intent.REQUEST, Intent.COMPLAINT]
+
+
+def test_deduplicate_maps_copies_to_first_occurrence() -> None:
+    """Texts that normalize alike share one slot."""
+    assert deduplicate(["+1", "Thanks!", " +1", "thanks!", "ok"]) == ([0, 1, 4], [0, 1, 0, 1, 2])
+
+
+def test_repeated_texts_are_tagged_once() -> None:
+    """Each distinct text is one intent block, and its intent is fanned out to every copy."""
+    chat_stream = generate_chat_stream(40)
+    for idx, message in enumerate(chat_stream):
+        message.text = ["+1", "Thanks!", "  thanks! "][idx % 3] if idx % 2 else message.text
+    payload = [message.dict(format_dates=True, format_enums=True) for message in chat_stream]
+    client = FakeClient()
+    config = {"intent_cache_size": 0, "response_metrics": True, "local_intent_threshold": 2}
+    response = ChatAnalyticsPackage(client, config=config).analyze(payload).data
+
+    unique = {" ".join(message.text.split()).casefold() for message in chat_stream}
+    assert (
+        client.zero_shot.blocks_tagged
+        == len(unique)
+        == response["metrics"]["sizes"]["intent_blocks"]
+    )
+    assert response["metrics"]["ratios"]["intent_dedup"] == pytest.approx(1 - len(unique) / 40)
+    assert response["intent_dedup"] == response["metrics"]["ratios"]["intent_dedup"]
+    config = {**config, "response_metrics": False}
+    without_metrics = ChatAnalyticsPackage(FakeClient(), config=config).analyze(payload).data
+    assert without_metrics["intent_dedup"] == response["intent_dedup"]
+    intents = {}
+    for message, analyzed in zip(chat_stream, response["chat_stream"]):
+        key = " ".join(message.text.split()).casefold()
+        assert intents.setdefault(key, analyzed["intent"]) == analyzed["intent"]
+    assert len(response["chat_stream"]) == 40
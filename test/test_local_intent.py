@@ -0,0 +1,84 @@
+"""Offline tests for the local intent classifier trained from add_examples data."""
+import json
+from test.fakes import FakeClient
+from test.synthetic import generate_labeled_examples
+
+from api_spec import Intent
+from local_intent import LocalIntentClassifier
+from src.api import ChatAnalyticsPackage
+
+CONFIG = {"intent_cache_size": 0, "response_metrics": True}
+
+
+def _trained() -> LocalIntentClassifier:
+    classifier = LocalIntentClassifier()
+    classifier.fit(
+        [(example.text, example.intent) for example in generate_labeled_examples(600, seed=1)]
+    )
+    return classifier
+
+
+def test_classifier_answers_only_when_confident() -> None:
+    """Familiar phrasings are answered locally, unfamiliar ones are left to the zero-shot tagger."""
+    classifier = _trained()
+    examples = generate_labeled_examples(100, seed=2)
+    predictions = classifier.predict([example.text for example in examples], threshold=0.8)
+
+    answered = [(p, e.intent) for p, e in zip(predictions, examples) if p is not None]
+    assert len(answered) >= 90
+    assert all(predicted == expected for predicted, expected in answered)
+    assert classifier.predict(["zzz qqq xyzzy"], threshold=0.8) == [None]
+    assert LocalIntentClassifier().predict(["Hi team!"], threshold=0.0) == [None]
+
+
+def test_classifier_round_trips_through_its_state() -> None:
+    """A model rebuilt from its JSON state predicts exactly as the original."""
+    classifier = _trained()
+    loaded = LocalIntentClassifier.from_state(json.loads(json.dumps(classifier.state())))
+    texts = [example.text for example in generate_labeled_examples(50, seed=3)]
+
+    assert loaded.predict(texts, threshold=0.5) == classifier.predict(texts, threshold=0.5)
+
+
+def test_trained_classifier_bypasses_zero_shot() -> None:
+    """After retraining on stored examples, confident messages skip the zero-shot tagger."""
+    client = FakeClient()
+    examples = generate_labeled_examples(600, seed=1)
+    ChatAnalyticsPackage(client).add_examples(examples)
+    report = ChatAnalyticsPackage(client).train_intent_classifier().data
+    assert report["examples"] == 600 and report["training_accuracy"] > 0.95
+
+    payload = [
+        {**example.dict(format_dates=True, format_enums=True), "intent": None}
+        for example in generate_labeled_examples(100, seed=2)
+    ]
+    response = ChatAnalyticsPackage(client, config=CONFIG).analyze(payload).data
+
+    sizes = response["metrics"]["sizes"]
+    assert sizes["intent_local_candidates"] == 100
+    assert sizes["intent_local_hits"] >= 90
+    assert client.zero_shot.blocks_tagged == 100 - sizes["intent_local_hits"]
+    assert all(
+        message["intent"] in {intent.value for intent in Intent}
+        for message in response["chat_stream"]
+    )
+
+
+def test_trained_classifier_is_loaded_from_the_workspace() -> None:
+    """A process that did not train the classifier loads the one saved in the workspace."""
+    client = FakeClient()
+    ChatAnalyticsPackage(client).add_examples(generate_labeled_examples(600, seed=1))
+    ChatAnalyticsPackage(client).train_intent_classifier()
+    ChatAnalyticsPackage(client).train_intent_classifier()
+    # A client of the same workspace that this process has not seen, as in a fresh process.
+    fresh = FakeClient()
+    fresh.files = client.files
+
+    payload = [
+        {**example.dict(format_dates=True, format_enums=True), "intent": None}
+        for example in generate_labeled_examples(100, seed=2)
+    ]
+    response = ChatAnalyticsPackage(fresh, config=CONFIG).analyze(payload).data
+
+    assert len([file for file in client.files if file.tags]) == 1
+    assert response["metrics"]["sizes"]["intent_local_hits"] >= 90
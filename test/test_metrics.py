@@ -0,0 +1,68 @@
+"""Offline tests for per-request stage timings and the Prometheus-style export."""
+from test.fakes import FakeClient
+from test.synthetic import generate_chat_stream
+
+import pytest
+
+from metrics import REGISTRY, MetricsRegistry
+from src.api import ChatAnalyticsPackage
+
+CONFIG = {"intent_cache_size": 0, "response_metrics": True}
+
+
+def test_registry_renders_prometheus_histograms() -> None:
+    """Histograms are exported as cumulative buckets with a sum and a count."""
+    registry = MetricsRegistry()
+    for value in [0.5, 2, 20]:
+        registry.observe("stage_seconds", value, (1, 10), endpoint="analyze", stage="parse")
+
+    assert registry.render().splitlines() == [
+        "# HELP chat_analytics_stage_seconds Time spent in each stage of a request.",
+        "# TYPE chat_analytics_stage_seconds histogram",
+        'chat_analytics_stage_seconds_bucket{endpoint="analyze",stage="parse",le="1"} 1',
+        'chat_analytics_stage_seconds_bucket{endpoint="analyze",stage="parse",le="10"} 2',
+        'chat_analytics_stage_seconds_bucket{endpoint="analyze",stage="parse",le="+Inf"} 3',
+        'chat_analytics_stage_seconds_sum{endpoint="analyze",stage="parse"} 22.5',
+        'chat_analytics_stage_seconds_count{endpoint="analyze",stage="parse"} 3',
+    ]
+
+
+def test_analyze_returns_stage_metrics() -> None:
+    """Every stage is timed and the sizes of the request are counted."""
+    payload = [
+        message.dict(format_dates=True, format_enums=True) for message in generate_chat_stream(100)
+    ]
+    client = FakeClient(latency_s=0.05)
+    metrics = ChatAnalyticsPackage(client, config=CONFIG).analyze(payload).data["metrics"]
+
+    assert set(metrics["stages"]) == {
+        "parse",
+        "plan",
+        "build_files",
+        "submit",
+        "plugins",
+        "align",
+        "serialize",
+    }
+    assert metrics["stages"]["plugins"] >= 0.05
+    assert metrics["sizes"]["messages"] == 100
+    assert metrics["sizes"]["characters"] == sum(len(message["text"]) for message in payload)
+    assert metrics["sizes"]["zero-shot-tagger-default_tags"] == metrics["sizes"]["intent_blocks"]
+    assert metrics["ratios"]["intent_dedup"] == pytest.approx(
+        1 - metrics["sizes"]["intent_blocks"] / 100
+    )
+    assert metrics["plugins"]["oneai-tagger"]["tasks"] == 1
+    assert metrics["plugins"]["oneai-tagger"]["max_duration_s"] >= 0.05
+
+
+def test_metrics_are_aggregated_in_process() -> None:
+    """Requests feed the process-wide histograms served by the metrics endpoint."""
+    payload = [
+        message.dict(format_dates=True, format_enums=True) for message in generate_chat_stream(10)
+    ]
+    ChatAnalyticsPackage(FakeClient(), config=CONFIG).analyze(payload)
+    text = ChatAnalyticsPackage(FakeClient()).metrics().data
+
+    assert text == REGISTRY.render()
+    assert 'chat_analytics_stage_seconds_count{endpoint="analyze",stage="align"}' in text
+    assert 'chat_analytics_plugin_seconds_count{phase="run",plugin="oneai-tagger"}' in text
@@ -0,0 +1,139 @@
+"""Offline tests of the package endpoints against local stand-in taggers."""
+from copy import deepcopy
+from test.fakes import FakeClient
+from test.synthetic import generate_chat_stream, generate_conversations
+from test.utils import CONVERSATIONS, validate_response
+from typing import List
+
+import pytest
+
+from api_spec import Message
+from src.api import ChatAnalyticsPackage
+
+NO_CACHE = {"intent_cache_size": 0}
+
+
+def _dump(chat_stream: List[Message]):
+    return [message.dict(format_dates=True, format_enums=True) for message in chat_stream]
+
+
+@pytest.mark.parametrize("chat_stream", CONVERSATIONS)
+def test_analyze(chat_stream: List[Message]) -> None:
+    """Test analyze endpoint."""
+    app = ChatAnalyticsPackage(FakeClient(), config=NO_CACHE)
+
+    response = app.analyze(chat_stream=_dump(chat_stream))
+
+    validate_response(chat_stream, response)
+
+
+def test_windowed_analyze_matches_single_window() -> None:
+    """Splitting a stream into windows does not change intents or sentiments."""
+    chat_stream = generate_chat_stream(300, seed=1)
+
+    single = ChatAnalyticsPackage(FakeClient(), config=NO_CACHE).analyze(_dump(chat_stream))
+    client = FakeClient()
+    windowed = ChatAnalyticsPackage(
+        client, config={**NO_CACHE, "window_max_messages": 40, "window_overlap": 5}
+    ).analyze(_dump(chat_stream))
+
+    validate_response(chat_stream, windowed)
+    assert len(client.oneai.files) > 1
+    for expected, actual in zip(single.data["chat_stream"], windowed.data["chat_stream"]):
+        assert (expected["intent"], expected["sentiment"]) == (
+            actual["intent"],
+            actual["sentiment"],
+        )
+
+
+def test_analyze_session_continues_threads() -> None:
+    """Incremental calls only tag new messages and return every root once."""
+    chat_stream = generate_chat_stream(60, seed=2)
+    client = FakeClient()
+    app = ChatAnalyticsPackage(client, config={**NO_CACHE, "session_tail_size": 5})
+
+    processed = []
+    for start in range(0, 60, 20):
+        response = app.analyze_session("room", _dump(chat_stream[start : start + 20]))
+        processed.extend(response.data["chat_stream"])
+
+    validate_response(chat_stream, {"chat_stream": processed})
+    assert client.zero_shot.blocks_tagged == 60
+
+
+def test_analyze_session_continues_from_returned_tail() -> None:
+    """A call that reaches a fresh process continues the threads from the tail sent back."""
+    chat_stream = generate_chat_stream(40, seed=5)
+    config = {**NO_CACHE, "session_tail_size": 5}
+    app = ChatAnalyticsPackage(FakeClient(), config=config)
+    first = app.analyze_session("room", _dump(chat_stream[:20])).data
+    warm = app.analyze_session("room", _dump(chat_stream[20:])).data
+
+    cold = (
+        ChatAnalyticsPackage(FakeClient(), config=config)
+        .analyze_session("room", _dump(chat_stream[20:]))
+        .data
+    )
+    resumed = (
+        ChatAnalyticsPackage(FakeClient(), config=config)
+        .analyze_session("room", _dump(chat_stream[20:]), session_tail=first["session"]["tail"])
+        .data
+    )
+
+    assert first["session"]["found"] is False
+    assert len(first["session"]["tail"]) == 5
+    assert warm["session"]["found"] is True
+    assert cold["session"]["found"] is False
+    assert resumed["session"]["found"] is True
+    assert resumed["chat_stream"] == warm["chat_stream"]
+    assert resumed["session"]["tail"] == warm["session"]["tail"]
+
+
+def test_analyze_session_is_scoped_to_workspace() -> None:
+    """Two workspaces using the same session id never see each other's messages."""
+    first, second = generate_chat_stream(20, seed=3), generate_chat_stream(20, seed=4)
+    for message in first:
+        message.text = f"tenant-a {message.text}"
+    for message in second:
+        message.message_id = f"b{message.message_id}"
+    first_client, second_client = FakeClient(), FakeClient()
+    config = {**NO_CACHE, "session_tail_size": 5}
+
+    ChatAnalyticsPackage(first_client, config=config).analyze_session("general", _dump(first))
+    response = ChatAnalyticsPackage(second_client, config=config).analyze_session(
+        "general", _dump(second)
+    )
+
+    validate_response(second, response)
+    sent = [block.text for file in second_client.oneai.files for block in file.blocks]
+    assert not any("tenant-a" in text for text in sent)
+    own_ids = {message.message_id for message in second}
+    assert all(message["root_message_id"] in own_ids for message in response.data["chat_stream"])
+
+
+def test_batch_analyze_shares_submissions() -> None:
+    """Many small conversations share OneAI submissions and come back separately."""
+    conversations = generate_conversations(20, 5)
+    client = FakeClient()
+    app = ChatAnalyticsPackage(client, config=NO_CACHE)
+
+    response = app.batch_analyze([_dump(chat_stream) for chat_stream in conversations])
+
+    assert len(client.oneai.files) == 1
+    assert len(client.oneai.files[0].blocks) == 20
+    for chat_stream, result in zip(conversations, response.data["conversations"]):
+        validate_response(chat_stream, result)
+
+
+def test_known_fields_skip_plugins() -> None:
+    """Messages whose fields are all supplied are never sent to a plugin."""
+    chat_stream = deepcopy(CONVERSATIONS[0])
+    client = FakeClient()
+    annotated = ChatAnalyticsPackage(client, config=NO_CACHE).analyze(_dump(chat_stream))
+
+    client = FakeClient()
+    response = ChatAnalyticsPackage(client, config=NO_CACHE).analyze(annotated.data["chat_stream"])
+
+    assert client.plugins == {}
+    assert response.data["plan"]["intents_skipped"] == len(chat_stream)
+    assert response.data["plan"]["oneai_messages_skipped"] == len(chat_stream)
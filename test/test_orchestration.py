@@ -0,0 +1,78 @@
+"""Offline tests for polling plugin tasks under a latency budget."""
+import time
+from test.fakes import FakeClient, FakeTask
+from test.synthetic import generate_chat_stream
+
+from steamship import File
+
+from api_spec import Sentiment
+from orchestration import Deadline, PendingTask, summarize, wait_all
+from src.api import ChatAnalyticsPackage
+
+NO_CACHE = {"intent_cache_size": 0}
+
+
+def _payload(n_messages: int) -> list:
+    return [
+        message.dict(format_dates=True, format_enums=True)
+        for message in generate_chat_stream(n_messages)
+    ]
+
+
+def test_wait_all_polls_tasks_together() -> None:
+    """Tasks are awaited concurrently, and the ones past the deadline are left running."""
+    pending = [
+        PendingTask("fast", FakeTask(File(blocks=[]), latency_s=0.05)),
+        PendingTask("slow", FakeTask(File(blocks=[]), latency_s=0.1)),
+        PendingTask("stuck", FakeTask(File(blocks=[]), latency_s=10)),
+    ]
+    t0 = time.monotonic()
+    wait_all(pending, Deadline(0.3), initial_delay_s=0.01, max_delay_s=0.05)
+
+    assert time.monotonic() - t0 < 0.5
+    assert [task.done for task in pending] == [True, True, False]
+    summary = summarize(pending)
+    assert summary["stuck"]["missed"] == 1 and summary["fast"]["missed"] == 0
+    assert 0.05 <= summary["slow"]["max_duration_s"] < 0.3
+
+
+def test_slow_oneai_degrades_sentiment_and_threads() -> None:
+    """A OneAI tagger that misses the budget leaves NEUTRAL sentiments and flags them."""
+    client = FakeClient()
+    client.oneai.latency_s = 10
+    t0 = time.monotonic()
+    response = ChatAnalyticsPackage(client, config=NO_CACHE).analyze(
+        _payload(50), latency_budget_s=0.2
+    )
+
+    assert time.monotonic() - t0 < 1
+    chat_stream = response.data["chat_stream"]
+    message_ids = [message["message_id"] for message in chat_stream]
+    assert response.data["degraded"] == {"sentiment": message_ids, "root_message_id": message_ids}
+    assert all(message["sentiment"] == Sentiment.NEUTRAL.value for message in chat_stream)
+    assert all(message["root_message_id"] == message["message_id"] for message in chat_stream)
+    assert all(message["intent"] is not None for message in chat_stream)
+
+
+def test_slow_intent_tagger_degrades_intents() -> None:
+    """An intent tagger that misses the budget leaves intents empty and flags them."""
+    client = FakeClient()
+    client.zero_shot.latency_s = 10
+    response = ChatAnalyticsPackage(client, config=NO_CACHE).analyze(
+        _payload(50), latency_budget_s=0.2
+    )
+
+    chat_stream = response.data["chat_stream"]
+    assert response.data["degraded"] == {
+        "intent": [message["message_id"] for message in chat_stream]
+    }
+    assert all(message["intent"] is None for message in chat_stream)
+
+
+def test_no_degradation_within_budget() -> None:
+    """Responses within the budget carry no degraded flags."""
+    response = ChatAnalyticsPackage(FakeClient(latency_s=0.05), config=NO_CACHE).analyze(
+        _payload(50)
+    )
+
+    assert "degraded" not in response.data
@@ -0,0 +1,29 @@
+"""Offline tests for planning the inference a chat stream needs."""
+from test.utils import CONVERSATIONS
+
+from api_spec import Sentiment
+from planner import WorkPlan
+
+
+def test_plan_skips_caller_supplied_fields() -> None:
+    """Messages with pre-filled fields are not planned for inference of those fields."""
+    chat_stream = [message.copy() for message in CONVERSATIONS[0]]
+    for message in chat_stream[:3]:
+        message.sentiment = Sentiment.NEUTRAL
+        message.root_message_id = "0"
+
+    plan = WorkPlan(chat_stream)
+    plan.record_window(tagged=True)
+    plan.record_window(tagged=False)
+
+    assert plan.needs_intent == [False, False] + [True] * 6
+    assert plan.needs_oneai == [False] * 3 + [True] * 5
+    assert plan.summary() == {
+        "messages": 8,
+        "intents_inferred": 6,
+        "intents_skipped": 2,
+        "oneai_messages_inferred": 5,
+        "oneai_messages_skipped": 3,
+        "oneai_windows_tagged": 1,
+        "oneai_windows_skipped": 1,
+    }
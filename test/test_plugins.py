@@ -0,0 +1,36 @@
+"""Offline tests for lazily bound, memoized plugin instances."""
+from types import SimpleNamespace
+
+from plugins import use_plugin
+from src.api import ChatAnalyticsPackage
+
+
+class CountingClient:
+    """Client stand-in that counts how often plugin instances are fetched."""
+
+    def __init__(self):
+        self.calls = []
+
+    def use_plugin(self, plugin_handle, instance_handle, config):
+        self.calls.append(plugin_handle)
+        return SimpleNamespace(handle=instance_handle, config=config)
+
+
+def test_handler_construction_binds_no_plugin() -> None:
+    """Constructing the handler must not fetch any plugin instance."""
+    client = CountingClient()
+    ChatAnalyticsPackage(client)
+
+    assert client.calls == []
+
+
+def test_plugin_instances_are_memoized_per_config() -> None:
+    """A plugin is fetched once per client and config, however many handlers use it."""
+    client = CountingClient()
+    first = use_plugin(client, "plugin", "plugin1", {"a": 1, "b": 2})
+    second = use_plugin(client, "plugin", "plugin1", {"b": 2, "a": 1})
+    other = use_plugin(client, "plugin", "plugin1", {"a": 2})
+
+    assert first is second
+    assert other is not first
+    assert client.calls == ["plugin", "plugin"]
@@ -0,0 +1,106 @@
+"""Offline tests for local pre-threading at certain thread boundaries."""
+from datetime import datetime, timedelta, timezone
+from test.fakes import FakeClient
+from test.synthetic import generate_chat_stream
+from typing import List
+
+from api_spec import Message
+from prethreading import certain_starts, needs_segmentation, segments
+from src.api import ChatAnalyticsPackage
+
+NO_CACHE = {"intent_cache_size": 0}
+
+
+def _message(idx: int, minutes: float, root: str = None) -> Message:
+    return Message(
+        message_id=str(idx),
+        timestamp=datetime(2022, 6, 15) + timedelta(minutes=minutes),
+        user_id="u",
+        text=f"message {idx}",
+        root_message_id=root,
+    )
+
+
+def test_certain_starts() -> None:
+    """Idle gaps, self-rooted messages and changes of caller-supplied root open threads."""
+    chat_stream = [
+        _message(0, 0),
+        _message(1, 1),
+        _message(2, 120),
+        _message(3, 121, root="3"),
+        _message(4, 122, root="3"),
+        _message(5, 123, root="0"),
+        _message(6, 124),
+    ]
+    starts = certain_starts(chat_stream, max_gap_s=3600)
+
+    assert starts == [True, False, True, True, False, True, False]
+    assert certain_starts(chat_stream, max_gap_s=None)[2] is False
+    assert segments(starts) == [(0, 2), (2, 3), (3, 5), (5, 7)]
+    assert not needs_segmentation(chat_stream[3:5])
+    assert needs_segmentation(chat_stream[5:7])
+
+
+def test_mixed_timezones_are_not_cut() -> None:
+    """Timestamps that cannot be compared never produce a boundary."""
+    aware = _message(1, 600)
+    aware.timestamp = aware.timestamp.replace(tzinfo=timezone.utc)
+
+    assert certain_starts([_message(0, 0), aware], max_gap_s=60) == [True, False]
+
+
+def _conversations() -> List[List[dict]]:
+    conversations = []
+    for idx in range(3):
+        chat_stream = generate_chat_stream(40, seed=idx)
+        for message in chat_stream:
+            message.message_id = f"{idx}-{message.message_id}"
+            message.timestamp += timedelta(days=idx)
+        conversations.append(
+            [message.dict(format_dates=True, format_enums=True) for message in chat_stream]
+        )
+    return conversations
+
+
+def test_prethreaded_stream_matches_separate_conversations() -> None:
+    """Conversations separated by long gaps are threaded exactly as if analyzed one by one."""
+    config = {**NO_CACHE, "window_max_messages": 15, "window_overlap": 5}
+    conversations = _conversations()
+    separate_clients = [FakeClient() for _ in conversations]
+    separately = [
+        message
+        for chat_stream, client in zip(conversations, separate_clients)
+        for message in ChatAnalyticsPackage(client, config=config)
+        .analyze(chat_stream)
+        .data["chat_stream"]
+    ]
+    client = FakeClient()
+    together = (
+        ChatAnalyticsPackage(client, config=config)
+        .analyze([message for chat_stream in conversations for message in chat_stream])
+        .data["chat_stream"]
+    )
+
+    assert together == separately
+    assert {message["root_message_id"].split("-")[0] for message in together[40:80]} == {"1"}
+    assert sorted(block.text for file in client.oneai.files for block in file.blocks) == sorted(
+        block.text
+        for separate_client in separate_clients
+        for file in separate_client.oneai.files
+        for block in file.blocks
+    )
+
+
+def test_resolved_threads_skip_segmentation() -> None:
+    """Messages whose threads the caller supplied are only sent for sentiments."""
+    payload = [
+        {**message.dict(format_dates=True, format_enums=True), "root_message_id": "0"}
+        for message in generate_chat_stream(30)
+    ]
+    client = FakeClient()
+    chat_stream = ChatAnalyticsPackage(client, config=NO_CACHE).analyze(payload).data["chat_stream"]
+
+    assert client.oneai.blocks_tagged == 0
+    assert client.oneai_sentiments.blocks_tagged == 1
+    assert all(message["root_message_id"] == "0" for message in chat_stream)
+    assert all(message["sentiment"] is not None for message in chat_stream)
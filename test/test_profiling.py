@@ -0,0 +1,84 @@
+"""Offline tests for opt-in profiling of analyze and add_examples."""
+import os
+import pstats
+import subprocess
+import sys
+import tracemalloc
+from pathlib import Path
+from test.fakes import FakeClient
+from test.synthetic import generate_chat_stream, generate_labeled_examples
+
+from profiling import ALLOCATIONS_REPORT, CPU_PROFILE, CPU_REPORT, capture, sampled
+from src.api import ChatAnalyticsPackage
+
+CONFIG = {"intent_cache_size": 0, "memo_ttl_s": 0}
+SRC = Path(__file__).parent.parent / "src"
+
+
+def _payload(size: int) -> list:
+    return [
+        message.dict(format_dates=True, format_enums=True) for message in generate_chat_stream(size)
+    ]
+
+
+def test_capture_writes_reports(tmp_path) -> None:
+    """A capture writes loadable CPU statistics and both text reports, and nests as a no-op."""
+    with capture(str(tmp_path), "test") as path:
+        with capture(str(tmp_path), "nested") as nested:
+            data = [str(idx) * 10 for idx in range(10000)]
+
+    assert len(data) == 10000 and nested is None
+    assert os.path.dirname(path) == str(tmp_path)
+    assert os.path.basename(path).startswith("test-")
+    assert sorted(os.listdir(path)) == sorted([ALLOCATIONS_REPORT, CPU_PROFILE, CPU_REPORT])
+    assert pstats.Stats(os.path.join(path, CPU_PROFILE)).total_calls > 0
+    with open(os.path.join(path, ALLOCATIONS_REPORT)) as file:
+        assert "test_profiling.py" in file.read()
+    assert not tracemalloc.is_tracing()
+
+
+def test_sampling() -> None:
+    """Requested invocations are always profiled, others at the sample rate."""
+    assert sampled(True, 0)
+    assert not any(sampled(False, 0) for _ in range(1000))
+    assert all(sampled(False, 1) for _ in range(1000))
+
+
+def test_endpoints_profile_on_request(tmp_path) -> None:
+    """Profiled calls write reports per invocation; other calls write nothing and match them."""
+    config = {**CONFIG, "profile_dir": str(tmp_path)}
+    payload = _payload(50)
+    plain = ChatAnalyticsPackage(FakeClient(), config=config).analyze(payload).data
+    assert "profile" not in plain and os.listdir(tmp_path) == []
+
+    profiled = ChatAnalyticsPackage(FakeClient(), config=config).analyze(payload, profile=True)
+    path = profiled.data.pop("profile")
+    assert profiled.data == plain
+    assert os.path.isfile(os.path.join(path, CPU_PROFILE))
+
+    added = ChatAnalyticsPackage(FakeClient(), config=config).add_examples(
+        generate_labeled_examples(20), profile=True
+    )
+    assert os.path.isfile(os.path.join(added.data["profile"], CPU_REPORT))
+    assert sorted(name.split("-")[0] for name in os.listdir(tmp_path)) == [
+        "add_examples",
+        "analyze",
+    ]
+
+
+def test_sample_rate_profiles_without_request(tmp_path) -> None:
+    """A sample rate of 1 profiles every call."""
+    config = {**CONFIG, "profile_dir": str(tmp_path), "profile_sample_rate": 1}
+    app = ChatAnalyticsPackage(FakeClient(), config=config)
+
+    paths = {app.analyze(_payload(10)).data["profile"] for _ in range(2)}
+    assert len(paths) == 2 and sorted(os.listdir(tmp_path)) == sorted(map(os.path.basename, paths))
+
+
+def test_profilers_are_imported_lazily() -> None:
+    """Importing the package does not import the profilers."""
+    code = "import sys, api; print(any(m in sys.modules for m in ('cProfile', 'tracemalloc')))"
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=SRC, check=True, capture_output=True, text=True
+    ).stdout
+    assert output.strip().splitlines()[-1] == "False"
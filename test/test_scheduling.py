@@ -0,0 +1,125 @@
+"""Offline tests for the priority lanes of plugin use."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from test.fakes import FakeClient
+from test.synthetic import generate_chat_stream
+from typing import List
+
+import pytest
+
+from metrics import MetricsRegistry
+from scheduling import LaneScheduler, parse_lane
+from src.api import ChatAnalyticsPackage
+
+
+def _wait_until(condition) -> None:
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_freed_slots_go_to_the_most_urgent_lane() -> None:
+    """Waiting high priority requests are admitted before earlier low priority ones."""
+    scheduler = LaneScheduler(capacity=1, limits={}, registry=MetricsRegistry())
+    assert scheduler.acquire("normal")
+    admitted: List[str] = []
+
+    def wait_for_slot(lane: str) -> None:
+        scheduler.acquire(lane)
+        admitted.append(lane)
+        scheduler.release(lane)
+
+    low = threading.Thread(target=wait_for_slot, args=("low",))
+    low.start()
+    _wait_until(lambda: scheduler.waiting["low"] == 1)
+    high = threading.Thread(target=wait_for_slot, args=("high",))
+    high.start()
+    _wait_until(lambda: scheduler.waiting["high"] == 1)
+
+    scheduler.release("normal")
+    low.join()
+    high.join()
+    assert admitted == ["high", "low"]
+
+
+def test_lane_limits_leave_capacity_to_urgent_lanes() -> None:
+    """A lane at its limit waits while other lanes still get slots, and waits time out."""
+    registry = MetricsRegistry()
+    scheduler = LaneScheduler(capacity=3, limits={"low": 1}, registry=registry)
+
+    assert scheduler.acquire("low")
+    assert not scheduler.acquire("low", timeout_s=0.05)
+    assert scheduler.acquire("high", timeout_s=0.05)
+    assert scheduler.acquire("normal", timeout_s=0.05)
+    assert not scheduler.acquire("high", timeout_s=0.05)
+
+    text = registry.render()
+    assert "# TYPE chat_analytics_lane_queue_depth gauge" in text
+    assert 'chat_analytics_lane_in_flight{priority="low"} 1' in text
+    assert 'chat_analytics_lane_wait_seconds_count{priority="low"} 2' in text
+
+
+def test_priority_is_validated() -> None:
+    """Priorities are case-insensitive lane names."""
+    assert parse_lane(None) == "normal"
+    assert parse_lane("HIGH") == "high"
+    with pytest.raises(ValueError):
+        parse_lane("urgent")
+
+
+def test_analyze_queues_in_its_lane() -> None:
+    """With one slot, a high priority call overtakes queued low priority ones."""
+    payload = [
+        message.dict(format_dates=True, format_enums=True) for message in generate_chat_stream(5)
+    ]
+    client = FakeClient(latency_s=0.1)
+    config = {
+        "intent_cache_size": 0,
+        "memo_ttl_s": 0,
+        "response_metrics": True,
+        "max_in_flight_requests": 1,
+    }
+    finished: List[str] = []
+
+    def call(priority: str) -> None:
+        ChatAnalyticsPackage(client, config=config).analyze(payload, priority=priority)
+        finished.append(priority)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        executor.submit(call, "normal")
+        time.sleep(0.03)
+        for priority in ["low", "low", "high"]:
+            executor.submit(call, priority)
+            time.sleep(0.01)
+
+    assert finished[:2] == ["normal", "high"]
+    response = ChatAnalyticsPackage(client, config=config).analyze(payload, priority="high")
+    assert "queue" in response.data["metrics"]["stages"]
+
+
+def test_request_without_a_slot_does_not_use_the_plugins() -> None:
+    """A request that gets no slot within its budget submits nothing and degrades every field."""
+    payload = [
+        message.dict(format_dates=True, format_enums=True) for message in generate_chat_stream(5)
+    ]
+    client = FakeClient()
+    client.oneai.latency_s = 0.5
+    config = {"intent_cache_size": 0, "memo_ttl_s": 0, "max_in_flight_requests": 1}
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        executor.submit(ChatAnalyticsPackage(client, config=config).analyze, payload)
+        _wait_until(lambda: client.oneai.blocks_tagged > 0)
+        submitted = client.oneai.blocks_tagged + client.zero_shot.blocks_tagged
+        response = ChatAnalyticsPackage(client, config=config).analyze(
+            payload, latency_budget_s=0.05
+        )
+
+    assert client.oneai.blocks_tagged + client.zero_shot.blocks_tagged == submitted
+    message_ids = [message["message_id"] for message in response.data["chat_stream"]]
+    assert response.data["degraded"] == {
+        "sentiment": message_ids,
+        "root_message_id": message_ids,
+        "intent": message_ids,
+    }
@@ -0,0 +1,87 @@
+"""Offline tests for the state of incrementally analyzed chat sessions."""
+from datetime import datetime
+from test.fakes import FakeClient
+from test.synthetic import generate_chat_stream
+
+from api_spec import Message
+from sessions import MessageMemo, SessionStore, message_key
+from src.api import ChatAnalyticsPackage
+
+
+def _messages(n: int):
+    return [
+        Message(
+            message_id=str(idx),
+            timestamp=datetime(2022, 6, 15),
+            user_id="1",
+            text=f"message {idx}",
+            root_message_id="0",
+        )
+        for idx in range(n)
+    ]
+
+
+def test_tail_is_bounded_and_copied() -> None:
+    """Only the last messages are kept, and callers cannot mutate the stored tail."""
+    store = SessionStore()
+    store.update("room", _messages(10), tail_size=3)
+
+    tail = store.tail("room")
+    assert [message.message_id for message in tail] == ["7", "8", "9"]
+
+    tail[0].root_message_id = "changed"
+    assert store.tail("room")[0].root_message_id == "0"
+    assert store.tail("unknown") == []
+
+
+def test_sessions_expire_and_are_capped() -> None:
+    """Idle sessions expire, and the least recently updated ones are evicted first."""
+    store = SessionStore(ttl_s=0)
+    store.update("room", _messages(2), tail_size=2)
+    assert store.tail("room") == []
+
+    store = SessionStore(max_sessions=2)
+    for session_id in ["a", "b", "c"]:
+        store.update(session_id, _messages(1), tail_size=1)
+    assert len(store) == 2
+    assert store.tail("a") == []
+
+
+def test_memo_expires_and_is_capped() -> None:
+    """Memoized messages are copies, expire after their TTL and are evicted least recent first."""
+    messages = _messages(3)
+    keys = [message_key(message.dict(format_dates=True, format_enums=True)) for message in messages]
+    memo = MessageMemo(max_messages=2)
+    memo.put_many(zip(keys, messages))
+
+    assert memo.get_many(keys) == [None, messages[1], messages[2]]
+    assert (memo.hits, memo.misses) == (2, 1)
+    assert memo.get_many(keys[1:2])[0] is not messages[1]
+
+    memo = MessageMemo(ttl_s=0)
+    memo.put_many(zip(keys, messages))
+    assert memo.get_many(keys) == [None, None, None]
+
+
+def test_overlapping_windows_only_tag_unseen_suffix() -> None:
+    """A window overlapping the previous one reuses its analyzed messages, threads included."""
+    payload = [
+        message.dict(format_dates=True, format_enums=True) for message in generate_chat_stream(60)
+    ]
+    client = FakeClient()
+    config = {"intent_cache_size": 0, "local_intent_threshold": 2, "response_metrics": True}
+    app = ChatAnalyticsPackage(client, config=config)
+
+    first = app.analyze(payload[:40]).data
+    blocks_tagged = client.zero_shot.blocks_tagged
+    second = app.analyze(payload[20:60]).data
+
+    assert second["chat_stream"][:20] == first["chat_stream"][20:]
+    assert second["metrics"]["sizes"]["memo_hits"] == 20
+    assert second["metrics"]["sizes"]["memo_misses"] == 20
+    assert client.zero_shot.blocks_tagged - blocks_tagged <= 20
+    seen = {message["message_id"] for message in first["chat_stream"] + second["chat_stream"]}
+    assert all(message["root_message_id"] in seen for message in second["chat_stream"])
+
+    edited = [{**payload[20], "text": "edited"}] + payload[21:60]
+    assert app.analyze(edited).data["metrics"]["sizes"]["memo_hits"] == 0
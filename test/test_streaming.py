@@ -0,0 +1,73 @@
+"""Offline tests for the NDJSON streaming mode of analyze."""
+import json
+from test.fakes import FakeClient
+from test.synthetic import generate_chat_stream
+from typing import Iterator, List
+
+import pytest
+
+from src.api import ChatAnalyticsPackage
+from streaming import read_ndjson, write_ndjson
+
+CONFIG = {"intent_cache_size": 0, "memo_ttl_s": 0, "ndjson_batch_size": 25}
+
+
+def _lines(n: int) -> List[str]:
+    return list(
+        write_ndjson(
+            message.dict(format_dates=True, format_enums=True)
+            for message in generate_chat_stream(n)
+        )
+    )
+
+
+def test_read_ndjson_reports_bad_lines() -> None:
+    """Blank lines are skipped and malformed ones are reported with their line number."""
+    assert list(read_ndjson(['{"a": 1}\n', "\n", '{"b": 2}'])) == [{"a": 1}, {"b": 2}]
+    with pytest.raises(ValueError, match="line 2"):
+        list(read_ndjson(['{"a": 1}', "{"]))
+    with pytest.raises(ValueError, match="line 1"):
+        list(read_ndjson(["[1, 2]"]))
+
+
+def test_stream_analyze_emits_batches_as_they_finish() -> None:
+    """The first batch is emitted before the rest of the input has been read."""
+    lines = _lines(100)
+    consumed = []
+
+    def source() -> Iterator[str]:
+        for line in lines:
+            consumed.append(line)
+            yield line
+
+    output = ChatAnalyticsPackage(FakeClient(), config=CONFIG).stream_analyze(source())
+    first = [next(output) for _ in range(25)]
+    assert len(consumed) <= 26
+    rest = list(output)
+
+    messages = [json.loads(line) for line in first + rest]
+    assert [message["message_id"] for message in messages] == [str(idx) for idx in range(100)]
+    assert all(message["sentiment"] and message["intent"] for message in messages)
+    assert all(
+        message["root_message_id"] in {m["message_id"] for m in messages[: idx + 1]}
+        for idx, message in enumerate(messages)
+    )
+
+
+def test_analyze_ndjson_matches_analyze() -> None:
+    """The NDJSON endpoint tags the same messages as the JSON endpoint, batch by batch."""
+    lines = _lines(60)
+    client = FakeClient()
+    output = ChatAnalyticsPackage(client, config=CONFIG).analyze_ndjson("".join(lines)).data
+    streamed = [json.loads(line) for line in output.splitlines()]
+    analyzed = (
+        ChatAnalyticsPackage(FakeClient(), config=CONFIG)
+        .analyze([json.loads(line) for line in lines])
+        .data["chat_stream"]
+    )
+
+    assert [message["intent"] for message in streamed] == [
+        message["intent"] for message in analyzed
+    ]
+    assert client.zero_shot.blocks_tagged <= 60
+    assert len(client.zero_shot.files) == 3
@@ -0,0 +1,46 @@
+"""Offline tests for choosing a zero-shot model tier from the latency budget."""
+from test.fakes import FakeClient
+from test.synthetic import generate_chat_stream
+
+import pytest
+
+from api_spec import Intent
+from src.api import ChatAnalyticsPackage
+from tiers import TIERS, parse_tiers, select_tier
+
+CONFIG = {"intent_cache_size": 0, "memo_ttl_s": 0, "intent_tiers": "accurate,fast,default"}
+
+
+def test_tier_selection_fits_the_budget() -> None:
+    """The most accurate tier expected to fit is chosen, falling back to the fastest."""
+    tiers = parse_tiers("accurate,fast,default")
+    assert [tier.name for tier in tiers] == ["fast", "default", "accurate"]
+    assert select_tier(tiers, 100, budget_s=None).name == "accurate"
+    assert select_tier(tiers, 100, budget_s=60).name == "accurate"
+    assert select_tier(tiers, 100, budget_s=TIERS["default"].estimate_s(100)).name == "default"
+    assert select_tier(tiers, 100, budget_s=0.1).name == "fast"
+    with pytest.raises(ValueError):
+        parse_tiers("default,huge")
+
+
+def test_request_budget_picks_the_tagger() -> None:
+    """Tight budgets go to the fast tier's tagger and its reduced label set."""
+    payload = [
+        message.dict(format_dates=True, format_enums=True) for message in generate_chat_stream(40)
+    ]
+    client = FakeClient()
+    app = ChatAnalyticsPackage(client, config=CONFIG)
+
+    fast = app.analyze(payload, latency_budget_s=0.6).data["chat_stream"]
+    fast_tagger = client.plugins["zero-shot-tagger-default-fast1"]
+    assert fast_tagger.blocks_tagged > 0
+    assert {message["intent"] for message in fast} <= {
+        Intent.SALUTATION.value,
+        Intent.COMPLAINT.value,
+        Intent.QUESTION.value,
+        Intent.REQUEST.value,
+    }
+
+    app.analyze(payload)
+    assert client.plugins["zero-shot-tagger-default-accurate1"].blocks_tagged > 0
+    assert "zero-shot-tagger-default1" not in client.plugins
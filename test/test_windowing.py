@@ -0,0 +1,72 @@
+"""Offline tests for splitting chat streams into windows and stitching their results."""
+import random
+from datetime import datetime
+
+import pytest
+
+from api_spec import Message
+from windowing import ownership, pack_windows, split_windows, stitch
+
+
+def _stream(lengths):
+    return [
+        Message(
+            message_id=str(idx), timestamp=datetime(2022, 6, 15), user_id="1", text="x" * length
+        )
+        for idx, length in enumerate(lengths)
+    ]
+
+
+@pytest.mark.parametrize("overlap", [0, 1, 5])
+def test_windows_respect_limits_and_cover_stream(overlap: int) -> None:
+    """Windows stay within their budgets, overlap as requested and cover every message."""
+    rng = random.Random(overlap)
+    chat_stream = _stream([rng.randint(1, 50) for _ in range(500)])
+
+    windows = split_windows(chat_stream, max_messages=40, max_chars=1000, overlap=overlap)
+
+    assert windows[0][0] == 0
+    assert windows[-1][1] == len(chat_stream)
+    for (start, end), (next_start, _) in zip(windows, windows[1:]):
+        assert next_start == max(start + 1, end - overlap)
+    for start, end in windows:
+        assert end - start <= 40
+        assert sum(len(message.text) for message in chat_stream[start:end]) <= 1000
+
+
+def test_oversized_message_gets_its_own_window() -> None:
+    """A message longer than the character budget is not dropped."""
+    windows = split_windows(_stream([5, 500, 5]), max_messages=10, max_chars=100, overlap=0)
+
+    assert windows == [(0, 1), (1, 2), (2, 3)]
+
+
+def test_ownership_partitions_stream() -> None:
+    """Every message is owned by exactly one window."""
+    windows = split_windows(_stream([1] * 100), max_messages=30, max_chars=0, overlap=10)
+    owned = ownership(windows)
+
+    assert owned[0][0] == 0 and owned[-1][1] == 100
+    for (lower, upper), (next_lower, _) in zip(owned, owned[1:]):
+        assert lower < upper == next_lower
+
+
+def test_stitch_recovers_thread_starts_across_boundaries() -> None:
+    """Thread starts near a window edge are taken from the window that saw their context."""
+    rng = random.Random(0)
+    truth = [idx > 0 and rng.random() < 0.2 for idx in range(300)]
+    windows = split_windows(_stream([1] * 300), max_messages=25, max_chars=0, overlap=4)
+
+    # The first message of a window never opens a thread locally, since the tagger lacks context.
+    window_values = [[False] + truth[start + 1 : end] for start, end in windows]
+
+    assert stitch(windows, window_values) == truth
+
+
+def test_pack_windows_fills_submissions_up_to_budget() -> None:
+    """Consecutive windows share a submission until the message or character budget is hit."""
+    sizes = [(3, 30), (4, 40), (2, 540), (1, 10), (10, 10)]
+
+    assert pack_windows(sizes, max_messages=10, max_chars=600) == [[0, 1], [2, 3], [4]]
+    assert pack_windows(sizes, max_messages=100, max_chars=0) == [[0, 1, 2, 3, 4]]
+    assert pack_windows([], max_messages=10, max_chars=10) == []